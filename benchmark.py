@@ -0,0 +1,515 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+# Reproducible benchmarks: python benchmark.py [options]
+# A synthetic corpus is generated from a seed, then each mode runs headlessly
+# against a fresh hard linked copy of it in a process of its own, so peak RSS
+# and the I/O counters belong to that run alone. Lookups go to a stub
+# geocoder and the metadata cache starts empty, so runs only measure the code.
+
+DEFAULT_MODES = ['location', 'time', 'multi', 'cluster', 'tag', 'flatten', 'similar', 'extractors']
+# Modes that walk the whole tree; the rest only sort the top folder
+RECURSIVE_MODES = {'flatten', 'extractors'}
+MULTI_KEYS = 'country/city/year/month'
+PERCENTILES = (50, 90, 99)
+FORMAT_VERSION = 1
+
+# (name, region, country code, lat, lon) of the places the corpus is shot in
+CITIES = [
+    ('Paris', 'Ile-de-France', 'FR', 48.8566, 2.3522),
+    ('Lyon', 'Auvergne-Rhone-Alpes', 'FR', 45.7640, 4.8357),
+    ('London', 'England', 'GB', 51.5074, -0.1278),
+    ('Berlin', 'Berlin', 'DE', 52.5200, 13.4050),
+    ('New York City', 'New York', 'US', 40.7128, -74.0060),
+    ('San Francisco', 'California', 'US', 37.7749, -122.4194),
+    ('Tokyo', 'Tokyo', 'JP', 35.6762, 139.6503),
+    ('Sydney', 'New South Wales', 'AU', -33.8688, 151.2093),
+    ('Cape Town', 'Western Cape', 'ZA', -33.9249, 18.4241),
+    ('Reykjavik', 'Capital Region', 'IS', 64.1466, -21.9426),
+    ('Fiji', 'Western', 'FJ', -17.7134, 178.0650),
+    ('Ushuaia', 'Tierra del Fuego', 'AR', -54.8019, -68.3030),
+]
+
+KINDS = {'jpeg': ('.jpg', 50), 'png': ('.png', 8), 'heic': ('.heic', 10), 'mp4': ('.mp4', 14),
+         'mov': ('.mov', 10), 'other': ('.txt', 3)}
+CAMERAS = ['Pixel 7', 'iPhone 15', 'Canon EOS R6', 'NIKON D750', 'DC-GH5']
+GPS_SHARE = 0.6
+NESTED_SHARE = 0.3
+DUPLICATE_SHARE = 0.05
+COLLISION_NAMES = 50
+TRIP_SIZE = 40
+SCENES = 64
+IMAGE_SIZE = (160, 120)
+TIMELINE_START = 1672531200  # 2023-01-01
+
+class StubGeocoder:
+    # Stands in for the offline and online geocoders: the nearest corpus city,
+    # after an optional delay that mimics a lookup service
+    def __init__(self, latency=0.0):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.latency = latency
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="stub-geocode") if latency else None
+
+    def nearest(self, lat, lon):
+        from geocoder import Place
+
+        if self.latency:
+            time.sleep(self.latency)
+        name, region, country, city_lat, city_lon = min(
+            CITIES, key=lambda city: (city[3] - lat) ** 2 + (city[4] - lon) ** 2)
+        return Place(name, region, country, city_lat, city_lon, 0.0)
+
+    def submit_place(self, lat, lon):
+        from concurrent.futures import Future
+
+        if self.executor is not None:
+            return self.executor.submit(self.nearest, lat, lon)
+        future = Future()
+        future.set_result(self.nearest(lat, lon))
+        return future
+
+    def submit(self, lat, lon):
+        from concurrent.futures import Future
+
+        future = Future()
+        self.submit_place(lat, lon).add_done_callback(lambda done: future.set_result(done.result().name))
+        return future
+
+    def get_location(self, lat, lon):
+        return self.nearest(lat, lon).name
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+# Corpus generation
+
+def scene_image(rng):
+    from PIL import Image
+
+    base = Image.linear_gradient('L').rotate(rng.randrange(360)).resize(IMAGE_SIZE)
+    noise = Image.effect_noise(IMAGE_SIZE, rng.randrange(10, 60))
+    return Image.merge('RGB', (base, noise, base.transpose(Image.FLIP_LEFT_RIGHT)))
+
+def to_rational(value):
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round(((value - degrees) * 60 - minutes) * 60 * 100)
+    return (degrees, 1), (minutes, 1), (seconds, 100)
+
+def exif_bytes(taken, gps, model):
+    import piexif
+
+    stamp = time.strftime("%Y:%m:%d %H:%M:%S", time.gmtime(taken)).encode()
+    exif = {'0th': {piexif.ImageIFD.Model: model.encode(), piexif.ImageIFD.DateTime: stamp},
+            'Exif': {piexif.ExifIFD.DateTimeOriginal: stamp}, 'GPS': {}}
+    if gps:
+        lat, lon = gps
+        exif['GPS'] = {
+            piexif.GPSIFD.GPSLatitudeRef: b'N' if lat >= 0 else b'S',
+            piexif.GPSIFD.GPSLatitude: to_rational(abs(lat)),
+            piexif.GPSIFD.GPSLongitudeRef: b'E' if lon >= 0 else b'W',
+            piexif.GPSIFD.GPSLongitude: to_rational(abs(lon)),
+        }
+    return piexif.dump(exif)
+
+def box(box_type, body):
+    import struct
+
+    return struct.pack('>I4s', 8 + len(body), box_type) + body
+
+def movie_box(taken, gps, model, apple):
+    import struct
+
+    # mvhd and tkhd with just the fields the metadata reader looks at
+    seconds = taken + 2082844800
+    mvhd = box(b'mvhd', bytes(4) + struct.pack('>IIII', seconds, seconds, 600, 6000) + bytes(80))
+    tkhd = box(b'tkhd', bytes(4) + struct.pack('>IIIII', seconds, seconds, 1, 0, 6000) + bytes(52)
+               + struct.pack('>II', 1920 << 16, 1080 << 16))
+    children = mvhd + box(b'trak', tkhd)
+    location = f"{gps[0]:+08.4f}{gps[1]:+09.4f}/" if gps else None
+
+    if apple:
+        items = [(b'com.apple.quicktime.model', model)]
+        if location:
+            items.append((b'com.apple.quicktime.location.ISO6709', location))
+        keys = struct.pack('>II', 0, len(items)) + b''.join(
+            struct.pack('>I4s', 8 + len(key), b'mdta') + key for key, _ in items)
+        ilst = b''.join(box(struct.pack('>I', index + 1), box(b'data', struct.pack('>II', 1, 0) + value.encode()))
+                        for index, (_, value) in enumerate(items))
+        children += box(b'meta', box(b'hdlr', bytes(25)) + box(b'keys', keys) + box(b'ilst', ilst))
+    else:
+        def text(value):
+            return struct.pack('>HH', len(value), 0x15c7) + value.encode()
+        udta = box(b'\xa9mod', text(model))
+        if location:
+            udta += box(b'\xa9xyz', text(location))
+        children += box(b'udta', udta)
+    return box(b'moov', children)
+
+def write_video(path, taken, gps, model, apple, video_size):
+    import struct
+
+    # mdat is left sparse, so large videos cost no disk space; Android puts
+    # moov after mdat, Apple before it
+    moov = movie_box(taken, gps, model, apple)
+    with open(path, 'wb') as f:
+        f.write(box(b'ftyp', b'qt  \x00\x00\x00\x00qt  ' if apple else b'isom\x00\x00\x00\x00isommp42'))
+        if apple:
+            f.write(moov)
+        f.write(struct.pack('>I4sQ', 1, b'mdat', video_size + 16))
+        f.seek(video_size, os.SEEK_CUR)
+        if not apple:
+            f.write(moov)
+        f.truncate()
+
+def generate_corpus(root, files, seed=1, depth=6, video_size=4 << 20):
+    """Write `files` synthetic media files under root; returns a manifest dict.
+
+    Files are shot in trips of about TRIP_SIZE around one city, most in the
+    top folder and the rest spread over a nested tree where names collide.
+    Some images reuse a trip's scene (near-duplicates) and a few files are
+    copied byte for byte elsewhere in the tree.
+    """
+    import random
+    import shutil
+    import pillow_heif
+
+    pillow_heif.register_heif_opener()
+    rng = random.Random(seed)
+    scenes = [scene_image(rng) for _ in range(SCENES)]
+    kinds = list(KINDS)
+    weights = [weight for _, weight in KINDS.values()]
+    counts = Counter()
+    written = []
+    os.makedirs(root, exist_ok=True)
+
+    for index in range(files):
+        kind = rng.choices(kinds, weights)[0]
+        extension = KINDS[kind][0]
+        trip = index // TRIP_SIZE
+        city = CITIES[trip % len(CITIES)]
+        taken = TIMELINE_START + trip * 5 * 86400 + rng.randrange(8 * 3600)
+        gps = None
+        if rng.random() < GPS_SHARE:
+            gps = (city[3] + rng.uniform(-0.05, 0.05), city[4] + rng.uniform(-0.05, 0.05))
+        model = rng.choice(CAMERAS)
+
+        if rng.random() < NESTED_SHARE:
+            parts = [f"Folder {rng.randrange(4)}" for _ in range(rng.randrange(1, depth + 1))]
+            folder = os.path.join(root, *parts)
+            name = f"IMG_{rng.randrange(COLLISION_NAMES):04d}"
+            counts['nested'] += 1
+        else:
+            folder = root
+            name = f"IMG_{index:05d}"
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, name + extension)
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(folder, f"{name}_{suffix}{extension}")
+            suffix += 1
+
+        if kind in ('jpeg', 'png', 'heic'):
+            scene = scenes[(trip * 3 + rng.randrange(3)) % SCENES]
+            options = {'exif': exif_bytes(taken, gps, model)}
+            if kind == 'jpeg':
+                options['quality'] = rng.randrange(70, 95)
+            scene.save(path, format={'jpeg': 'JPEG', 'png': 'PNG', 'heic': 'HEIF'}[kind], **options)
+        elif kind in ('mp4', 'mov'):
+            write_video(path, taken, gps, model, kind == 'mov', video_size)
+        else:
+            with open(path, 'w') as f:
+                f.write(f"notes {index}\n")
+        counts[kind] += 1
+        counts['gps' if gps and kind != 'other' else 'no gps'] += 1
+        written.append(path)
+
+    for path in rng.sample(written, int(len(written) * DUPLICATE_SHARE)):
+        folder = os.path.join(root, f"Folder {rng.randrange(4)}", "Copies")
+        os.makedirs(folder, exist_ok=True)
+        shutil.copyfile(path, os.path.join(folder, f"copy_{counts['duplicates']:05d}_{os.path.basename(path)}"))
+        counts['duplicates'] += 1
+
+    total = sum(counts[kind] for kind in KINDS) + counts['duplicates']
+    return {'files': total, 'top_level': total - counts['nested'] - counts['duplicates'], 'seed': seed,
+            'depth': depth, 'video_size': video_size, 'counts': dict(sorted(counts.items()))}
+
+# Measurement, run in a fresh process per run
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, owner, name, stage):
+        function = getattr(owner, name)
+        samples = self.samples[stage]
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+
+        setattr(owner, name, timed)
+
+def process_counters():
+    counters = {'cpu_user_s': 0.0, 'cpu_system_s': 0.0}
+    try:
+        import resource
+    except ImportError:
+        return counters
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    counters.update(cpu_user_s=usage.ru_utime, cpu_system_s=usage.ru_stime,
+                    block_reads=usage.ru_inblock, block_writes=usage.ru_oublock,
+                    voluntary_switches=usage.ru_nvcsw, involuntary_switches=usage.ru_nivcsw)
+    # Linux only: read/write syscall counts and bytes through them
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                key, value = line.split(':')
+                if key in ('syscr', 'syscw', 'rchar', 'wchar'):
+                    counters[key] = int(value)
+    except OSError:
+        pass
+    return counters
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def list_media(folder_path):
+    for directory, _, names in os.walk(folder_path):
+        for name in sorted(names):
+            yield os.path.join(directory, name)
+
+def run_extractors(folder_path, timer):
+    import utils
+    from constants import IMAGE_FORMATS, VIDEO_FORMATS
+
+    timer.wrap(utils, 'extract_gps_info_image', 'extract_gps_info_image')
+    timer.wrap(utils, 'extract_gps_info_video', 'extract_gps_info_video')
+    timer.wrap(utils, 'get_creation_time', 'get_creation_time')
+    for path in list_media(folder_path):
+        extension = os.path.splitext(path)[1].lower()
+        if extension in IMAGE_FORMATS:
+            utils.extract_gps_info_image(path)
+        elif extension in VIDEO_FORMATS:
+            utils.extract_gps_info_video(path)
+        else:
+            continue
+        utils.get_creation_time(path)
+
+def measure_run(mode, folder_path, options, cache_dir, geocode_latency):
+    # Own the cache and journal folders, and keep the readers' diagnostics quiet
+    os.environ['XDG_CACHE_HOME'] = cache_dir
+    sys.stdout = open(os.devnull, 'w')
+
+    import engine
+    import geocoder
+    import metadata
+
+    geocoder.load_geocoder = lambda *args, **kwargs: StubGeocoder(geocode_latency)
+    timer = StageTimer()
+    timer.wrap(metadata, 'extract_metadata', 'extract_file')
+
+    result = {'planned': 0, 'moved': 0, 'errors': 0}
+    before = process_counters()
+    start = time.perf_counter()
+    if mode == 'extractors':
+        run_extractors(folder_path, timer)
+    else:
+        job = engine.create_job(mode, folder_path, **options)
+        for name, stage in (('setup', 'setup'), ('build_plan', 'plan'), ('extract', 'extract_batch'),
+                            ('execute', 'execute'), ('cleanup', 'cleanup')):
+            if hasattr(job, name):
+                timer.wrap(job, name, stage)
+        job.run()
+        result.update(planned=job.planned, moved=job.moved, errors=job.errors)
+    result['wall_s'] = time.perf_counter() - start
+
+    after = process_counters()
+    result['counters'] = {key: after[key] - before.get(key, 0) for key in after}
+    result['peak_rss_kb'] = peak_rss_kb()
+    result['stages'] = dict(timer.samples)
+    return result
+
+# Reporting
+
+def percentiles(values, scale=1.0):
+    ordered = sorted(values)
+    summary = {f"p{p}": round(ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * scale, 3)
+               for p in PERCENTILES}
+    summary.update(max=round(ordered[-1] * scale, 3), count=len(ordered), total=round(sum(ordered) * scale, 3))
+    return summary
+
+def median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+def summarize(runs, files):
+    walls = [run['wall_s'] for run in runs]
+    stages = defaultdict(list)
+    for run in runs:
+        for stage, samples in run['stages'].items():
+            stages[stage].extend(samples)
+
+    counters = {key: median([run['counters'][key] for run in runs]) for key in runs[0]['counters']}
+    return {
+        'files': files,
+        'files_per_s': round(files / median(walls), 1),
+        'wall_ms': percentiles(walls, 1000),
+        'stages_ms': {stage: percentiles(samples, 1000) for stage, samples in sorted(stages.items()) if samples},
+        'peak_rss_kb': max(run['peak_rss_kb'] or 0 for run in runs),
+        'counters': {key: round(value, 3) if isinstance(value, float) else value
+                     for key, value in sorted(counters.items())},
+        'planned': runs[-1]['planned'],
+        'moved': runs[-1]['moved'],
+        'errors': runs[-1]['errors'],
+    }
+
+def print_table(report, baseline=None, stream=sys.stderr):
+    stream.write(f"{'mode':<11}{'files/s':>10}{'wall p50':>11}{'peak RSS':>11}{'syscr':>9}{'syscw':>9}"
+                 f"{'change':>9}\n")
+    for mode, result in report['results'].items():
+        counters = result['counters']
+        change = ''
+        old = (baseline or {}).get('results', {}).get(mode)
+        if old:
+            change = f"{(result['files_per_s'] / old['files_per_s'] - 1) * 100:+.1f}%"
+        stream.write(f"{mode:<11}{result['files_per_s']:>10.1f}{result['wall_ms']['p50']:>9.0f}ms"
+                     f"{result['peak_rss_kb'] / 1024:>9.1f}MB{counters.get('syscr', '-'):>9}"
+                     f"{counters.get('syscw', '-'):>9}{change:>9}\n")
+        for stage, summary in result['stages_ms'].items():
+            stream.write(f"  {stage:<23}p50 {summary['p50']:>9.3f}ms  p90 {summary['p90']:>9.3f}ms  "
+                         f"p99 {summary['p99']:>9.3f}ms  x{summary['count']}\n")
+
+def git_revision():
+    import subprocess
+
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='benchmark', description="Benchmark every sort mode on a synthetic corpus")
+    parser.add_argument('--files', type=int, default=2000, help="Files to generate (default: 2000)")
+    parser.add_argument('--seed', type=int, default=1, help="Corpus random seed (default: 1)")
+    parser.add_argument('--depth', type=int, default=6, help="Deepest nested folder level (default: 6)")
+    parser.add_argument('--video-mb', type=float, default=4,
+                        help="Size of each (sparse) video's media data in MB (default: 4)")
+    parser.add_argument('--modes', default=','.join(DEFAULT_MODES),
+                        help=f"Comma separated modes to run (default: {','.join(DEFAULT_MODES)})")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per mode (default: 3)")
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help="Parallel metadata readers, 0 picks a count for the storage (default: 0)")
+    parser.add_argument('--geocode-latency', type=float, default=0, metavar='MS',
+                        help="Delay added to each stub geocoder lookup (default: 0)")
+    parser.add_argument('--corpus', metavar='DIR',
+                        help="Keep the corpus in DIR and reuse it when the settings match")
+    parser.add_argument('-o', '--output', metavar='PATH', help="Write the JSON report here instead of stdout")
+    parser.add_argument('--compare', metavar='PATH', help="Earlier JSON report to show the change against")
+    return parser
+
+def load_corpus(directory, args):
+    manifest_path = os.path.join(directory, 'manifest.json')
+    settings = {'files': args.files, 'seed': args.seed, 'depth': args.depth,
+                'video_size': int(args.video_mb * (1 << 20))}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest['settings'] == settings:
+            return manifest['corpus']
+        import shutil
+        shutil.rmtree(os.path.join(directory, 'media'), ignore_errors=True)
+
+    sys.stderr.write(f"Generating {args.files} files...\n")
+    corpus = generate_corpus(os.path.join(directory, 'media'), args.files, args.seed, args.depth,
+                             settings['video_size'])
+    with open(manifest_path, 'w') as f:
+        json.dump({'settings': settings, 'corpus': corpus}, f, indent=2)
+    return corpus
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    import multiprocessing
+    import platform
+    import shutil
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in DEFAULT_MODES]
+    if unknown:
+        print(f"benchmark: error: unknown modes: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    work_dir = tempfile.mkdtemp(prefix='pinpoint-bench-')
+    try:
+        corpus_dir = args.corpus or os.path.join(work_dir, 'corpus')
+        corpus = load_corpus(corpus_dir, args)
+        results = {}
+        for mode in modes:
+            options = {} if mode == 'extractors' else {'workers': args.workers}
+            if mode == 'multi':
+                options['keys'] = MULTI_KEYS
+            runs = []
+            for repeat in range(args.repeat):
+                sys.stderr.write(f"\r{mode} run {repeat + 1}/{args.repeat}" if sys.stderr.isatty() else '')
+                run_dir = os.path.join(work_dir, 'run')
+                cache_dir = os.path.join(work_dir, 'cache')
+                shutil.copytree(os.path.join(corpus_dir, 'media'), run_dir, copy_function=os.link)
+                try:
+                    with ProcessPoolExecutor(max_workers=1,
+                                             mp_context=multiprocessing.get_context('spawn')) as executor:
+                        runs.append(executor.submit(measure_run, mode, run_dir, options, cache_dir,
+                                                    args.geocode_latency / 1000).result())
+                finally:
+                    shutil.rmtree(run_dir, ignore_errors=True)
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+            if sys.stderr.isatty():
+                sys.stderr.write('\n')
+            files = corpus['files'] if mode in RECURSIVE_MODES else corpus['top_level']
+            results[mode] = summarize(runs, files)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'format': FORMAT_VERSION,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': {'repeat': args.repeat, 'workers': args.workers, 'geocode_latency_ms': args.geocode_latency},
+        'corpus': corpus,
+        'results': results,
+    }
+    print_table(report, baseline)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,238 @@
+import math
+import numpy as np
+from geocoder import EARTH_RADIUS_KM
+
+# DBSCAN-style clustering of photo locations. Points are indexed on a 3D grid
+# of unit vectors whose cells are small enough that any two points sharing a
+# cell are within eps of each other, so a cell is one clique; only points in
+# neighbouring cells ever need a distance computed. Unit vectors keep the
+# grid correct across the antimeridian and near the poles.
+
+DEFAULT_RADIUS_KM = 1.0
+# Cell pairs with more point pairs than this are checked one at a time in
+# chunks, the rest are expanded into point pairs in bulk
+LARGE_PAIR_SIZE = 4096
+EXPAND_CHUNK_SIZE = 1 << 20
+DISTANCE_CHUNK_SIZE = 512
+
+# Cells are packed into one int64 code of three 21 bit coordinates
+CELL_BITS = 21
+CELL_BIAS = 1 << (CELL_BITS - 1)
+
+# The smallest radius whose cells still fit those coordinates (about 10.5 m),
+# and half the Earth's circumference, beyond which every point is in range
+MIN_RADIUS_KM = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(3) / (2 * (CELL_BIAS - 3)))
+MAX_RADIUS_KM = math.pi * EARTH_RADIUS_KM
+
+# Half of the 5x5x5 block around a cell; the other half is covered from the
+# neighbour's side, so every pair of cells is visited once
+NEIGHBOUR_OFFSETS = [(dx, dy, dz) for dx in range(-2, 3) for dy in range(-2, 3) for dz in range(-2, 3)
+                     if (dx, dy, dz) > (0, 0, 0)]
+
+def check_radius(radius_km):
+    """Raise ValueError unless radius_km is a radius the grid can index."""
+    if not MIN_RADIUS_KM <= radius_km <= MAX_RADIUS_KM:
+        raise ValueError(f"Cluster radius must be between {MIN_RADIUS_KM * 1000:.1f} m and "
+                         f"{MAX_RADIUS_KM:.0f} km, not {radius_km} km")
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    # Vectorized over broadcastable arrays of radians
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+def to_unit_vectors(lat, lon):
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+def pack_cells(keys):
+    biased = (keys + CELL_BIAS).astype(np.int64)
+    return (biased[:, 0] << (2 * CELL_BITS)) | (biased[:, 1] << CELL_BITS) | biased[:, 2]
+
+class GridIndex:
+    def __init__(self, lat, lon, radius_km):
+        self.lat = np.radians(np.asarray(lat, dtype=np.float64))
+        self.lon = np.radians(np.asarray(lon, dtype=np.float64))
+        self.radius_km = radius_km
+
+        # A cell's diagonal equals the chord for radius_km, so everything
+        # within radius_km is at most two cells away along each axis
+        check_radius(radius_km)
+        chord = 2 * math.sin(radius_km / (2 * EARTH_RADIUS_KM))
+        cell_size = chord / math.sqrt(3)
+        keys = np.floor(to_unit_vectors(self.lat, self.lon) / cell_size).astype(np.int64)
+
+        codes = pack_cells(keys)
+        self.codes, self.cell_of, self.counts = np.unique(codes, return_inverse=True, return_counts=True)
+        self.cell_of = self.cell_of.ravel()
+        self.order = np.argsort(self.cell_of, kind='stable')
+        self.starts = np.cumsum(self.counts) - self.counts
+        self.cell_keys = keys[self.order[self.starts]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def neighbour_pairs(self):
+        # Every pair of occupied cells close enough to hold points within radius
+        first, second = [], []
+        for offset in NEIGHBOUR_OFFSETS:
+            shifted = pack_cells(self.cell_keys + np.array(offset))
+            found = np.searchsorted(self.codes, shifted)
+            found[found == len(self.codes)] = 0
+            hit = self.codes[found] == shifted
+            first.append(np.flatnonzero(hit))
+            second.append(found[hit])
+        return np.concatenate(first), np.concatenate(second)
+
+    def members(self, mask=None):
+        # Points grouped by cell as (order, starts, counts), optionally filtered
+        if mask is None:
+            return self.order, self.starts, self.counts
+        counts = np.bincount(self.cell_of[mask], minlength=len(self))
+        return self.order[mask[self.order]], np.cumsum(counts) - counts, counts
+
+    def within(self, a, b):
+        # Boolean matrix of which points in a are within radius of points in b
+        return haversine_km(self.lat[a, None], self.lon[a, None],
+                            self.lat[None, b], self.lon[None, b]) <= self.radius_km
+
+    def close_pairs(self, first, second, mask=None, first_only=False):
+        """Point pairs within radius between the given cell pairs.
+
+        With first_only, at most one pair is returned per cell pair, which is
+        all that connecting two clusters needs.
+        """
+        order, starts, counts = self.members(mask)
+        sizes = counts[first] * counts[second]
+        keep = sizes > 0
+        first, second, sizes = first[keep], second[keep], sizes[keep]
+
+        found_a, found_b = [], []
+        small = sizes <= LARGE_PAIR_SIZE
+        small_first, small_second, small_sizes = first[small], second[small], sizes[small]
+        bounds = np.searchsorted(np.cumsum(small_sizes), np.arange(EXPAND_CHUNK_SIZE, small_sizes.sum() + 1,
+                                                                    EXPAND_CHUNK_SIZE), side='right')
+        for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(small_sizes)]):
+            if hi > lo:
+                a, b = self.expand(order, starts, counts, small_first[lo:hi], small_second[lo:hi],
+                                   small_sizes[lo:hi])
+                hits = haversine_km(self.lat[a], self.lon[a], self.lat[b], self.lon[b]) <= self.radius_km
+                found_a.append(a[hits])
+                found_b.append(b[hits])
+
+        for cell_a, cell_b in zip(first[~small].tolist(), second[~small].tolist()):
+            a = order[starts[cell_a]:starts[cell_a] + counts[cell_a]]
+            b = order[starts[cell_b]:starts[cell_b] + counts[cell_b]]
+            for i in range(0, len(a), DISTANCE_CHUNK_SIZE):
+                rows, cols = np.nonzero(self.within(a[i:i + DISTANCE_CHUNK_SIZE], b))
+                if first_only and len(rows):
+                    rows, cols = rows[:1], cols[:1]
+                found_a.append(a[i + rows])
+                found_b.append(b[cols])
+                if first_only and len(rows):
+                    break
+
+        if not found_a:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(found_a), np.concatenate(found_b)
+
+    @staticmethod
+    def expand(order, starts, counts, first, second, sizes):
+        # Every (a, b) point pair of each cell pair, without a Python loop
+        pair = np.repeat(np.arange(len(sizes)), sizes)
+        local = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        width = counts[second][pair]
+        a = order[starts[first][pair] + local // width]
+        b = order[starts[second][pair] + local % width]
+        return a, b
+
+def connected_components(count, first, second):
+    # Label propagation with pointer jumping: each round hooks every edge's
+    # larger root under the smaller one, then flattens the trees
+    labels = np.arange(count)
+    while True:
+        root_a, root_b = labels[first], labels[second]
+        low = np.minimum(root_a, root_b)
+        hooked = labels.copy()
+        np.minimum.at(hooked, root_a, low)
+        np.minimum.at(hooked, root_b, low)
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+def dbscan(lat, lon, radius_km=DEFAULT_RADIUS_KM, min_samples=1):
+    """Cluster coordinates in degrees; returns a label per point, -1 for noise.
+
+    With min_samples=1 every point is a core point, which makes this
+    single-linkage clustering: a hike photographed every few hundred metres
+    chains into one cluster.
+    """
+    count = len(lat)
+    labels = np.full(count, -1, dtype=np.int64)
+    if count == 0:
+        return labels
+
+    index = GridIndex(lat, lon, radius_km)
+    first, second = index.neighbour_pairs()
+
+    # Points in a cell are all within radius of each other, so only cells with
+    # fewer than min_samples points need their neighbours counted
+    core = index.counts[index.cell_of] >= min_samples
+    if not core.all():
+        sparse = index.counts < min_samples
+        pairs = sparse[first] | sparse[second]
+        a, b = index.close_pairs(first[pairs], second[pairs])
+        neighbours = (index.counts[index.cell_of] + np.bincount(a, minlength=count)
+                      + np.bincount(b, minlength=count))
+        core = neighbours >= min_samples
+
+    # Cells with core points are one cluster when any core pair between them is close
+    has_core = np.bincount(index.cell_of[core], minlength=len(index)) > 0
+    pairs = has_core[first] & has_core[second]
+    a, b = index.close_pairs(first[pairs], second[pairs], core, first_only=True)
+    components = connected_components(len(index), index.cell_of[a], index.cell_of[b])
+    labels[core] = components[index.cell_of[core]]
+
+    # Border points join a cluster with a core point within radius
+    border = ~core
+    in_core_cell = border & has_core[index.cell_of]
+    labels[in_core_cell] = components[index.cell_of[in_core_cell]]
+    lonely = border & ~has_core[index.cell_of]
+    if lonely.any():
+        lonely_cells = np.bincount(index.cell_of[lonely], minlength=len(index)) > 0
+        for cells_a, cells_b in ((first, second), (second, first)):
+            pairs = lonely_cells[cells_a] & has_core[cells_b]
+            a, b = index.close_pairs(cells_a[pairs], cells_b[pairs], lonely | core)
+            hits = lonely[a] & core[b]
+            labels[a[hits]] = labels[b[hits]]
+
+    # Renumber 0..k-1 in order of first appearance
+    valid = np.flatnonzero(labels >= 0)
+    roots, first_seen, inverse = np.unique(labels[valid], return_index=True, return_inverse=True)
+    rank = np.empty(len(roots), dtype=np.int64)
+    rank[np.argsort(first_seen)] = np.arange(len(roots))
+    labels[valid] = rank[inverse.ravel()]
+    return labels
+
+def cluster_representatives(lat, lon, labels):
+    """For each cluster label, the index of the point nearest its centre."""
+    lat_rad = np.radians(np.asarray(lat, dtype=np.float64))
+    lon_rad = np.radians(np.asarray(lon, dtype=np.float64))
+    vectors = to_unit_vectors(lat_rad, lon_rad)
+
+    order = np.argsort(labels, kind='stable')
+    order = order[labels[order] >= 0]
+    sorted_labels = labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]]) if len(order) else []
+
+    representatives = {}
+    for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+        members = order[start:end]
+        centre = vectors[members].mean(axis=0)
+        representatives[int(sorted_labels[start])] = int(members[np.argmax(vectors[members] @ centre)])
+    return representatives
\ No newline at end of file
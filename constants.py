@@ -1,3 +1,5 @@
 IMAGE_FORMATS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.heic']
 VIDEO_FORMATS = ['.mp4', '.avi', '.mov', '.mkv', '.m4v']
-SUPPORTED_MEDIA_FORMATS = IMAGE_FORMATS + VIDEO_FORMATS
\ No newline at end of file
+SUPPORTED_MEDIA_FORMATS = IMAGE_FORMATS + VIDEO_FORMATS
+# Videos whose metadata is read natively; the others go through exiftool
+QUICKTIME_FORMATS = ['.mp4', '.mov', '.m4v']
\ No newline at end of file
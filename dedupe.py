@@ -0,0 +1,100 @@
+import hashlib
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from instrument import current_recorder, use_recorder
+from metadata_cache import FINGERPRINT_BLOCK_SIZE, file_fingerprint
+
+# Byte-identical file detection. Candidates are narrowed in three passes so
+# that most files are never read in full: equal sizes, then equal first and
+# last blocks, then an equal hash of the whole content.
+
+READ_BUFFER_SIZE = 1024 * 1024
+
+DUPLICATES_FOLDER = 'Duplicates'
+
+logger = logging.getLogger('pinpoint.dedupe')
+
+def content_hash(file_path):
+    # hashlib releases the GIL while hashing large buffers, so several of
+    # these run in parallel on a thread pool
+    digest = hashlib.blake2b(digest_size=20)
+    buffer = bytearray(READ_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+def regroup(groups, key, executor, on_progress=None):
+    paths = [path for group in groups for path in group]
+    done = 0
+
+    def safe_key(path):
+        try:
+            return key(path)
+        except OSError as e:
+            logger.warning(f"Error reading {path}: {e}")
+            return None
+
+    regrouped = defaultdict(list)
+    for path, value in zip(paths, executor.map(safe_key, paths)):
+        done += 1
+        if on_progress:
+            on_progress(done, len(paths))
+        if value is not None:
+            regrouped[value].append(path)
+    return [group for group in regrouped.values() if len(group) > 1]
+
+def keeper_order(path):
+    # Keep the copy closest to the top of the tree, then the first by name
+    return path.count(os.sep), path
+
+def find_duplicates(sizes, workers=1, on_progress=None):
+    """Group identical files.
+
+    `sizes` maps path -> size in bytes. Returns lists of paths with equal
+    content, each sorted so the copy to keep comes first. Empty files are
+    ignored.
+    """
+    by_size = defaultdict(list)
+    for path, size in sizes.items():
+        if size > 0:
+            by_size[size].append(path)
+    candidates = [group for group in by_size.values() if len(group) > 1]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="dedupe",
+                            initializer=use_recorder, initargs=(current_recorder(),)) as executor:
+        partial = regroup(candidates, lambda path: (sizes[path], file_fingerprint(path, sizes[path])),
+                          executor, on_progress)
+        # The fingerprint already covers files that fit in its first block
+        small = [group for group in partial if sizes[group[0]] <= FINGERPRINT_BLOCK_SIZE]
+        large = [group for group in partial if sizes[group[0]] > FINGERPRINT_BLOCK_SIZE]
+        full = regroup(large, lambda path: (sizes[path], content_hash(path)), executor, on_progress)
+
+    return [sorted(group, key=keeper_order) for group in small + full]
+
+def link_duplicate(original, duplicate):
+    # Swap the duplicate for a hard link to the original in one rename, so
+    # there is never a moment where the duplicate's name is missing
+    if os.path.samefile(original, duplicate):
+        return False
+    temp_path = f"{duplicate}.pinpoint-link"
+    os.link(original, temp_path)
+    try:
+        os.replace(temp_path, duplicate)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+    return True
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
\ No newline at end of file
@@ -0,0 +1,1037 @@
+import logging
+import os
+import threading
+from instrument import Recorder, current_recorder
+from planner import MovePlan, execute_plan
+from reporter import ThrottledReporter, DEBUG, INFO, WARNING, ERROR
+from scanner import DirectoryScanner, FileEntry, iter_batches
+
+# Qt-free sorting engine shared by the GUI workers and the pinpoint CLI.
+# The metadata stack (Pillow, exiftool, the geocoders) is imported inside the
+# jobs that need it, so importing this module stays cheap.
+
+SCAN_BATCH_SIZE = 256
+WATCH_POLL_TIMEOUT = 0.5
+
+# The library modules log to 'pinpoint.*' loggers; while a job runs, what
+# they log on its threads goes to the job's log
+logger = logging.getLogger('pinpoint')
+logger.setLevel(logging.DEBUG)
+
+def ignore(*args):
+    pass
+
+class JobLogHandler(logging.Handler):
+    # Jobs running side by side each take the records logged under their own
+    # recorder, which the job's thread and its pools carry
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+
+    def emit(self, record):
+        if current_recorder() is self.job.recorder:
+            self.job.log(record.getMessage(), record.levelno)
+
+class SortJob:
+    mode = None
+
+    def __init__(self, folder_path, workers=0, dry_run=False, plan_path=None,
+                 on_output=None, on_progress=None):
+        self.folder_path = folder_path
+        self.workers = workers
+        self.dry_run = dry_run
+        self.plan_path = plan_path
+        self.cache = None
+        self.journal_path = None
+        self.planned = 0
+        self.moved = 0
+        self.errors = 0
+        self.stop_event = threading.Event()
+        # on_output([(level, message), ...]), on_progress(percent, processed, total)
+        self.reporter = ThrottledReporter(on_output or ignore, on_progress or ignore)
+        self.recorder = Recorder()
+        self.trace_path = None
+        self.profile_path = None
+        # Compare cross-device copies with the original before removing it, and
+        # remove the folders that moving files out of left empty
+        self.verify = False
+        self.prune_empty = True
+
+    def instrument(self, trace_path=None, profile_path=None, trace_memory=False):
+        # Opt in to a Chrome trace, a cProfile dump of the job thread and a
+        # tracemalloc report for the next run; stage timings are always kept
+        self.trace_path = trace_path
+        self.profile_path = profile_path
+        self.recorder = Recorder(trace=bool(trace_path), profile=bool(profile_path), trace_memory=trace_memory)
+
+    def log(self, message, level=INFO):
+        if level >= ERROR:
+            self.errors += 1
+        self.reporter.log(message, level)
+
+    def report_progress(self, percent, processed=0, total=0):
+        self.reporter.progress(percent, processed, total)
+
+    def stop(self):
+        # Safe to call from any thread; only long-running watch jobs check it
+        self.stop_event.set()
+
+    def run(self):
+        from parallel import resolve_worker_count
+
+        self.workers = resolve_worker_count(self.workers, self.folder_path)
+        handler = JobLogHandler(self)
+        logger.addHandler(handler)
+        self.recorder.start()
+        self.reporter.start()
+        try:
+            self.setup()
+            try:
+                self.sort()
+            finally:
+                self.cleanup()
+        finally:
+            self.recorder.stop()
+            logger.removeHandler(handler)
+            self.report_timings()
+            self.reporter.stop()
+        return self.moved
+
+    def report_timings(self):
+        lines = self.recorder.summary()
+        if lines:
+            self.log("Timings:\n" + "\n".join(lines))
+        lines = self.recorder.profile_summary()
+        if lines:
+            self.log("Profile of the job thread:\n" + "\n".join(lines))
+        lines = self.recorder.memory_summary()
+        if lines:
+            self.log("Memory:\n" + "\n".join(lines))
+
+        for path, write, kind in ((self.trace_path, self.recorder.write_trace, "Trace"),
+                                  (self.profile_path, self.recorder.write_profile, "Profile")):
+            if not path:
+                continue
+            try:
+                write(path)
+                self.log(f"{kind} saved to {path}")
+            except OSError as e:
+                self.log(f"Error saving {kind.lower()} to {path}: {str(e)}", ERROR)
+
+    def plan_options(self):
+        # Settings that change where files go; an interrupted run is only
+        # resumed when they are the same as when it was planned
+        return {}
+
+    def sort(self):
+        from journal import MoveJournal, find_interrupted, find_resumable, normalize_options
+
+        options = self.plan_options()
+        state = None if self.dry_run else find_resumable(self.folder_path, self.mode, options)
+        if state:
+            # Skip scanning and extraction entirely, the journal already holds the plan
+            plan = state.remaining_plan()
+            self.log(f"Resuming interrupted {self.mode} run from {state.created} ({state.path}): "
+                     f"{len(plan)} of {len(state.plan)} moves remaining", WARNING)
+            self.finish_plan(plan, MoveJournal.resume(state))
+        else:
+            header = None if self.dry_run else find_interrupted(self.folder_path, self.mode)
+            if header and header.options != normalize_options(options):
+                self.log(f"Not resuming the interrupted {self.mode} run from {header.created}, "
+                         f"it was planned with other options", WARNING)
+            with self.recorder.stage('plan'):
+                plan = self.build_plan()
+            self.finish_plan(plan)
+
+    def setup(self):
+        pass
+
+    def build_plan(self):
+        raise NotImplementedError
+
+    def cleanup(self):
+        pass
+
+    def finish_plan(self, plan, journal=None):
+        from journal import MoveJournal, STATUS_COMPLETE
+
+        self.planned += len(plan)
+        if self.plan_path:
+            plan.save(self.plan_path)
+            self.log(f"Move plan saved to {self.plan_path}")
+
+        if self.dry_run:
+            self.log(f"Dry run: {len(plan)} moves planned")
+            for line in plan.describe():
+                self.log(line)
+            self.report_progress(100, len(plan), len(plan))
+            return
+
+        journal = journal or MoveJournal.create(plan, self.plan_options())
+        self.journal_path = journal.path
+        try:
+            self.execute(plan, journal.record_move)
+            journal.set_status(STATUS_COMPLETE)
+        finally:
+            journal.close()
+        self.prune_journals()
+
+    def prune_journals(self):
+        from journal import prune_journals
+
+        try:
+            removed = prune_journals()
+        except OSError as e:
+            self.log(f"Error pruning old journals: {str(e)}", WARNING)
+            return
+        if removed:
+            self.log(f"Removed {removed} old journals", DEBUG)
+
+    def execute(self, plan, record=None):
+        total = len(plan)
+        done = 0
+        emptied = set()
+
+        def on_move(move):
+            nonlocal done
+            done += 1
+            emptied.add(os.path.dirname(move.source))
+            with self.recorder.stage('journal'):
+                if record:
+                    record(move)
+                if self.cache is not None:
+                    self.cache.record_move(move.source, move.destination)
+            self.report_progress(50 + int(done / total * 50), done, total)
+            self.log(f"Moved {os.path.basename(move.source)} to "
+                     f"{os.path.relpath(os.path.dirname(move.destination), self.folder_path)} "
+                     f"({done}/{total})")
+
+        def on_error(move, error):
+            nonlocal done
+            done += 1
+            self.log(f"Error processing {os.path.basename(move.source)}: {str(error)}", ERROR)
+
+        moved = execute_plan(plan, on_move, on_error, self.workers, self.verify)
+        self.moved += moved
+        if self.prune_empty and emptied:
+            from mover import prune_empty_dirs
+
+            removed = prune_empty_dirs(emptied, self.folder_path)
+            if removed:
+                self.log(f"Removed {len(removed)} empty folders")
+        self.report_progress(100, done, total)
+        return moved
+
+    def planning_progress(self, planned, known):
+        # Planning fills the first half of the bar, executing the plan the rest
+        self.report_progress(int(planned / max(1, known) * 50), planned, known)
+
+class MetadataSortJob(SortJob):
+    # Jobs that read file metadata share an exiftool pool and the metadata
+    # cache. With watch set they keep both open after the first pass and
+    # sort each new arrival in the folder until stop() is called.
+    def __init__(self, folder_path, workers=0, use_processes=False, dry_run=False, plan_path=None,
+                 watch=False, settle=None, polling=False, on_output=None, on_progress=None):
+        super().__init__(folder_path, workers, dry_run, plan_path, on_output, on_progress)
+        self.use_processes = use_processes
+        self.watch = watch
+        self.settle = settle
+        self.polling = polling
+        self.exif_pool = None
+        self.process_executor = None
+
+    def setup(self):
+        from exif_pool import ExifToolPool
+        from metadata_cache import MetadataCache
+
+        self.exif_pool = ExifToolPool(size=min(self.workers, os.cpu_count() or 1))
+        self.cache = MetadataCache()
+        if self.use_processes and self.workers > 1:
+            from parallel import create_process_executor
+
+            # One set of worker processes for the whole run, not one per batch
+            self.process_executor = create_process_executor(self.workers)
+
+    def cleanup(self):
+        if self.cache is not None:
+            self.log(self.cache.summary())
+            self.cache.close()
+        if self.process_executor is not None:
+            self.process_executor.shutdown()
+        if self.exif_pool is not None:
+            self.exif_pool.shutdown()
+
+    def sort(self):
+        if not self.watch:
+            super().sort()
+            return
+
+        from watcher import create_watcher, SETTLE_TIME
+
+        settle = SETTLE_TIME if self.settle is None else self.settle
+        # Watch before the first pass so nothing landing during it is missed
+        with create_watcher(self.folder_path, settle, self.polling) as watcher:
+            super().sort()
+            self.log(f"Watching {self.folder_path} for new files")
+            while not self.stop_event.is_set():
+                paths = watcher.poll(WATCH_POLL_TIMEOUT)
+                if not paths:
+                    continue
+                self.log(f"{len(paths)} new files")
+                try:
+                    plan = self.plan_entries([FileEntry(path) for path in paths])
+                    self.finish_plan(plan, self.session_journal(plan))
+                except OSError as e:
+                    # Usually a file that was removed again before we got to it
+                    self.log(f"Error sorting new files: {str(e)}", ERROR)
+
+    def session_journal(self, plan):
+        # Each batch of arrivals goes into the journal of the pass that
+        # started watching, so one undo takes back the whole session. A
+        # session journal that was undone or pruned meanwhile is not reused.
+        from journal import MoveJournal, STATUS_COMPLETE, read_header
+
+        if self.dry_run or self.journal_path is None:
+            return None
+        try:
+            header = read_header(self.journal_path)
+        except (OSError, ValueError):
+            return None
+        if header is None or header.status != STATUS_COMPLETE:
+            return None
+        journal = MoveJournal(self.journal_path)
+        journal.extend(plan)
+        return journal
+
+    def plan_entries(self, entries):
+        raise NotImplementedError
+
+    def extract(self, entries, on_record=None):
+        from metadata_cache import extract_metadata_cached
+
+        return extract_metadata_cached([e.path for e in entries], self.cache, self.exif_pool,
+                                       on_record=on_record, workers=self.workers,
+                                       use_processes=self.use_processes,
+                                       stats={e.path: e.stat() for e in entries},
+                                       process_executor=self.process_executor)
+
+class LocationSortJob(MetadataSortJob):
+    mode = 'location'
+
+    # Files without GPS are held back until the whole pass is read, then take
+    # the place of the geotagged file nearest in time from the same event if it
+    # is within infer_within seconds (0 turns this off)
+    def __init__(self, folder_path, workers=0, use_processes=False, dry_run=False, plan_path=None,
+                 watch=False, settle=None, polling=False, infer_within=None, on_output=None, on_progress=None):
+        super().__init__(folder_path, workers, use_processes, dry_run, plan_path, watch, settle, polling,
+                         on_output, on_progress)
+        self.infer_within = infer_within
+
+    def plan_options(self):
+        return {'infer_within': self.infer_within}
+
+    def setup(self):
+        from geocoder import load_geocoder
+
+        self.geocoder = None
+        super().setup()
+        if self.needs_geocoder():
+            self.geocoder = load_geocoder(log=self.log)
+
+    def needs_geocoder(self):
+        return True
+
+    def cleanup(self):
+        if self.geocoder is not None:
+            self.geocoder.close()
+        super().cleanup()
+
+    def build_plan(self):
+        plan = self.start_planning()
+        scanner = DirectoryScanner(self.folder_path)
+
+        for batch in iter_batches(scanner, SCAN_BATCH_SIZE):
+            self.known = scanner.scanned
+            self.plan_batch(plan, batch)
+
+        self.plan_geotagged(plan, wait=True)
+        self.plan_untagged(plan)
+
+        if scanner.scanned == 0:
+            self.log("No files found to sort")
+        else:
+            self.log(f"Total files processed: {scanner.scanned}")
+        self.report_unsupported()
+        return plan
+
+    def plan_entries(self, entries):
+        plan = self.start_planning()
+        self.known = len(entries)
+        self.plan_batch(plan, entries)
+        self.plan_geotagged(plan, wait=True)
+        self.plan_untagged(plan)
+        self.report_unsupported()
+        return plan
+
+    def start_planning(self):
+        # Lookups are submitted as soon as each file's metadata is known, so
+        # geocoding overlaps with scanning and extracting the remaining files
+        self.lookups = {}
+        self.pending_lookups = {}
+        self.records = {}
+        self.untagged = []
+        self.inferred = {}
+        self.unsupported_formats = set()
+        self.known = 0
+        return MovePlan(self.folder_path, self.mode)
+
+    def plan_batch(self, plan, batch):
+        from constants import SUPPORTED_MEDIA_FORMATS
+
+        media = [e for e in batch if os.path.splitext(e.name)[1].lower() in SUPPORTED_MEDIA_FORMATS]
+        self.records.update(self.extract(media, on_record=self.submit_lookup))
+
+        for entry in batch:
+            if entry.path in self.lookups:
+                continue
+            file_extension = os.path.splitext(entry.name)[1].lower()
+            record = self.records.get(entry.path)
+            if record is not None and not record.gps and self.geocoder is not None and self.infer_within != 0:
+                self.untagged.append(entry.path)
+                continue
+            if file_extension in SUPPORTED_MEDIA_FORMATS:
+                self.plan_media(plan, entry.path)
+            else:
+                self.log(f"Unsupported file: {entry.name}", WARNING)
+                plan.add_to_folder(entry.path, 'Not Supported', 'unsupported')
+                self.unsupported_formats.add(file_extension)
+            self.planning_progress(len(plan), self.known)
+
+        self.plan_geotagged(plan, wait=False)
+
+    def report_unsupported(self):
+        if self.unsupported_formats:
+            unsupported_str = "\nUnsupported file formats encountered:\n"
+            unsupported_str += "\n".join([f"- {format}" for format in self.unsupported_formats])
+            self.log(unsupported_str, WARNING)
+
+    def submit_lookup(self, record):
+        if record.gps:
+            future = self.recorder.submit('geocode', self.geocoder.submit, *record.gps)
+            self.lookups[record.path] = future
+            self.pending_lookups[future] = record.path
+
+    def plan_geotagged(self, plan, wait):
+        from concurrent.futures import as_completed
+
+        # Geotagged files are planned in the order their lookups complete
+        if wait:
+            ready = as_completed(list(self.pending_lookups))
+        else:
+            ready = [future for future in self.pending_lookups if future.done()]
+
+        for future in ready:
+            self.plan_media(plan, self.pending_lookups.pop(future))
+            self.planning_progress(len(plan), self.known)
+
+    def plan_untagged(self, plan):
+        import numpy as np
+        from events import INFER_TOLERANCE, nearest_geotagged
+
+        untagged, self.untagged = self.untagged, []
+        tolerance = INFER_TOLERANCE if self.infer_within is None else self.infer_within
+        located = [path for path in self.lookups if path not in self.inferred]
+        if untagged and located:
+            # Only capture times count: a file's mtime says when it was copied,
+            # which would pair it with whatever was copied alongside it
+            times = []
+            for path in located + untagged:
+                taken = self.records[path].datetime
+                try:
+                    times.append(taken.timestamp() if taken is not None else np.nan)
+                except (OSError, OverflowError, ValueError):
+                    times.append(np.nan)
+            # Files without a usable time can only map to themselves, and stay in Unknown
+            times = np.array(times)
+            known = ~np.isnan(times)
+            lat = np.full(len(times), np.nan)
+            lon = np.full(len(times), np.nan)
+            lat[:len(located)], lon[:len(located)] = np.array([self.records[path].gps for path in located]).T
+
+            donors = np.full(len(times), -1, dtype=np.int64)
+            indices = np.flatnonzero(known)
+            found = nearest_geotagged(times[known], lat[known], lon[known], tolerance)
+            donors[indices[found >= 0]] = indices[found[found >= 0]]
+
+            for path, donor in zip(untagged, donors[len(located):].tolist()):
+                if donor >= 0:
+                    self.lookups[path] = self.lookups[located[donor]]
+                    self.inferred[path] = located[donor]
+            self.log(f"Located {len(self.inferred)} of {len(untagged)} files without GPS from files taken "
+                     f"nearby in time")
+
+        for file_path in untagged:
+            self.plan_media(plan, file_path)
+            self.planning_progress(len(plan), self.known)
+
+    def plan_media(self, plan, file_path):
+        from constants import IMAGE_FORMATS, VIDEO_FORMATS
+        from metadata import MediaMetadata
+
+        file_name = os.path.basename(file_path)
+        file_extension = os.path.splitext(file_path)[1].lower()
+
+        if file_extension not in IMAGE_FORMATS and file_extension not in VIDEO_FORMATS:
+            self.log(f"Unsupported file: {file_name}", WARNING)
+            plan.add_to_folder(file_path, 'Not Supported', 'unsupported')
+            return
+
+        record = self.records.get(file_path) or MediaMetadata(file_path)
+        self.log(f"Metadata: {record!r}", DEBUG)
+        coordinates = record.gps
+
+        if file_path in self.inferred:
+            donor = os.path.basename(self.inferred[file_path])
+            self.log(f"No location information found for {file_name}, using {donor} taken nearby", DEBUG)
+
+            city = self.lookups[file_path].result()
+            self.log(f"City: {city}", DEBUG)
+
+            plan.add_to_folder(file_path, city, f"near {donor}")
+        elif coordinates:
+            lat, lon = coordinates
+            self.log(f"File: {file_name}", DEBUG)
+            self.log(f"GPS Coordinates: {lat}, {lon}", DEBUG)
+
+            city = self.lookups[file_path].result()
+            self.log(f"City: {city}", DEBUG)
+
+            plan.add_to_folder(file_path, city, 'gps')
+        else:
+            self.log(f"No location information found for {file_name}", DEBUG)
+            plan.add_to_folder(file_path, 'Unknown', 'no gps')
+
+class MultiSortJob(LocationSortJob):
+    mode = 'multi'
+
+    # Builds nested folders such as Country/City/Year/Month from one metadata
+    # pass; the location sort's streaming lookups are reused, but places are
+    # only looked up when one of the keys needs them
+    def __init__(self, folder_path, keys=('year', 'month'), workers=0, use_processes=False, dry_run=False,
+                 plan_path=None, watch=False, settle=None, polling=False, infer_within=None, on_output=None,
+                 on_progress=None):
+        from sort_keys import parse_sort_keys
+
+        super().__init__(folder_path, workers, use_processes, dry_run, plan_path, watch, settle, polling,
+                         infer_within, on_output, on_progress)
+        self.keys = parse_sort_keys(keys) if isinstance(keys, str) else list(keys)
+
+    def plan_options(self):
+        return dict(super().plan_options(), keys=self.keys)
+
+    def needs_geocoder(self):
+        from sort_keys import needs_place
+
+        return needs_place(self.keys)
+
+    def submit_lookup(self, record):
+        if record.gps and self.geocoder is not None:
+            future = self.recorder.submit('geocode', self.geocoder.submit_place, *record.gps)
+            self.lookups[record.path] = future
+            self.pending_lookups[future] = record.path
+
+    def plan_media(self, plan, file_path):
+        from metadata import MediaMetadata
+        from sort_keys import destination_folders
+
+        record = self.records.get(file_path) or MediaMetadata(file_path)
+        lookup = self.lookups.get(file_path)
+        try:
+            folders = destination_folders(self.keys, record, lookup.result() if lookup else None)
+        except Exception as e:
+            self.log(f"Error processing {os.path.basename(file_path)}: {str(e)}", ERROR)
+            return
+        plan.add_to_folder(file_path, os.path.join(*folders), '/'.join(folders))
+
+class ClusterSortJob(MetadataSortJob):
+    mode = 'cluster'
+
+    # Groups geotagged files by distance rather than by nearest city, then
+    # names each cluster with a single reverse geocode
+    def __init__(self, folder_path, workers=0, use_processes=False, dry_run=False, plan_path=None,
+                 watch=False, settle=None, polling=False, radius_km=None, min_samples=1,
+                 on_output=None, on_progress=None):
+        from clustering import check_radius
+
+        super().__init__(folder_path, workers, use_processes, dry_run, plan_path, watch, settle, polling,
+                         on_output, on_progress)
+        if radius_km is not None:
+            check_radius(radius_km)
+        if min_samples < 1:
+            raise ValueError(f"Files needed to start a cluster must be at least 1, not {min_samples}")
+        self.radius_km = radius_km
+        self.min_samples = min_samples
+        self.geocoder = None
+
+    def plan_options(self):
+        return {'radius_km': self.radius_km, 'min_samples': self.min_samples}
+
+    def setup(self):
+        from geocoder import load_geocoder
+
+        super().setup()
+        self.geocoder = load_geocoder(log=self.log)
+
+    def cleanup(self):
+        if self.geocoder is not None:
+            self.geocoder.close()
+        super().cleanup()
+
+    def build_plan(self):
+        plan = MovePlan(self.folder_path, self.mode)
+        scanner = DirectoryScanner(self.folder_path)
+        located = []
+
+        for batch in iter_batches(scanner, SCAN_BATCH_SIZE):
+            self.plan_batch(plan, batch, scanner.scanned, located)
+        self.plan_clusters(plan, located)
+
+        self.log(f"Planned {len(plan)} moves ({scanner.scanned} scanned)")
+        return plan
+
+    def plan_entries(self, entries):
+        plan = MovePlan(self.folder_path, self.mode)
+        located = []
+        self.plan_batch(plan, entries, len(entries), located)
+        self.plan_clusters(plan, located)
+        return plan
+
+    def plan_batch(self, plan, batch, known, located):
+        from constants import SUPPORTED_MEDIA_FORMATS
+
+        media = [e for e in batch if os.path.splitext(e.name)[1].lower() in SUPPORTED_MEDIA_FORMATS]
+        records = self.extract(media)
+
+        for entry in batch:
+            record = records.get(entry.path)
+            if os.path.splitext(entry.name)[1].lower() not in SUPPORTED_MEDIA_FORMATS:
+                self.log(f"Unsupported file: {entry.name}", WARNING)
+                plan.add_to_folder(entry.path, 'Not Supported', 'unsupported')
+            elif record is not None and record.gps:
+                located.append((entry.path,) + tuple(record.gps))
+            else:
+                self.log(f"No location information found for {entry.name}", DEBUG)
+                plan.add_to_folder(entry.path, 'Unknown', 'no gps')
+            self.planning_progress(len(plan) + len(located), known)
+
+    def plan_clusters(self, plan, located):
+        import numpy as np
+        from clustering import DEFAULT_RADIUS_KM, cluster_representatives, dbscan
+        from sort_keys import UNKNOWN, safe_folder_name
+
+        if not located:
+            return
+        radius_km = DEFAULT_RADIUS_KM if self.radius_km is None else self.radius_km
+        lat = np.array([lat for _, lat, _ in located])
+        lon = np.array([lon for _, _, lon in located])
+
+        labels = dbscan(lat, lon, radius_km, self.min_samples)
+        # Points too isolated to join a cluster are named on their own
+        noise = labels < 0
+        labels[noise] = labels.max(initial=-1) + 1 + np.arange(noise.sum())
+
+        # Submit every cluster's lookup first so slow online lookups overlap
+        representatives = cluster_representatives(lat, lon, labels)
+        lookups = {label: self.recorder.submit('geocode', self.geocoder.submit, float(lat[i]), float(lon[i]))
+                   for label, i in representatives.items()}
+        self.log(f"{len(located)} geotagged files in {len(lookups)} clusters")
+
+        # Clusters with the same name, Unknown among them, still get a folder
+        # each: the largest keeps the plain name, the rest are numbered. The
+        # folders for files without GPS or support are never shared either.
+        sizes = np.bincount(labels)
+        folders = {}
+        taken = {UNKNOWN.casefold(), 'not supported'}
+        for label in sorted(lookups, key=lambda label: (-sizes[label], label)):
+            name = folder = safe_folder_name(lookups[label].result())
+            number = 1
+            while folder.casefold() in taken:
+                number += 1
+                folder = f"{name} {number}"
+            taken.add(folder.casefold())
+            folders[label] = folder
+
+        for (file_path, _, _), label in zip(located, labels.tolist()):
+            plan.add_to_folder(file_path, folders[label], f"cluster {label}")
+
+class TimeSortJob(MetadataSortJob):
+    mode = 'time'
+
+    def build_plan(self):
+        plan = MovePlan(self.folder_path, self.mode)
+        scanner = DirectoryScanner(self.folder_path)
+
+        for batch in iter_batches(scanner, SCAN_BATCH_SIZE):
+            self.plan_batch(plan, batch, scanner.scanned)
+
+        self.log(f"Planned {len(plan)} moves ({scanner.scanned} scanned)")
+        return plan
+
+    def plan_entries(self, entries):
+        plan = MovePlan(self.folder_path, self.mode)
+        self.plan_batch(plan, entries, len(entries))
+        return plan
+
+    def plan_batch(self, plan, batch, known):
+        records = self.extract(batch)
+
+        for entry in batch:
+            try:
+                date = records[entry.path].creation_time
+                year_month = date.strftime("%b, %y")
+                plan.add_to_folder(entry.path, year_month, date.isoformat())
+            except Exception as e:
+                self.log(f"Error processing {entry.name}: {str(e)}", ERROR)
+            self.planning_progress(len(plan), known)
+
+class TagSortJob(MetadataSortJob):
+    mode = 'tag'
+
+    # Routes files into folders by keyword, looked up in the tag index, so
+    # only files that are new or changed since the last run are read. With
+    # tags given, a file goes to the first of them it carries, and
+    # hierarchical keywords nest (People picks People/Family/Anna); without,
+    # to its keyword most common in the folder. Sidecars move with their file.
+    def __init__(self, folder_path, tags=None, workers=0, use_processes=False, dry_run=False, plan_path=None,
+                 watch=False, settle=None, polling=False, recursive=False, on_output=None, on_progress=None):
+        from tags import parse_tag_list
+
+        super().__init__(folder_path, workers, use_processes, dry_run, plan_path, watch, settle, polling,
+                         on_output, on_progress)
+        self.tags = parse_tag_list(tags) if isinstance(tags, str) else list(tags or [])
+        self.recursive = recursive
+        self.index = None
+
+    def plan_options(self):
+        return {'tags': self.tags, 'recursive': self.recursive}
+
+    def setup(self):
+        from metadata_cache import MetadataCache
+        from tags import TagIndex
+
+        # Only the index is needed, not exiftool or the metadata records
+        self.cache = MetadataCache()
+        self.index = TagIndex(self.cache)
+
+    def cleanup(self):
+        if self.index is not None:
+            self.log(self.index.summary())
+        if self.cache is not None:
+            self.cache.close()
+
+    def build_plan(self):
+        scanner = DirectoryScanner(self.folder_path, recursive=self.recursive, workers=self.workers)
+        # Sidecars can be listed anywhere in the folder, so pair them up first
+        plan = self.plan_entries(list(scanner))
+        self.log(f"Planned {len(plan)} moves ({scanner.scanned} scanned)")
+        return plan
+
+    def plan_entries(self, entries):
+        from collections import Counter
+        from constants import SUPPORTED_MEDIA_FORMATS
+        from tags import SIDECAR_EXTENSION, match_sidecars
+
+        plan = MovePlan(self.folder_path, self.mode)
+        media = [e for e in entries if os.path.splitext(e.name)[1].lower() in SUPPORTED_MEDIA_FORMATS]
+        media_paths = [e.path for e in media]
+        sidecars = match_sidecars([e.path for e in entries], media_paths)
+
+        def on_error(file_path, error):
+            self.log(f"Error reading tags of {os.path.basename(file_path)}: {str(error)}", ERROR)
+
+        with self.recorder.stage('index'):
+            self.index.update(media_paths, sidecars, {e.path: e.stat() for e in media}, self.workers, on_error)
+            tags = self.index.tags_for(media_paths)
+        counts = Counter(tag for file_tags in tags.values() for tag in file_tags)
+
+        paired = set(sidecars.values())
+        taken = set()
+        for done, entry in enumerate(entries, 1):
+            file_extension = os.path.splitext(entry.name)[1].lower()
+            if entry.path in paired or file_extension == SIDECAR_EXTENSION:
+                # Sidecars without a media file are left where they are
+                continue
+            if file_extension not in SUPPORTED_MEDIA_FORMATS:
+                self.log(f"Unsupported file: {entry.name}", WARNING)
+                if not self.recursive:
+                    self.add_move(plan, entry.path, 'Not Supported', 'unsupported', taken)
+                continue
+
+            folders = self.tag_folders(tags.get(entry.path, []), counts)
+            reason = '|'.join(folders) if folders else 'no tags'
+            move = self.add_move(plan, entry.path, os.path.join(*folders) if folders else 'Untagged', reason,
+                                 taken)
+            sidecar = sidecars.get(entry.path)
+            if move is not None and sidecar:
+                plan.add(sidecar, self.sidecar_destination(sidecar, move), 'sidecar')
+            self.planning_progress(done, len(entries))
+        return plan
+
+    def tag_folders(self, file_tags, counts):
+        from sort_keys import safe_folder_name
+        from tags import tag_folders, tag_matches
+
+        chosen = None
+        if self.tags:
+            for wanted in self.tags:
+                matches = [tag for tag in file_tags if tag_matches(tag, wanted)]
+                if matches:
+                    # The deepest keyword gives the most specific folder
+                    chosen = max(matches, key=lambda tag: (len(tag_folders(tag)), tag))
+                    break
+        elif file_tags:
+            chosen = min(file_tags, key=lambda tag: (-counts[tag], tag))
+        return [safe_folder_name(folder) for folder in tag_folders(chosen)] if chosen else []
+
+    def add_move(self, plan, source, folder, reason, taken):
+        # Destinations are under the folder being sorted, numbered when the
+        # name is taken; files already in place are not moved
+        directory = os.path.join(self.folder_path, folder)
+        base_name, ext = os.path.splitext(os.path.basename(source))
+        destination = os.path.join(directory, os.path.basename(source))
+        number = 1
+        while destination != source and (destination in taken or os.path.exists(destination)):
+            number += 1
+            destination = os.path.join(directory, f"{base_name} {number}{ext}")
+        if destination == source:
+            return None
+        taken.add(destination)
+        return plan.add(source, destination, reason)
+
+    def sidecar_destination(self, sidecar, move):
+        # Keep the sidecar's naming scheme (IMG_1.xmp or IMG_1.jpg.xmp) if the file was renumbered
+        name = os.path.basename(move.source)
+        new_name = os.path.basename(move.destination)
+        sidecar_name = os.path.basename(sidecar)
+        if not sidecar_name.lower().startswith(name.lower()):
+            name, new_name = os.path.splitext(name)[0], os.path.splitext(new_name)[0]
+        return os.path.join(os.path.dirname(move.destination), new_name + sidecar_name[len(name):])
+
+class FlattenJob(SortJob):
+    mode = 'flatten'
+
+    # duplicates: 'keep' renames identical copies like any other name
+    # collision, 'skip' leaves them where they are, 'hardlink' flattens them
+    # as hard links to the kept copy and 'move' puts them in a Duplicates folder
+    def __init__(self, folder_path, workers=0, dry_run=False, plan_path=None, duplicates='keep',
+                 on_output=None, on_progress=None):
+        super().__init__(folder_path, workers, dry_run, plan_path, on_output, on_progress)
+        self.duplicates = duplicates
+        self.duplicate_groups = []
+
+    def plan_options(self):
+        return {'duplicates': self.duplicates}
+
+    def build_plan(self):
+        plan = MovePlan(self.folder_path, self.mode)
+        file_counts = {}
+        scanner = DirectoryScanner(self.folder_path, recursive=True, include_hidden=True, workers=self.workers)
+
+        entries = scanner
+        duplicate_of = {}
+        if self.duplicates != 'keep':
+            from dedupe import DUPLICATES_FOLDER
+
+            duplicates_dir = os.path.join(self.folder_path, DUPLICATES_FOLDER)
+            entries = [e for e in scanner if os.path.dirname(e.path) != duplicates_dir]
+            duplicate_of = self.find_duplicates(entries)
+            duplicate_counts = {}
+
+        for done, entry in enumerate(entries, 1):
+            file = entry.name
+            src_path = entry.path
+
+            if src_path in duplicate_of and self.duplicates == 'skip':
+                pass
+            elif src_path in duplicate_of and self.duplicates == 'move':
+                dest_path = plan.free_destination(src_path,
+                                                  self.unique_destination(duplicate_counts, duplicates_dir, file))
+                plan.add(src_path, dest_path, 'duplicate')
+            else:
+                dest_path = plan.free_destination(src_path,
+                                                  self.unique_destination(file_counts, self.folder_path, file))
+                # Top-level files whose name needs no change are already in place
+                if dest_path != src_path:
+                    plan.add(src_path, dest_path, 'duplicate' if src_path in duplicate_of else 'flatten')
+            # Counts every file handled, so skipped duplicates advance the bar too
+            self.planning_progress(done, scanner.scanned)
+
+        self.log(f"Planned {len(plan)} moves ({scanner.scanned} scanned)")
+        return plan
+
+    def unique_destination(self, file_counts, directory, file):
+        if file in file_counts:
+            file_counts[file] += 1
+            base_name, ext = os.path.splitext(file)
+            return os.path.join(directory, f"{base_name} {file_counts[file]}{ext}")
+        file_counts[file] = 0
+        return os.path.join(directory, file.replace('_', ' '))
+
+    def find_duplicates(self, entries):
+        from dedupe import find_duplicates, format_size
+
+        self.sizes = {}
+        for entry in entries:
+            try:
+                self.sizes[entry.path] = entry.stat().st_size
+            except OSError as e:
+                self.log(f"Error reading {entry.name}: {str(e)}", ERROR)
+
+        self.log(f"Checking {len(self.sizes)} files for duplicates")
+        self.duplicate_groups = find_duplicates(
+            self.sizes, self.workers,
+            on_progress=lambda done, total: self.report_progress(int(done / max(1, total) * 50), done, total))
+
+        duplicate_of = {}
+        for keeper, *copies in self.duplicate_groups:
+            for copy in copies:
+                duplicate_of[copy] = keeper
+                self.log(f"{os.path.relpath(copy, self.folder_path)} is a copy of "
+                         f"{os.path.relpath(keeper, self.folder_path)}", DEBUG)
+
+        duplicate_bytes = sum(self.sizes[copy] for copy in duplicate_of)
+        self.log(f"Found {len(duplicate_of)} duplicates in {len(self.duplicate_groups)} groups, "
+                 f"{format_size(duplicate_bytes)} reclaimable")
+        return duplicate_of
+
+    def finish_plan(self, plan, journal=None):
+        super().finish_plan(plan, journal)
+        if self.duplicates == 'hardlink' and not self.dry_run:
+            self.link_duplicates(plan)
+
+    def link_duplicates(self, plan):
+        from dedupe import link_duplicate, format_size
+
+        destinations = {move.source: move.destination for move in plan}
+        linked = 0
+        reclaimed = 0
+        for keeper, *copies in self.duplicate_groups:
+            keeper_path = destinations.get(keeper, keeper)
+            for copy in copies:
+                copy_path = destinations.get(copy, copy)
+                if not os.path.exists(copy_path):
+                    continue
+                try:
+                    if link_duplicate(keeper_path, copy_path):
+                        linked += 1
+                        reclaimed += self.sizes[copy]
+                except OSError as e:
+                    self.log(f"Error linking {os.path.basename(copy_path)}: {str(e)}", ERROR)
+
+        if self.duplicate_groups:
+            self.log(f"Hard linked {linked} duplicates, {format_size(reclaimed)} reclaimed")
+
+class SimilarSortJob(SortJob):
+    mode = 'similar'
+
+    def __init__(self, folder_path, workers=0, dry_run=False, plan_path=None, threshold=None, method='dhash',
+                 on_output=None, on_progress=None):
+        super().__init__(folder_path, workers, dry_run, plan_path, on_output, on_progress)
+        self.threshold = threshold
+        self.method = method
+
+    def plan_options(self):
+        return {'threshold': self.threshold, 'method': self.method}
+
+    def setup(self):
+        from metadata import register_heif_opener
+
+        register_heif_opener()
+
+    def build_plan(self):
+        from constants import IMAGE_FORMATS
+        from similarity import DEFAULT_THRESHOLD, group_folder_name, group_similar, hash_images
+
+        plan = MovePlan(self.folder_path, self.mode)
+        threshold = DEFAULT_THRESHOLD if self.threshold is None else self.threshold
+        images = [entry.path for entry in DirectoryScanner(self.folder_path)
+                  if os.path.splitext(entry.name)[1].lower() in IMAGE_FORMATS]
+        if not images:
+            self.log("No images found to group")
+            return plan
+
+        self.log(f"Hashing {len(images)} images")
+        paths, hashes = hash_images(
+            images, self.method, self.workers,
+            on_progress=lambda done, total: self.report_progress(int(done / max(1, total) * 45), done, total))
+        if len(paths) < len(images):
+            self.log(f"{len(images) - len(paths)} images could not be read", WARNING)
+
+        groups = group_similar(paths, hashes, threshold)
+        for group in groups:
+            folder_name = group_folder_name(group)
+            for file_path in group:
+                plan.add_to_folder(file_path, folder_name, 'similar')
+        self.planning_progress(len(plan), len(plan))
+
+        self.log(f"Found {len(groups)} groups of similar images covering {len(plan)} files")
+        return plan
+
+class UndoJob(SortJob):
+    mode = 'undo'
+
+    def setup(self):
+        from metadata_cache import MetadataCache
+
+        # Keeps cached metadata following the files back to where they were
+        self.cache = MetadataCache()
+
+    def cleanup(self):
+        if self.cache is not None:
+            self.cache.close()
+
+    def sort(self):
+        from journal import MoveJournal, STATUS_UNDONE, find_undoable
+
+        state = find_undoable(self.folder_path)
+        if state is None:
+            self.log("Nothing to undo")
+            return
+
+        plan = state.undo_plan()
+        self.planned += len(plan)
+        self.log(f"Undoing {state.mode} run from {state.created}: {len(plan)} moves")
+
+        journal = MoveJournal(state.path)
+        try:
+            moved = self.execute(plan, journal.record_undo)
+            if moved == len(plan):
+                journal.set_status(STATUS_UNDONE)
+            else:
+                self.log(f"{len(plan) - moved} moves could not be undone", WARNING)
+        finally:
+            journal.close()
+        self.prune_journals()
+
+JOBS = {
+    'location': LocationSortJob,
+    'time': TimeSortJob,
+    'multi': MultiSortJob,
+    'cluster': ClusterSortJob,
+    'tag': TagSortJob,
+    'flatten': FlattenJob,
+    'similar': SimilarSortJob,
+    'undo': UndoJob,
+}
+
+def create_job(mode, folder_path, **options):
+    try:
+        job_class = JOBS[mode]
+    except KeyError:
+        raise ValueError(f"Unknown sort mode: {mode}")
+    return job_class(folder_path, **options)
+
+def run_job(mode, folder_path, **options):
+    job = create_job(mode, folder_path, **options)
+    job.run()
+    return job
\ No newline at end of file
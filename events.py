@@ -0,0 +1,70 @@
+import numpy as np
+from clustering import haversine_km
+
+# Event segmentation on the capture timeline. A camera without GPS shooting
+# next to a geotagged phone is at the same place, so files are sorted by time
+# once, split into events wherever the timeline has a long pause or the
+# geotagged files jump far apart, and files without a location borrow one from
+# the geotagged file nearest in time within their event.
+
+EVENT_GAP = 3 * 60 * 60
+EVENT_MOVE_KM = 50.0
+INFER_TOLERANCE = 60 * 60
+
+def split_events(times, lat, lon, max_gap=EVENT_GAP, max_move_km=EVENT_MOVE_KM):
+    """Event number for each point of time sorted arrays; lat/lon are NaN where unknown."""
+    starts = np.r_[True, np.diff(times) > max_gap]
+
+    tagged = np.flatnonzero(~np.isnan(lat))
+    if len(tagged) > 1:
+        before, after = tagged[:-1], tagged[1:]
+        moved = haversine_km(np.radians(lat[before]), np.radians(lon[before]),
+                             np.radians(lat[after]), np.radians(lon[after])) > max_move_km
+        before, after = before[moved], after[moved]
+        # The untagged files between two distant fixes go with the nearer one in time
+        middle = np.searchsorted(times, (times[before] + times[after]) / 2)
+        starts[np.clip(middle, before + 1, after)] = True
+
+    return np.cumsum(starts) - 1
+
+def nearest_geotagged(times, lat, lon, tolerance=INFER_TOLERANCE, max_gap=EVENT_GAP,
+                      max_move_km=EVENT_MOVE_KM):
+    """Index of the geotagged point each point takes its location from.
+
+    `times` are in seconds and lat/lon are NaN for points without a location.
+    Geotagged points map to themselves; the rest map to the geotagged point
+    nearest in time in the same event, if it is at most `tolerance` seconds
+    away, and to -1 otherwise. One sort, then linear passes over the arrays.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    count = len(times)
+    donors = np.full(count, -1, dtype=np.int64)
+    if count == 0:
+        return donors
+
+    order = np.argsort(times, kind='stable')
+    times, lat, lon = times[order], lat[order], lon[order]
+    events = split_events(times, lat, lon, max_gap, max_move_km)
+
+    # Position of the closest geotagged point at or before, and at or after,
+    # every position in the timeline
+    positions = np.arange(count)
+    tagged = ~np.isnan(lat)
+    previous = np.maximum.accumulate(np.where(tagged, positions, -1))
+    following = np.minimum.accumulate(np.where(tagged, positions, count)[::-1])[::-1]
+
+    best = np.full(count, -1, dtype=np.int64)
+    best_gap = np.full(count, np.inf)
+    for candidate in (previous, following):
+        valid = (candidate >= 0) & (candidate < count)
+        safe = np.where(valid, candidate, 0)
+        gap = np.abs(times[safe] - times)
+        better = valid & (events[safe] == events) & (gap <= tolerance) & (gap < best_gap)
+        best[better] = candidate[better]
+        best_gap[better] = gap[better]
+
+    found = best >= 0
+    donors[order[found]] = order[best[found]]
+    return donors
\ No newline at end of file
@@ -0,0 +1,459 @@
+import mmap
+import os
+import re
+import struct
+from datetime import datetime, timedelta
+
+JPEG_SCAN_LIMIT = 256 * 1024
+HEIF_BOX_LIMIT = 4 * 1024 * 1024
+QUICKTIME_BOX_LIMIT = 1024 * 1024
+
+TAG_IMAGE_WIDTH = 0x0100
+TAG_IMAGE_LENGTH = 0x0101
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+HEIF_BRANDS = {b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1', b'avif'}
+
+# Atoms an MP4/MOV file can start with; older QuickTime files have no ftyp
+QUICKTIME_ATOMS = {b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'}
+QUICKTIME_EPOCH = datetime(1904, 1, 1)
+# udta atoms (Android, cameras) and Apple mdta keys we read, by field
+UDTA_FIELDS = {b'\xa9xyz': 'location', b'\xa9mod': 'model', b'\xa9mak': 'make'}
+MDTA_FIELDS = {
+    b'com.apple.quicktime.location.ISO6709': 'location',
+    b'com.apple.quicktime.model': 'model',
+    b'com.apple.quicktime.make': 'make',
+    b'com.apple.quicktime.creationdate': 'creationdate',
+}
+# Decimal degree ISO 6709, e.g. +48.8584+002.2945+035.000/
+ISO6709_PATTERN = re.compile(r'([+-]\d{1,2}(?:\.\d*)?)([+-]\d{1,3}(?:\.\d*)?)')
+
+class HeaderParseError(Exception):
+    pass
+
+def read_exif_header(file_path):
+    # Returns {'format', 'width', 'height', 'exif'} where 'exif' is a piexif-style
+    # {"0th", "Exif", "GPS"} dict, or None if the container is not handled here
+    with open(file_path, 'rb') as f:
+        head = f.read(16)
+        if head[:2] == b'\xff\xd8':
+            return read_jpeg(f)
+        if head[:4] in (b'II*\x00', b'MM\x00*'):
+            return read_tiff(f)
+        if head[:8] == b'\x89PNG\r\n\x1a\n':
+            return read_png(f)
+        if head[4:8] == b'ftyp' and head[8:12] in HEIF_BRANDS:
+            return read_heif(f)
+    return None
+
+def read_jpeg(f):
+    result = {'format': 'JPEG', 'width': None, 'height': None, 'exif': None}
+    pos = 2
+
+    while pos < JPEG_SCAN_LIMIT:
+        f.seek(pos)
+        header = f.read(4)
+        if len(header) < 4 or header[0] != 0xFF:
+            break
+        marker = header[1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0xD9, 0xDA):
+            break
+        length = struct.unpack('>H', header[2:4])[0]
+
+        if marker == 0xE1 and result['exif'] is None:
+            payload = f.read(length - 2)
+            if payload[:6] == b'Exif\x00\x00':
+                result['exif'] = parse_tiff(payload, 6)
+        elif marker in SOF_MARKERS:
+            sof = f.read(5)
+            result['height'], result['width'] = struct.unpack('>HH', sof[1:5])
+            break
+
+        pos += 2 + length
+
+    return result
+
+def read_tiff(f):
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        exif = parse_tiff(buf, 0)
+    zeroth = exif.get("0th", {})
+    return {'format': 'TIFF', 'width': zeroth.get(TAG_IMAGE_WIDTH),
+            'height': zeroth.get(TAG_IMAGE_LENGTH), 'exif': exif}
+
+def read_png(f):
+    result = {'format': 'PNG', 'width': None, 'height': None, 'exif': None}
+    pos = 8
+
+    while True:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type == b'IHDR':
+            result['width'], result['height'] = struct.unpack('>II', f.read(8))
+        elif chunk_type == b'eXIf':
+            result['exif'] = parse_tiff(f.read(length), 0)
+        elif chunk_type in (b'IDAT', b'IEND'):
+            break
+        pos += 12 + length
+
+    return result
+
+def iter_boxes(f, start, end):
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            return
+        yield box_type, pos + header_size, pos + size
+        pos += size
+
+def read_heif(f):
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+
+    for box_type, start, end in iter_boxes(f, 0, file_size):
+        if box_type == b'meta':
+            if end - start > HEIF_BOX_LIMIT:
+                raise HeaderParseError("HEIF meta box is too large")
+            f.seek(start)
+            # meta is a FullBox, so children start after version and flags
+            return parse_heif_meta(f, f.read(end - start))
+
+    return None
+
+def parse_heif_meta(f, meta):
+    exif_item = None
+    locations = {}
+    sizes = []
+
+    pos = 4
+    while pos + 8 <= len(meta):
+        size, box_type = struct.unpack_from('>I4s', meta, pos)
+        if size < 8:
+            break
+        body = meta[pos + 8:pos + size]
+        if box_type == b'iinf':
+            exif_item = find_exif_item(body)
+        elif box_type == b'iloc':
+            locations = parse_iloc(body)
+        elif box_type == b'iprp':
+            sizes = find_ispe_sizes(body)
+        pos += size
+
+    result = {'format': 'HEIF', 'width': None, 'height': None, 'exif': None}
+    if sizes:
+        result['width'], result['height'] = max(sizes, key=lambda s: s[0] * s[1])
+
+    if exif_item is not None and exif_item in locations:
+        offset, length = locations[exif_item]
+        f.seek(offset)
+        payload = f.read(length)
+        if len(payload) >= 4:
+            tiff_start = 4 + struct.unpack('>I', payload[:4])[0]
+            result['exif'] = parse_tiff(payload, tiff_start)
+
+    return result
+
+def find_exif_item(iinf):
+    version = iinf[0]
+    pos = 6 if version == 0 else 8
+    while pos + 8 <= len(iinf):
+        size, box_type = struct.unpack_from('>I4s', iinf, pos)
+        if size < 8:
+            break
+        if box_type == b'infe':
+            infe_version = iinf[pos + 8]
+            if infe_version >= 2:
+                if infe_version == 2:
+                    item_id = struct.unpack_from('>H', iinf, pos + 12)[0]
+                    type_pos = pos + 16
+                else:
+                    item_id = struct.unpack_from('>I', iinf, pos + 12)[0]
+                    type_pos = pos + 18
+                if iinf[type_pos:type_pos + 4] == b'Exif':
+                    return item_id
+        pos += size
+    return None
+
+def parse_iloc(iloc):
+    version = iloc[0]
+    offset_size = iloc[4] >> 4
+    length_size = iloc[4] & 0x0F
+    base_offset_size = iloc[5] >> 4
+    index_size = iloc[5] & 0x0F if version in (1, 2) else 0
+    pos = 6
+
+    def read_uint(size):
+        nonlocal pos
+        if size == 0:
+            return 0
+        value = int.from_bytes(iloc[pos:pos + size], 'big')
+        pos += size
+        return value
+
+    if version < 2:
+        item_count = read_uint(2)
+    else:
+        item_count = read_uint(4)
+
+    locations = {}
+    for _ in range(item_count):
+        item_id = read_uint(2 if version < 2 else 4)
+        construction_method = 0
+        if version in (1, 2):
+            construction_method = read_uint(2) & 0x0F
+        read_uint(2)  # data_reference_index
+        base_offset = read_uint(base_offset_size)
+        extent_count = read_uint(2)
+        extents = []
+        for _ in range(extent_count):
+            read_uint(index_size)
+            extents.append((base_offset + read_uint(offset_size), read_uint(length_size)))
+        if construction_method == 0 and len(extents) == 1:
+            locations[item_id] = extents[0]
+
+    return locations
+
+def find_ispe_sizes(iprp):
+    sizes = []
+    pos = 0
+    while pos + 8 <= len(iprp):
+        size, box_type = struct.unpack_from('>I4s', iprp, pos)
+        if size < 8:
+            break
+        if box_type == b'ipco':
+            child = pos + 8
+            while child + 8 <= pos + size:
+                child_size, child_type = struct.unpack_from('>I4s', iprp, child)
+                if child_size < 8:
+                    break
+                if child_type == b'ispe':
+                    sizes.append(struct.unpack_from('>II', iprp, child + 12))
+                child += child_size
+        pos += size
+    return sizes
+
+def read_video_header(file_path):
+    # Returns {'format', 'width', 'height', 'model', 'datetime', 'gps'} read
+    # from the moov box of an MP4/MOV file, or None if there is no moov. Only
+    # box headers and the small metadata boxes are read; mdat is skipped with
+    # a seek whether moov comes before or after it
+    with open(file_path, 'rb') as f:
+        head = f.read(12)
+        if len(head) < 8 or head[4:8] not in QUICKTIME_ATOMS:
+            return None
+        is_mp4 = head[4:8] == b'ftyp' and head[8:12] != b'qt  '
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+
+        for box_type, start, end in iter_boxes(f, 0, file_size):
+            if box_type == b'moov':
+                result = parse_moov(f, start, end)
+                result['format'] = 'MP4' if is_mp4 else 'MOV'
+                return result
+
+    return None
+
+def read_box(f, start, end):
+    if end - start > QUICKTIME_BOX_LIMIT:
+        raise HeaderParseError("QuickTime metadata box is too large")
+    f.seek(start)
+    return f.read(end - start)
+
+def iter_buffer_boxes(buf, start, end):
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', buf, pos)
+        if size < 8 or pos + size > end:
+            return
+        yield box_type, pos + 8, pos + size
+        pos += size
+
+def parse_moov(f, start, end):
+    result = {'width': None, 'height': None, 'model': None, 'datetime': None, 'gps': None}
+    fields = {}
+
+    for box_type, child_start, child_end in iter_boxes(f, start, end):
+        if box_type == b'mvhd':
+            result['datetime'] = parse_mvhd(read_box(f, child_start, min(child_end, child_start + 12)))
+        elif box_type == b'trak' and result['width'] is None:
+            for trak_type, trak_start, trak_end in iter_boxes(f, child_start, child_end):
+                if trak_type == b'tkhd':
+                    result['width'], result['height'] = parse_tkhd(read_box(f, trak_start, trak_end))
+                    break
+        elif box_type == b'udta':
+            for udta_type, udta_start, udta_end in iter_boxes(f, child_start, child_end):
+                if udta_type in UDTA_FIELDS:
+                    fields[UDTA_FIELDS[udta_type]] = parse_udta_text(read_box(f, udta_start, udta_end))
+                elif udta_type == b'meta':
+                    fields.update(parse_mdta(read_box(f, udta_start, udta_end)))
+        elif box_type == b'meta':
+            fields.update(parse_mdta(read_box(f, child_start, child_end)))
+
+    if fields.get('location'):
+        result['gps'] = parse_iso6709(fields['location'])
+    if fields.get('model') or fields.get('make'):
+        result['model'] = fields.get('model') or fields.get('make')
+    if fields.get('creationdate'):
+        # Apple's creation date is local time with an offset, which matches
+        # what photos record, so it wins over mvhd's UTC time
+        try:
+            result['datetime'] = datetime.strptime(fields['creationdate'][:19], '%Y-%m-%dT%H:%M:%S')
+        except ValueError:
+            pass
+    return result
+
+def parse_mvhd(mvhd):
+    if len(mvhd) < 12:
+        return None
+    if mvhd[0] == 1:
+        seconds = struct.unpack_from('>Q', mvhd, 4)[0]
+    else:
+        seconds = struct.unpack_from('>I', mvhd, 4)[0]
+    if seconds == 0:
+        return None
+    try:
+        return QUICKTIME_EPOCH + timedelta(seconds=seconds)
+    except OverflowError:
+        return None
+
+def parse_tkhd(tkhd):
+    # Width and height are 16.16 fixed point after the transformation matrix
+    pos = 88 if tkhd[:1] == b'\x01' else 76
+    if len(tkhd) < pos + 8:
+        return None, None
+    width, height = struct.unpack_from('>II', tkhd, pos)
+    if width == 0 or height == 0:
+        return None, None
+    return width >> 16, height >> 16
+
+def parse_udta_text(payload):
+    # Either a QuickTime string (length, language, text) or an iTunes style data box
+    if payload[4:8] == b'data':
+        text = payload[16:]
+    elif len(payload) >= 4:
+        text = payload[4:4 + struct.unpack_from('>H', payload)[0]]
+    else:
+        return None
+    return text.decode('utf-8', errors='replace').strip('\x00 ') or None
+
+def parse_mdta(meta):
+    # Apple's moov/meta lists key names in keys and their values in ilst,
+    # indexed from 1. It has no version and flags, the ISO udta/meta does
+    pos = 0 if meta[4:8] == b'hdlr' else 4
+    keys = []
+    values = {}
+
+    for box_type, start, end in iter_buffer_boxes(meta, pos, len(meta)):
+        if box_type == b'keys':
+            entry = start + 8
+            while entry + 8 <= end:
+                size = struct.unpack_from('>I', meta, entry)[0]
+                if size < 8:
+                    break
+                keys.append(bytes(meta[entry + 8:entry + size]))
+                entry += size
+        elif box_type == b'ilst':
+            for item_type, item_start, item_end in iter_buffer_boxes(meta, start, end):
+                for data_type, data_start, data_end in iter_buffer_boxes(meta, item_start, item_end):
+                    if data_type == b'data':
+                        values[item_type] = bytes(meta[data_start + 8:data_end])
+                        break
+
+    fields = {}
+    for item_type, value in values.items():
+        index = struct.unpack('>I', item_type)[0]
+        name = keys[index - 1] if 1 <= index <= len(keys) else item_type
+        field = MDTA_FIELDS.get(name) or UDTA_FIELDS.get(name)
+        if field:
+            fields[field] = value.decode('utf-8', errors='replace').strip('\x00 ') or None
+    return fields
+
+def parse_iso6709(text):
+    match = ISO6709_PATTERN.match(text)
+    if not match:
+        return None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+def parse_tiff(buf, start):
+    byte_order = bytes(buf[start:start + 2])
+    if byte_order == b'II':
+        endian = '<'
+    elif byte_order == b'MM':
+        endian = '>'
+    else:
+        raise HeaderParseError("Invalid TIFF header")
+
+    ifd0_offset = struct.unpack_from(endian + 'I', buf, start + 4)[0]
+    zeroth = parse_ifd(buf, start, start + ifd0_offset, endian)
+    exif = {"0th": zeroth, "Exif": {}, "GPS": {}}
+
+    if isinstance(zeroth.get(TAG_EXIF_IFD), int):
+        exif["Exif"] = parse_ifd(buf, start, start + zeroth[TAG_EXIF_IFD], endian)
+    if isinstance(zeroth.get(TAG_GPS_IFD), int):
+        exif["GPS"] = parse_ifd(buf, start, start + zeroth[TAG_GPS_IFD], endian)
+
+    return exif
+
+def parse_ifd(buf, start, offset, endian):
+    tags = {}
+    if offset + 2 > len(buf):
+        return tags
+
+    entry_count = struct.unpack_from(endian + 'H', buf, offset)[0]
+    for index in range(entry_count):
+        entry = offset + 2 + index * 12
+        if entry + 12 > len(buf):
+            break
+        tag, value_type, count = struct.unpack_from(endian + 'HHI', buf, entry)
+        type_size = TYPE_SIZES.get(value_type)
+        if type_size is None:
+            continue
+
+        data_size = type_size * count
+        if data_size <= 4:
+            data_offset = entry + 8
+        else:
+            data_offset = start + struct.unpack_from(endian + 'I', buf, entry + 8)[0]
+        if data_offset + data_size > len(buf):
+            continue
+
+        tags[tag] = read_value(buf, data_offset, value_type, count, endian)
+
+    return tags
+
+def read_value(buf, offset, value_type, count, endian):
+    if value_type == 2:
+        return bytes(buf[offset:offset + count]).rstrip(b'\x00')
+    if value_type in (1, 6, 7):
+        return bytes(buf[offset:offset + count])
+    if value_type in (5, 10):
+        fmt = 'I' if value_type == 5 else 'i'
+        values = struct.unpack_from(endian + fmt * (2 * count), buf, offset)
+        pairs = tuple(zip(values[::2], values[1::2]))
+        return pairs[0] if count == 1 else pairs
+
+    fmt = {3: 'H', 4: 'I', 8: 'h', 9: 'i', 11: 'f', 12: 'd'}[value_type]
+    values = struct.unpack_from(endian + fmt * count, buf, offset)
+    return values[0] if count == 1 else values
\ No newline at end of file
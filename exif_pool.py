@@ -0,0 +1,131 @@
+import atexit
+import queue
+import threading
+from contextlib import contextmanager
+import exiftool
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_BATCH_SIZE = 64
+
+class ExifToolPool:
+    def __init__(self, size=DEFAULT_POOL_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+        self.size = max(1, size)
+        self.batch_size = max(1, batch_size)
+        self._idle = queue.Queue()
+        self._sessions = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def _start_session(self):
+        et = exiftool.ExifToolHelper()
+        et.run()
+        return et
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("ExifTool pool has been shut down")
+                try:
+                    return self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+                if len(self._sessions) < self.size:
+                    et = self._start_session()
+                    self._sessions.append(et)
+                    return et
+
+            try:
+                et = self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self._lock:
+                if not self._closed:
+                    return et
+            # Shut down while waiting, so et has been terminated; the next pass raises
+
+    def release(self, et):
+        with self._lock:
+            if not self._closed and et.running:
+                self._idle.put(et)
+                return
+            if et in self._sessions:
+                self._sessions.remove(et)
+        et.terminate()
+
+    @contextmanager
+    def session(self):
+        et = self.acquire()
+        try:
+            yield et
+        finally:
+            self.release(et)
+
+    def get_metadata(self, paths):
+        if isinstance(paths, str):
+            paths = [paths]
+        paths = list(paths)
+        results = {}
+
+        with self.session() as et:
+            for start in range(0, len(paths), self.batch_size):
+                batch = paths[start:start + self.batch_size]
+                try:
+                    metadata = et.get_metadata(batch)
+                    if len(metadata) != len(batch):
+                        raise ValueError("ExifTool returned an incomplete batch")
+                    results.update(zip(batch, metadata))
+                except Exception:
+                    # A single unreadable file fails the whole batch, retry one by one
+                    for path in batch:
+                        try:
+                            results[path] = et.get_metadata(path)[0]
+                        except Exception:
+                            results[path] = {}
+
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            sessions, self._sessions = self._sessions, []
+            # Idle sessions are in `sessions` too; none may be handed out once terminated
+            while True:
+                try:
+                    self._idle.get_nowait()
+                except queue.Empty:
+                    break
+
+        for et in sessions:
+            try:
+                et.terminate()
+            except Exception:
+                pass
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+def get_shared_pool():
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None or _shared_pool._closed:
+            _shared_pool = ExifToolPool()
+            atexit.register(_shared_pool.shutdown)
+        return _shared_pool
+
+def init_worker_pool():
+    # Initializer for metadata worker processes. A forked child inherits the
+    # parent's pool, its lock and its exiftool pipes, so it gets a fresh pool
+    # of its own, shut down when the process exits
+    global _shared_pool, _shared_lock
+    from multiprocessing.util import Finalize
+
+    _shared_lock = threading.Lock()
+    _shared_pool = ExifToolPool(size=1)
+    Finalize(_shared_pool, _shared_pool.shutdown, exitpriority=10)
\ No newline at end of file
@@ -0,0 +1,170 @@
+import asyncio
+import random
+import threading
+import time
+import aiohttp
+from geocoder import Place
+from reporter import WARNING
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/reverse"
+USER_AGENT = "Media GPS Extractor/1.0"
+
+# Nominatim's usage policy allows at most one request per second
+DEFAULT_RATE = 1.0
+DEFAULT_BURST = 1
+DEFAULT_CONCURRENCY = 2
+DEFAULT_TIMEOUT = 10
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Round to ~100 m so neighbouring shots share one request
+COORDINATE_PRECISION = 3
+
+def ignore(*args):
+    pass
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.updated:
+                    await asyncio.sleep(self.updated - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        # Used when the provider asks us to back off with Retry-After
+        self.tokens = 0
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+def city_from_response(data):
+    address = data.get('address', {})
+    return address.get('city') or address.get('town') or address.get('village') or 'Unknown'
+
+def place_from_response(data, lat, lon):
+    address = data.get('address', {})
+    # Country codes match what the offline gazetteer stores
+    return Place(city_from_response(data), address.get('state') or address.get('region') or '',
+                 (address.get('country_code') or '').upper(), lat, lon, 0.0)
+
+class AsyncGeocoder:
+    def __init__(self, base_url=NOMINATIM_URL, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, max_retries=MAX_RETRIES, log=None):
+        # log(message, level) is called on the event loop's thread
+        self.log = log or ignore
+        self.base_url = base_url
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.results = {}
+        self.pending = {}
+        self.requests_made = 0
+        self.session = None
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"User-Agent": USER_AGENT},
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def reverse(self, lat, lon):
+        place = await self.reverse_place(lat, lon)
+        return place.name if place else 'Unknown'
+
+    async def reverse_place(self, lat, lon):
+        key = (round(lat, COORDINATE_PRECISION), round(lon, COORDINATE_PRECISION))
+        if key in self.results:
+            return self.results[key]
+
+        task = self.pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.fetch(*key))
+            self.pending[key] = task
+        try:
+            place = await asyncio.shield(task)
+        finally:
+            self.pending.pop(key, None)
+
+        # A failed lookup is tried again the next time these coordinates come up
+        if place is not None:
+            self.results[key] = place
+        return place
+
+    async def fetch(self, lat, lon):
+        params = {"lat": str(lat), "lon": str(lon), "format": "json"}
+
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            self.requests_made += 1
+            try:
+                async with self.session.get(self.base_url, params=params) as response:
+                    if response.status == 200:
+                        return place_from_response(await response.json(content_type=None), lat, lon)
+                    if response.status not in RETRY_STATUSES:
+                        self.log(f"Unable to fetch location data for {lat}, {lon}: status {response.status}",
+                                 WARNING)
+                        return None
+                    retry_after = response.headers.get('Retry-After')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.log(f"Error fetching location data for {lat}, {lon}: {e or type(e).__name__}", WARNING)
+                retry_after = None
+
+            if attempt == self.max_retries:
+                break
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * (0.5 + random.random() / 2)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+                self.bucket.pause(delay)
+            await asyncio.sleep(delay)
+
+        self.log(f"Giving up on location lookup for {lat}, {lon} after {self.max_retries + 1} attempts", WARNING)
+        return None
+
+class GeocodingService:
+    # Runs an AsyncGeocoder on its own event loop thread so sorting threads can
+    # submit lookups and keep working while requests are in flight
+    def __init__(self, **options):
+        self.loop = asyncio.new_event_loop()
+        self.geocoder = AsyncGeocoder(**options)
+        self.thread = threading.Thread(target=self.loop.run_forever, name="geocoder", daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.geocoder.start(), self.loop).result()
+
+    def submit(self, lat, lon):
+        return asyncio.run_coroutine_threadsafe(self.geocoder.reverse(lat, lon), self.loop)
+
+    def submit_place(self, lat, lon):
+        return asyncio.run_coroutine_threadsafe(self.geocoder.reverse_place(lat, lon), self.loop)
+
+    def get_location(self, lat, lon):
+        return self.submit(lat, lon).result()
+
+    def close(self):
+        if not self.loop.is_running():
+            return
+        asyncio.run_coroutine_threadsafe(self.geocoder.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
\ No newline at end of file
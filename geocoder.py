@@ -0,0 +1,224 @@
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+from collections import namedtuple
+from concurrent.futures import Future
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'geodata', 'cities.bin')
+
+MAGIC = b'PPGZ'
+VERSION = 1
+HEADER = struct.Struct('<4sII')
+OFFSET = struct.Struct('<I')
+RECORD = struct.Struct('<ffI')
+NAME_LENGTH = struct.Struct('<H')
+
+# One degree cells, rows by latitude and columns by longitude
+GRID_ROWS = 180
+GRID_COLS = 360
+MAX_SEARCH_RINGS = 5
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+Place = namedtuple('Place', ['name', 'admin1', 'country', 'lat', 'lon', 'distance_km'])
+
+logger = logging.getLogger('pinpoint.geocoder')
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def grid_cell(lat, lon):
+    row = min(GRID_ROWS - 1, max(0, int(math.floor(lat + 90))))
+    col = int(math.floor(lon + 180)) % GRID_COLS
+    return row, col
+
+class OfflineGeocoder:
+    def __init__(self, path=GAZETTEER_PATH):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._buf = None
+        if os.fstat(self._file.fileno()).st_size < HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a PinPoint gazetteer")
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a PinPoint gazetteer")
+
+        self._index_offset = HEADER.size
+        self._records_offset = self._index_offset + OFFSET.size * (GRID_ROWS * GRID_COLS + 1)
+        self._names_offset = self._records_offset + RECORD.size * self.count
+        # The index and records have fixed sizes, so a cut-short file shows here
+        if len(self._buf) < self._names_offset:
+            self.close()
+            raise ValueError(f"{path} is truncated")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._buf is not None:
+            self._buf.close()
+            self._buf = None
+        self._file.close()
+
+    def cell_range(self, row, col):
+        cell = row * GRID_COLS + col
+        start, end = struct.unpack_from('<II', self._buf, self._index_offset + OFFSET.size * cell)
+        return start, end
+
+    def read_names(self, name_offset):
+        offset = self._names_offset + name_offset
+        length = NAME_LENGTH.unpack_from(self._buf, offset)[0]
+        start = offset + NAME_LENGTH.size
+        return self._buf[start:start + length].decode('utf-8').split('\t')
+
+    def nearest(self, lat, lon):
+        row, col = grid_cell(lat, lon)
+        best = None
+        best_distance = float('inf')
+
+        for ring in range(MAX_SEARCH_RINGS + 1):
+            for ring_row, ring_col in ring_cells(row, col, ring):
+                start, end = self.cell_range(ring_row, ring_col)
+                for index in range(start, end):
+                    city_lat, city_lon, name_offset = RECORD.unpack_from(
+                        self._buf, self._records_offset + RECORD.size * index)
+                    distance = haversine_km(lat, lon, city_lat, city_lon)
+                    if distance < best_distance:
+                        best_distance = distance
+                        best = (city_lat, city_lon, name_offset)
+
+            # Anything in the next ring is at least this far away, even near the poles
+            min_next = ring * KM_PER_DEGREE * max(math.cos(math.radians(min(89.0, abs(lat) + ring + 1))), 0.0175)
+            if best is not None and best_distance <= min_next:
+                break
+
+        if best is None:
+            return None
+
+        name, admin1, country = self.read_names(best[2])
+        return Place(name, admin1, country, best[0], best[1], best_distance)
+
+    def get_location(self, lat, lon):
+        place = self.nearest(lat, lon)
+        return place.name if place else 'Unknown'
+
+    def submit(self, lat, lon):
+        future = Future()
+        future.set_result(self.get_location(lat, lon))
+        return future
+
+    def submit_place(self, lat, lon):
+        future = Future()
+        future.set_result(self.nearest(lat, lon))
+        return future
+
+def ring_cells(row, col, ring):
+    if ring == 0:
+        yield row, col
+        return
+
+    for dr in range(-ring, ring + 1):
+        r = row + dr
+        if r < 0 or r >= GRID_ROWS:
+            continue
+        if abs(dr) == ring:
+            cols = range(-ring, ring + 1)
+        else:
+            cols = (-ring, ring)
+        for dc in cols:
+            yield r, (col + dc) % GRID_COLS
+
+class NominatimGeocoder:
+    def __init__(self, **options):
+        from geocode_client import GeocodingService
+        self.service = GeocodingService(**options)
+
+    def get_location(self, lat, lon):
+        return self.service.get_location(lat, lon)
+
+    def submit(self, lat, lon):
+        return self.service.submit(lat, lon)
+
+    def submit_place(self, lat, lon):
+        return self.service.submit_place(lat, lon)
+
+    def close(self):
+        self.service.close()
+
+def load_geocoder(path=GAZETTEER_PATH, log=None):
+    # log(message, level) receives the online geocoder's lookup failures
+    if os.path.exists(path):
+        try:
+            return OfflineGeocoder(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Error loading offline gazetteer, using Nominatim: {e}")
+    return NominatimGeocoder(log=log)
+
+def read_admin1_names(path):
+    names = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) >= 2:
+                names[fields[0]] = fields[1]
+    return names
+
+def build_gazetteer(cities_path, out_path=GAZETTEER_PATH, admin1_path=None):
+    # cities_path is a GeoNames cities dump (e.g. cities500.txt), admin1_path
+    # optionally maps "CC.code" to region names (admin1CodesASCII.txt)
+    admin1_names = read_admin1_names(admin1_path) if admin1_path else {}
+    cells = [[] for _ in range(GRID_ROWS * GRID_COLS)]
+
+    with open(cities_path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 11:
+                continue
+            lat, lon = float(fields[4]), float(fields[5])
+            country = fields[8]
+            admin1 = admin1_names.get(f"{country}.{fields[10]}", fields[10])
+            row, col = grid_cell(lat, lon)
+            cells[row * GRID_COLS + col].append((lat, lon, f"{fields[1]}\t{admin1}\t{country}"))
+
+    index = []
+    records = []
+    names = bytearray()
+    for cell in cells:
+        index.append(len(records))
+        for lat, lon, label in cell:
+            encoded = label.encode('utf-8')
+            records.append(RECORD.pack(lat, lon, len(names)))
+            names += NAME_LENGTH.pack(len(encoded)) + encoded
+    index.append(len(records))
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        f.write(b''.join(OFFSET.pack(offset) for offset in index))
+        f.write(b''.join(records))
+        f.write(names)
+
+    return len(records)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python geocoder.py <cities.txt> [admin1CodesASCII.txt]")
+        sys.exit(1)
+    count = build_gazetteer(sys.argv[1], admin1_path=sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Wrote {count} places to {GAZETTEER_PATH}")
\ No newline at end of file
@@ -1,9 +1,14 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QPushButton, QFileDialog, QProgressBar, QTextEdit, QLabel, 
-                             QLineEdit, QFrame, QScrollArea, QDesktopWidget)
+                             QPushButton, QFileDialog, QProgressBar, QLabel, 
+                             QLineEdit, QFrame, QDesktopWidget, QSpinBox,
+                             QCheckBox, QComboBox)
 from PyQt5.QtCore import Qt, QPropertyAnimation, QEasingCurve, QSize
 from PyQt5.QtGui import QFont, QIcon, QFontDatabase
-from workers import SortByLocThread, FlattenFolderThread, SortByTimeThread
+from log_view import LogView
+from reporter import RateEstimator, ERROR
+from workers import (SortByLocThread, FlattenFolderThread, SortByTimeThread, SimilarSortThread,
+                     MultiSortThread, ClusterSortThread, TagSortThread, UndoLastRunThread)
+from sort_keys import parse_sort_keys
 
 class ModernButton(QPushButton):
     def __init__(self, text, icon_path=None, parent=None):
@@ -56,6 +61,9 @@ class CardWidget(QFrame):
 class MediaGPSExtractorGUI(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.rate_estimator = RateEstimator()
+        # Running workers, kept referenced until they finish
+        self.workers = set()
         self.initUI()
 
     def initUI(self):
@@ -91,9 +99,89 @@ class MediaGPSExtractorGUI(QMainWindow):
         browse_button.clicked.connect(self.browse_folder)
         browse_button.setToolTip("Select a folder containing files")
         folder_layout.addWidget(browse_button)
+
+        inspect_button = ModernButton('Inspect')
+        inspect_button.clicked.connect(self.inspect_folder)
+        inspect_button.setToolTip("Browse thumbnails and metadata of the files in the folder")
+        folder_layout.addWidget(inspect_button)
         
         card_layout.addLayout(folder_layout)
 
+        settings_layout = QHBoxLayout()
+        workers_label = QLabel("Workers")
+        workers_label.setStyleSheet("color: #bdc3c7;")
+        settings_layout.addWidget(workers_label)
+
+        # 0 lets the workers size the pool from the core count and storage type
+        self.workers_input = QSpinBox()
+        self.workers_input.setRange(0, 64)
+        self.workers_input.setSpecialValueText("Auto")
+        self.workers_input.setToolTip("Number of parallel metadata readers")
+        settings_layout.addWidget(self.workers_input)
+
+        self.dry_run_input = QCheckBox("Dry run")
+        self.dry_run_input.setStyleSheet("color: #bdc3c7;")
+        self.dry_run_input.setToolTip("Only show and save the move plan, without moving any files")
+        settings_layout.addWidget(self.dry_run_input)
+
+        self.watch_input = QCheckBox("Watch")
+        self.watch_input.setStyleSheet("color: #bdc3c7;")
+        self.watch_input.setToolTip("Keep the Location, Cluster, Time, Multi and Tag sorts running and sort new "
+                                    "files as they arrive")
+        self.watch_input.toggled.connect(self.watch_toggled)
+        settings_layout.addWidget(self.watch_input)
+
+        duplicates_label = QLabel("Duplicates")
+        duplicates_label.setStyleSheet("color: #bdc3c7;")
+        settings_layout.addWidget(duplicates_label)
+
+        self.duplicates_input = QComboBox()
+        for name, mode in [('Keep', 'keep'), ('Skip', 'skip'), ('Hard link', 'hardlink'), ('Move to folder', 'move')]:
+            self.duplicates_input.addItem(name, mode)
+        self.duplicates_input.setToolTip("What Flatten Folder does with byte-identical copies")
+        settings_layout.addWidget(self.duplicates_input)
+        settings_layout.addStretch()
+
+        card_layout.addLayout(settings_layout)
+
+        levels_layout = QHBoxLayout()
+        levels_label = QLabel("Sort by")
+        levels_label.setStyleSheet("color: #bdc3c7;")
+        levels_layout.addWidget(levels_label)
+
+        # Folder levels for Multi Sort, outermost first
+        self.levels_input = QComboBox()
+        self.levels_input.setEditable(True)
+        self.levels_input.addItems(["country/city/year/month", "year/month", "country/city", "year/model",
+                                    "type/year/month"])
+        self.levels_input.setToolTip("Folder levels separated by '/': country, region, city, year, month, "
+                                     "model, type")
+        levels_layout.addWidget(self.levels_input, 1)
+
+        multi_button = ModernButton('Multi Sort')
+        multi_button.clicked.connect(self.multi_sort)
+        multi_button.setToolTip("Sort files into nested folders in one pass")
+        levels_layout.addWidget(multi_button)
+
+        card_layout.addLayout(levels_layout)
+
+        tags_layout = QHBoxLayout()
+        tags_label = QLabel("Tags")
+        tags_label.setStyleSheet("color: #bdc3c7;")
+        tags_layout.addWidget(tags_label)
+
+        self.tags_input = QLineEdit()
+        self.tags_input.setPlaceholderText("Keywords in order of preference, e.g. Family, Places|France")
+        self.tags_input.setToolTip("Leave empty to sort each file by its most common keyword")
+        tags_layout.addWidget(self.tags_input, 1)
+
+        tag_button = ModernButton('Tag Sort')
+        tag_button.clicked.connect(self.tag_sort)
+        tag_button.setToolTip("Sort files into folders by their XMP and IPTC keywords")
+        tags_layout.addWidget(tag_button)
+
+        card_layout.addLayout(tags_layout)
+
         button_layout = QHBoxLayout()
 
         # Location Sort button
@@ -102,6 +190,12 @@ class MediaGPSExtractorGUI(QMainWindow):
         location_button.setToolTip("Sort files by place taken")
         button_layout.addWidget(location_button)
 
+        # Cluster Sort button
+        cluster_button = ModernButton('Cluster Sort')
+        cluster_button.clicked.connect(self.cluster_sort)
+        cluster_button.setToolTip("Group files taken close together, naming each place once")
+        button_layout.addWidget(cluster_button)
+
         # Time Sort button
         time_button = ModernButton('Time Sort', 'assets/icons/clock_icon.png')
         time_button.clicked.connect(self.sort_by_time)
@@ -114,6 +208,18 @@ class MediaGPSExtractorGUI(QMainWindow):
         flatten_button.setToolTip("Flatten the selected folder")
         button_layout.addWidget(flatten_button)
 
+        # Similar images button
+        similar_button = ModernButton('Group Similar')
+        similar_button.clicked.connect(self.group_similar)
+        similar_button.setToolTip("Move bursts and near-duplicate images into shared folders")
+        button_layout.addWidget(similar_button)
+
+        # Undo button
+        undo_button = ModernButton('Undo Last Run')
+        undo_button.clicked.connect(self.undo_last_run)
+        undo_button.setToolTip("Move files back to where the last run found them")
+        button_layout.addWidget(undo_button)
+
         card_layout.addLayout(button_layout)
 
         self.progress_bar = QProgressBar()
@@ -137,27 +243,9 @@ class MediaGPSExtractorGUI(QMainWindow):
         self.status_label.setStyleSheet("color: #bdc3c7; margin-top: 5px;")
         card_layout.addWidget(self.status_label)
 
-        output_scroll = QScrollArea()
-        output_scroll.setWidgetResizable(True)
-        output_scroll.setStyleSheet("""
-            QScrollArea {
-                border: none;
-                background-color: #34495e;
-            }
-        """)
-        self.output_area = QTextEdit()
-        self.output_area.setReadOnly(True)
-        self.output_area.setFont(QFont('Inter', 12))
-        self.output_area.setStyleSheet("""
-            QTextEdit {
-                background-color: #34495e;
-                color: #ecf0f1;
-                border: none;
-                padding: 10px;
-            }
-        """)
-        output_scroll.setWidget(self.output_area)
-        card_layout.addWidget(output_scroll)
+        self.log_view = LogView()
+        self.log_view.list_view.setFont(QFont('Inter', 12))
+        card_layout.addWidget(self.log_view)
 
         main_layout.addWidget(content_card)
 
@@ -165,7 +253,7 @@ class MediaGPSExtractorGUI(QMainWindow):
             QMainWindow {
                 background-color: #34495e;
             }
-            QLineEdit {
+            QLineEdit, QSpinBox, QComboBox {
                 background-color: #465c71;
                 color: #ecf0f1;
                 border: none;
@@ -192,39 +280,50 @@ class MediaGPSExtractorGUI(QMainWindow):
         if folder:
             self.folder_input.setText(folder)
 
-    def sort_by_loc(self):
+    def inspect_folder(self):
+        from inspector import InspectorWindow
+
         folder_path = self.folder_input.text()
         if not folder_path:
             self.show_error("Please select a folder")
             return
+        self.inspector_window = InspectorWindow(folder_path)
+        self.inspector_window.show()
+
+    def plan_options(self):
+        if not self.dry_run_input.isChecked():
+            return False, None
+        plan_path, _ = QFileDialog.getSaveFileName(self, "Save Move Plan", "move_plan.json",
+                                                   "JSON (*.json);;CSV (*.csv)")
+        return True, plan_path or None
+
+    def watch_toggled(self, checked):
+        if checked:
+            return
+        # Only watching jobs look at stop(), the others run to the end
+        for worker in self.workers:
+            worker.stop()
 
-        self.output_area.clear()
-        self.output_area.append("Sorting files...")
-        self.status_label.setText("Sorting")
-        self.status_label.setStyleSheet("color: #f39c12; margin-top: 5px;")
-
-        self.progress_animation = QPropertyAnimation(self.progress_bar, b"value")
-        self.progress_animation.setDuration(1000)
-        self.progress_animation.setStartValue(0)
-        self.progress_animation.setEndValue(0)
-        self.progress_animation.setEasingCurve(QEasingCurve.OutCubic)
-        self.progress_animation.start()
-
-        self.worker = SortByLocThread(folder_path)
-        self.worker.update_progress.connect(self.update_progress)
-        self.worker.update_output.connect(self.update_output)
-        self.worker.finished.connect(self.sort_loc_finished)
-        self.worker.start()
+    def start_worker(self, worker_cls, status_text, description, plan=True, watch=False, **options):
+        """Run worker_cls on the selected folder.
 
-    def flatten_folder(self):
+        status_text ("Sorting") shows under the progress bar and description
+        ("Sorting files") in the log. With plan the dry run setting applies
+        and with watch the Watch setting; the remaining options go to the job.
+        """
         folder_path = self.folder_input.text()
         if not folder_path:
             self.show_error("Please select a folder")
             return
-
-        self.output_area.clear()
-        self.output_area.append("Flattening folder...")
-        self.status_label.setText("Flattening")
+        if plan:
+            options['dry_run'], options['plan_path'] = self.plan_options()
+        if watch:
+            options['watch'] = self.watch_input.isChecked()
+
+        self.log_view.clear()
+        self.rate_estimator.reset()
+        self.log_view.append(f"{description}...")
+        self.status_label.setText("Watching" if options.get('watch') else status_text)
         self.status_label.setStyleSheet("color: #f39c12; margin-top: 5px;")
 
         self.progress_animation = QPropertyAnimation(self.progress_bar, b"value")
@@ -234,57 +333,63 @@ class MediaGPSExtractorGUI(QMainWindow):
         self.progress_animation.setEasingCurve(QEasingCurve.OutCubic)
         self.progress_animation.start()
 
-        self.flatten_worker = FlattenFolderThread(folder_path)
-        self.flatten_worker.update_progress.connect(self.update_progress)
-        self.flatten_worker.update_output.connect(self.update_output)
-        self.flatten_worker.finished.connect(self.flatten_finished)
-        self.flatten_worker.start()
+        worker = worker_cls(folder_path, workers=self.workers_input.value(), **options)
+        worker.update_progress.connect(self.update_progress)
+        worker.output_batch.connect(self.update_output)
+        worker.status_text = status_text
+        worker.finished.connect(self.worker_finished)
+        self.workers.add(worker)
+        worker.start()
+
+    def sort_by_loc(self):
+        self.start_worker(SortByLocThread, "Sorting", "Sorting files", watch=True)
+
+    def flatten_folder(self):
+        self.start_worker(FlattenFolderThread, "Flattening", "Flattening folder",
+                          duplicates=self.duplicates_input.currentData())
 
     def sort_by_time(self):
-        folder_path = self.folder_input.text()
-        if not folder_path:
-            self.show_error("Please select a folder")
-            return
+        self.start_worker(SortByTimeThread, "Sorting", "Sorting files", watch=True)
 
-        self.output_area.clear()
-        self.output_area.append("Sorting files...")
-        self.status_label.setText("Sorting")
-        self.status_label.setStyleSheet("color: #f39c12; margin-top: 5px;")
+    def cluster_sort(self):
+        self.start_worker(ClusterSortThread, "Sorting", "Sorting files", watch=True)
 
-        self.progress_animation = QPropertyAnimation(self.progress_bar, b"value")
-        self.progress_animation.setDuration(1000)
-        self.progress_animation.setStartValue(0)
-        self.progress_animation.setEndValue(0)
-        self.progress_animation.setEasingCurve(QEasingCurve.OutCubic)
-        self.progress_animation.start()
+    def multi_sort(self):
+        try:
+            keys = parse_sort_keys(self.levels_input.currentText())
+        except ValueError as e:
+            self.show_error(str(e))
+            return
+        self.start_worker(MultiSortThread, "Sorting", "Sorting files", watch=True, keys=keys)
 
-        self.sort_time_worker = SortByTimeThread(folder_path)
-        self.sort_time_worker.update_progress.connect(self.update_progress)
-        self.sort_time_worker.update_output.connect(self.update_output)
-        self.sort_time_worker.finished.connect(self.sort_time_finished)
-        self.sort_time_worker.start()
+    def tag_sort(self):
+        self.start_worker(TagSortThread, "Sorting", "Sorting files", watch=True, tags=self.tags_input.text())
 
-    def update_progress(self, value):
-        self.progress_animation.setEndValue(value)
-        self.progress_animation.start()
+    def group_similar(self):
+        self.start_worker(SimilarSortThread, "Grouping", "Grouping similar images")
 
-    def update_output(self, message):
-        self.output_area.append(message)
+    def undo_last_run(self):
+        self.start_worker(UndoLastRunThread, "Undoing", "Undoing last run", plan=False)
 
-    def sort_loc_finished(self):
-        self.output_area.append("Sorting completed")
-        self.status_label.setText("Completed")
-        self.status_label.setStyleSheet("color: #2ecc71; margin-top: 5px;")
+    def update_progress(self, value, processed=0, total=0):
+        if value != self.progress_animation.endValue():
+            self.progress_animation.setEndValue(value)
+            self.progress_animation.start()
 
-    def flatten_finished(self):
-        self.output_area.append("Flattening completed")
-        self.status_label.setText("Completed")
-        self.status_label.setStyleSheet("color: #2ecc71; margin-top: 5px;")
+        self.rate_estimator.update(value, processed)
+        self.log_view.set_rate(self.rate_estimator.rate(), self.rate_estimator.eta())
+
+    def update_output(self, entries):
+        self.log_view.append_batch(entries)
 
-    def sort_time_finished(self):
-        self.output_area.append("Sorting completed")
+    def worker_finished(self):
+        worker = self.sender()
+        # finished is emitted at the very end of run(); let it return before dropping the thread
+        worker.wait()
+        self.workers.discard(worker)
+        self.log_view.append(f"{worker.status_text} completed")
         self.status_label.setText("Completed")
         self.status_label.setStyleSheet("color: #2ecc71; margin-top: 5px;")
 
     def show_error(self, message):
-        self.output_area.append(f"<span style='color: #e74c3c;'>{message}</span>")
\ No newline at end of file
+        self.log_view.append(message, ERROR)
\ No newline at end of file
@@ -0,0 +1,339 @@
+import os
+import threading
+from collections import OrderedDict
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QListView, QLabel, QSplitter, QFormLayout
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QObject, QSize, QThread, pyqtSignal
+from PyQt5.QtGui import QColor, QIcon, QImage, QPixmap
+from constants import IMAGE_FORMATS, SUPPORTED_MEDIA_FORMATS
+from scanner import DirectoryScanner, iter_batches
+from thumbnails import THUMBNAIL_SIZE, ThumbnailCache
+
+PREVIEW_SIZE = 512
+# Decoded thumbnails kept in memory; everything else is one disk read away
+ICON_CAPACITY = 2000
+# Thumbnail requests waiting for a worker. The newest are served first, so
+# the rows on screen load before the ones scrolled past, which are dropped
+# once this many are queued.
+REQUEST_CAPACITY = 256
+THUMBNAIL_WORKERS = 4
+LIST_BATCH_SIZE = 500
+
+PathRole = Qt.UserRole + 1
+
+def format_size(size):
+    for unit in ('bytes', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size} {unit}" if unit == 'bytes' else f"{size:.1f} {unit}"
+        size /= 1024
+
+class BackgroundLoader(QObject):
+    """Runs load(path) on worker threads, newest request first.
+
+    Results arrive through `ready` on the UI thread; `failed` carries the
+    path when load raised. Requests beyond `capacity` push out the oldest.
+    """
+    ready = pyqtSignal(str, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, load, workers=1, capacity=REQUEST_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.load = load
+        self.capacity = capacity
+        self.requests = []
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.threads = [threading.Thread(target=self.work, daemon=True, name=f"inspect-{i}")
+                        for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def request(self, path):
+        """Queue path and return the paths dropped to make room for it."""
+        with self.condition:
+            self.requests.append(path)
+            dropped = self.requests[:-self.capacity]
+            del self.requests[:-self.capacity]
+            self.condition.notify()
+        return dropped
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.requests = []
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.requests and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                path = self.requests.pop()
+            try:
+                result = self.load(path)
+            except Exception:
+                self.failed.emit(path)
+                continue
+            self.ready.emit(path, result)
+
+def load_thumbnail(cache, path, size):
+    # QImage, unlike QPixmap, may be built off the UI thread
+    data = cache.thumbnail(path, size)
+    return QImage.fromData(data, 'JPEG') if data else QImage()
+
+class FileListThread(QThread):
+    # Lists media files under a folder in batches, so the first rows show up
+    # before a large tree has been fully scanned
+    found = pyqtSignal(list)
+
+    def __init__(self, folder_path):
+        super().__init__()
+        self.folder_path = folder_path
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def run(self):
+        scanner = DirectoryScanner(self.folder_path, recursive=True)
+        entries = (entry.path for entry in scanner
+                   if os.path.splitext(entry.name)[1].lower() in SUPPORTED_MEDIA_FORMATS)
+        for batch in iter_batches(entries, LIST_BATCH_SIZE):
+            if self.stopped:
+                return
+            self.found.emit(batch)
+
+class FileListModel(QAbstractListModel):
+    # Thumbnails are requested as the view asks for them, which it only does
+    # for rows on screen, and converted to pixmaps on the UI thread
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.paths = []
+        self.rows = {}
+        self.icons = OrderedDict()
+        self.pending = set()
+        self.missing = set()
+        self.loader = BackgroundLoader(lambda path: load_thumbnail(cache, path, THUMBNAIL_SIZE),
+                                       THUMBNAIL_WORKERS, parent=self)
+        self.loader.ready.connect(self.thumbnail_ready)
+        self.loader.failed.connect(self.thumbnail_failed)
+
+        placeholder = QPixmap(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        placeholder.fill(QColor('#465c71'))
+        self.placeholder = QIcon(placeholder)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self.paths[index.row()]
+        if role == Qt.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.DecorationRole:
+            return self.icon(path)
+        if role in (Qt.ToolTipRole, PathRole):
+            return path
+        return None
+
+    def icon(self, path):
+        icon = self.icons.get(path)
+        if icon is not None:
+            self.icons.move_to_end(path)
+            return icon
+        if path not in self.pending and path not in self.missing:
+            if os.path.splitext(path)[1].lower() in IMAGE_FORMATS:
+                self.pending.add(path)
+                self.pending.difference_update(self.loader.request(path))
+            else:
+                self.missing.add(path)
+        return self.placeholder
+
+    def thumbnail_ready(self, path, image):
+        self.pending.discard(path)
+        if path not in self.rows:
+            return
+        if image.isNull():
+            self.missing.add(path)
+            return
+        self.icons[path] = QIcon(QPixmap.fromImage(image))
+        if len(self.icons) > ICON_CAPACITY:
+            self.icons.popitem(last=False)
+        index = self.index(self.rows[path])
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def thumbnail_failed(self, path):
+        self.pending.discard(path)
+        self.missing.add(path)
+
+    def append_batch(self, paths):
+        first = len(self.paths)
+        self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        for row, path in enumerate(paths, first):
+            self.rows[path] = row
+        self.paths.extend(paths)
+        self.endInsertRows()
+
+    def stop(self):
+        self.loader.stop()
+
+def read_details(cache, path):
+    from metadata_cache import MetadataCache, extract_metadata_cached
+
+    # Cached metadata comes back without touching the file; sqlite connections
+    # belong to one thread, so each lookup opens its own
+    with MetadataCache() as metadata_cache:
+        record = extract_metadata_cached([path], metadata_cache).get(path)
+    preview = load_thumbnail(cache, path, PREVIEW_SIZE)
+    return record, preview
+
+class DetailsPanel(QWidget):
+    FIELDS = ['Name', 'Folder', 'Size', 'Format', 'Dimensions', 'Camera', 'Taken', 'GPS']
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+
+        self.preview = QLabel("Select a file")
+        self.preview.setAlignment(Qt.AlignCenter)
+        self.preview.setMinimumSize(256, 256)
+        self.preview.setStyleSheet("background-color: #34495e; color: #bdc3c7; border-radius: 5px;")
+        layout.addWidget(self.preview, 1)
+
+        form_layout = QFormLayout()
+        self.values = {}
+        for field in self.FIELDS:
+            label = QLabel(field)
+            label.setStyleSheet("color: #bdc3c7;")
+            value = QLabel("")
+            value.setStyleSheet("color: #ecf0f1;")
+            value.setTextInteractionFlags(Qt.TextSelectableByMouse)
+            value.setWordWrap(True)
+            form_layout.addRow(label, value)
+            self.values[field] = value
+        layout.addLayout(form_layout)
+
+    def show_loading(self, path):
+        self.preview.setPixmap(QPixmap())
+        self.preview.setText("Loading...")
+        for value in self.values.values():
+            value.setText("")
+        self.values['Name'].setText(os.path.basename(path))
+        self.values['Folder'].setText(os.path.dirname(path))
+
+    def show_details(self, path, record, preview):
+        if preview.isNull():
+            self.preview.setPixmap(QPixmap())
+            self.preview.setText("No preview")
+        else:
+            self.preview.setPixmap(QPixmap.fromImage(preview))
+        if record is None:
+            self.values['Size'].setText("Unreadable")
+            return
+
+        self.values['Size'].setText(format_size(record.size))
+        self.values['Format'].setText(record.format or os.path.splitext(path)[1].lstrip('.').upper())
+        if record.width and record.height:
+            self.values['Dimensions'].setText(f"{record.width} x {record.height}")
+        self.values['Camera'].setText(record.model or "Unknown")
+        self.values['Taken'].setText(record.datetime.strftime('%Y-%m-%d %H:%M:%S') if record.datetime
+                                     else "Unknown")
+        self.values['GPS'].setText(f"{record.gps[0]:.6f}, {record.gps[1]:.6f}" if record.gps else "None")
+
+    def show_error(self, path):
+        self.preview.setPixmap(QPixmap())
+        self.preview.setText("Could not read this file")
+
+class InspectorWindow(QWidget):
+    def __init__(self, folder_path, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Inspect - {folder_path}")
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.resize(1000, 650)
+        self.setStyleSheet("background-color: #2c3e50;")
+        self.selected = None
+
+        layout = QVBoxLayout(self)
+        header_layout = QHBoxLayout()
+        self.count_label = QLabel("Listing files...")
+        self.count_label.setStyleSheet("color: #bdc3c7;")
+        header_layout.addWidget(self.count_label)
+        header_layout.addStretch()
+        layout.addLayout(header_layout)
+
+        cache = ThumbnailCache()
+        self.model = FileListModel(cache, self)
+
+        # Uniform sizes and batched layout keep the view from measuring every
+        # row, so a folder of tens of thousands of files opens immediately
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setViewMode(QListView.IconMode)
+        self.list_view.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.list_view.setGridSize(QSize(THUMBNAIL_SIZE + 32, THUMBNAIL_SIZE + 36))
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setLayoutMode(QListView.Batched)
+        self.list_view.setBatchSize(LIST_BATCH_SIZE)
+        self.list_view.setResizeMode(QListView.Adjust)
+        self.list_view.setMovement(QListView.Static)
+        self.list_view.setWordWrap(False)
+        self.list_view.setStyleSheet("""
+            QListView {
+                background-color: #34495e;
+                color: #ecf0f1;
+                border: none;
+                padding: 10px;
+            }
+        """)
+        self.list_view.selectionModel().currentChanged.connect(self.current_changed)
+
+        self.details = DetailsPanel()
+        self.details_loader = BackgroundLoader(lambda path: read_details(cache, path), capacity=1, parent=self)
+        self.details_loader.ready.connect(self.details_ready)
+        self.details_loader.failed.connect(self.details_failed)
+
+        splitter = QSplitter(Qt.Horizontal)
+        splitter.addWidget(self.list_view)
+        splitter.addWidget(self.details)
+        splitter.setStretchFactor(0, 3)
+        splitter.setStretchFactor(1, 2)
+        layout.addWidget(splitter, 1)
+
+        self.list_thread = FileListThread(folder_path)
+        self.list_thread.found.connect(self.files_found)
+        self.list_thread.finished.connect(self.listing_finished)
+        self.list_thread.start()
+
+    def files_found(self, paths):
+        self.model.append_batch(paths)
+        self.count_label.setText(f"{self.model.rowCount():,} files so far...")
+
+    def listing_finished(self):
+        self.count_label.setText(f"{self.model.rowCount():,} files")
+
+    def current_changed(self, current, previous):
+        if not current.isValid():
+            return
+        self.selected = current.data(PathRole)
+        self.details.show_loading(self.selected)
+        self.details_loader.request(self.selected)
+
+    def details_ready(self, path, result):
+        # Only the last selection matters; earlier ones may still finish
+        if path == self.selected:
+            self.details.show_details(path, *result)
+
+    def details_failed(self, path):
+        if path == self.selected:
+            self.details.show_error(path)
+
+    def closeEvent(self, event):
+        self.list_thread.stop()
+        self.list_thread.wait()
+        self.model.stop()
+        self.details_loader.stop()
+        super().closeEvent(event)
\ No newline at end of file
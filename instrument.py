@@ -0,0 +1,261 @@
+import contextvars
+import json
+import os
+import threading
+import time
+
+# Per-stage timing for the sort pipeline. Code anywhere in the pipeline wraps
+# work in `with stage('extract'):`; while a job's Recorder is active that adds
+# the duration to a per-thread histogram (no locks on the hot path), and when
+# it is not the call returns a shared no-op. Stages nest: plan includes the
+# scan, extract and geocode time spent while planning.
+#
+# The active recorder is a context variable set on the job's thread, so jobs
+# running side by side each record their own stages. New threads start with
+# an empty context; pools a job creates pass use_recorder as their
+# initializer to record into the job's recorder.
+
+# Histogram buckets: four per power of two of the duration in nanoseconds, so
+# percentiles are accurate to within about 20%
+SUB_BUCKET_BITS = 2
+
+_active = contextvars.ContextVar('recorder', default=None)
+
+class NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NULL_STAGE = NullStage()
+
+def stage(name):
+    recorder = _active.get()
+    return recorder.stage(name) if recorder is not None else NULL_STAGE
+
+def count(name, amount=1):
+    recorder = _active.get()
+    if recorder is not None:
+        recorder.count(name, amount)
+
+def current_recorder():
+    return _active.get()
+
+def use_recorder(recorder):
+    # ThreadPoolExecutor initializer: ThreadPoolExecutor(initializer=use_recorder,
+    # initargs=(current_recorder(),)) records the pool's stages for the caller's job
+    _active.set(recorder)
+
+def bucket_of(ns):
+    bits = ns.bit_length()
+    if bits <= SUB_BUCKET_BITS + 1:
+        return ns
+    return (bits << SUB_BUCKET_BITS) | ((ns >> (bits - SUB_BUCKET_BITS - 1)) & ((1 << SUB_BUCKET_BITS) - 1))
+
+def bucket_limit(bucket):
+    # Largest duration in ns that falls into the bucket
+    bits = bucket >> SUB_BUCKET_BITS
+    if bits <= SUB_BUCKET_BITS + 1:
+        return bucket
+    sub = bucket & ((1 << SUB_BUCKET_BITS) - 1)
+    return (((1 << SUB_BUCKET_BITS) | sub) + 1 << (bits - SUB_BUCKET_BITS - 1)) - 1
+
+class StageStats:
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = {}
+
+    def add(self, ns):
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        bucket = bucket_of(ns)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for bucket, hits in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + hits
+
+    def percentile(self, percent):
+        rank = max(1, int(self.count * percent / 100 + 0.5))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(bucket_limit(bucket), self.max)
+        return self.max
+
+class ThreadStats:
+    # Everything one thread records; only that thread writes to it
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.events = []
+        self.thread_id = threading.get_ident()
+        self.thread_name = threading.current_thread().name
+
+class Stage:
+    __slots__ = ('recorder', 'name', 'start')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.recorder.add(self.name, self.start, time.perf_counter_ns())
+        return False
+
+class Recorder:
+    """Stage timings and counters for one job run.
+
+    With trace set, every stage is also kept as an event for write_trace().
+    With profile set, the thread calling start() runs under cProfile, and
+    with trace_memory set, allocations are tracked with tracemalloc.
+    """
+    def __init__(self, trace=False, profile=False, trace_memory=False):
+        self.trace = trace
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.profiler = None
+        self.memory_snapshot = None
+        self.memory_peak = 0
+        self.started = time.perf_counter_ns()
+        self._local = threading.local()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.started = time.perf_counter_ns()
+        _active.set(self)
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+        if self.profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.trace_memory:
+            import tracemalloc
+            self.memory_peak = tracemalloc.get_traced_memory()[1]
+            self.memory_snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        if _active.get() is self:
+            _active.set(None)
+
+    def thread_stats(self):
+        stats = getattr(self._local, 'stats', None)
+        if stats is None:
+            stats = self._local.stats = ThreadStats()
+            with self._lock:
+                self._threads.append(stats)
+        return stats
+
+    def stage(self, name):
+        return Stage(self, name)
+
+    def add(self, name, start, end):
+        stats = self.thread_stats()
+        stage_stats = stats.stages.get(name)
+        if stage_stats is None:
+            stage_stats = stats.stages[name] = StageStats()
+        stage_stats.add(end - start)
+        if self.trace:
+            stats.events.append((name, start, end - start))
+
+    def count(self, name, amount=1):
+        counters = self.thread_stats().counters
+        counters[name] = counters.get(name, 0) + amount
+
+    def submit(self, name, submit, *args):
+        # Time a lookup from submission until its future completes, which may
+        # be on another thread or immediately for synchronous backends
+        start = time.perf_counter_ns()
+        future = submit(*args)
+        future.add_done_callback(lambda done: self.add(name, start, time.perf_counter_ns()))
+        return future
+
+    def merged(self):
+        stages = {}
+        counters = {}
+        with self._lock:
+            threads = list(self._threads)
+        for stats in threads:
+            for name, stage_stats in list(stats.stages.items()):
+                stages.setdefault(name, StageStats()).merge(stage_stats)
+            for name, value in list(stats.counters.items()):
+                counters[name] = counters.get(name, 0) + value
+        return stages, counters
+
+    def summary(self):
+        """Lines of a table with count, total, mean and percentiles per stage."""
+        stages, counters = self.merged()
+        if not stages and not counters:
+            return []
+
+        def ms(ns):
+            return f"{ns / 1e6:.3f}" if ns < 1e7 else f"{ns / 1e6:.0f}"
+
+        lines = [f"{'Stage':<10}{'Count':>8}{'Total ms':>11}{'Mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+                 f"{'Max ms':>10}"]
+        for name, stats in sorted(stages.items(), key=lambda item: -item[1].total):
+            lines.append(f"{name:<10}{stats.count:>8}{ms(stats.total):>11}{ms(stats.total / stats.count):>10}"
+                         f"{ms(stats.percentile(50)):>10}{ms(stats.percentile(95)):>10}{ms(stats.max):>10}")
+        for name, value in sorted(counters.items()):
+            lines.append(f"{name}: {value}")
+        return lines
+
+    def profile_summary(self, limit=20):
+        if self.profiler is None:
+            return []
+        import io
+        import pstats
+
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return [line for line in out.getvalue().splitlines() if line.strip()]
+
+    def memory_summary(self, limit=10):
+        if self.memory_snapshot is None:
+            return []
+        lines = [f"Peak traced memory: {self.memory_peak / (1 << 20):.1f} MB"]
+        for statistic in self.memory_snapshot.statistics('lineno')[:limit]:
+            lines.append(str(statistic))
+        return lines
+
+    def write_profile(self, path):
+        if self.profiler is not None:
+            self.profiler.dump_stats(path)
+
+    def write_trace(self, path):
+        """Save the recorded stages as Chrome trace JSON (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        events = []
+        with self._lock:
+            threads = list(self._threads)
+        for stats in threads:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': stats.thread_id,
+                           'args': {'name': stats.thread_name}})
+            for name, start, duration in list(stats.events):
+                events.append({'name': name, 'ph': 'X', 'pid': pid, 'tid': stats.thread_id,
+                               'ts': (start - self.started) / 1000, 'dur': duration / 1000})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
\ No newline at end of file
@@ -0,0 +1,277 @@
+import json
+import os
+import time
+from datetime import datetime
+from metadata_cache import default_cache_dir
+from planner import MovePlan, PlannedMove
+
+FSYNC_BATCH_SIZE = 64
+FSYNC_INTERVAL = 1.0
+# Finished journals kept per folder, newest first, for undo to walk back
+JOURNAL_HISTORY = 10
+# Enough of the end of a journal to hold its last line
+TAIL_SIZE = 4096
+
+STATUS_COMPLETE = 'complete'
+STATUS_UNDONE = 'undone'
+
+def journal_dir():
+    return os.path.join(default_cache_dir(), 'journals')
+
+def normalize_options(options):
+    # Compared against what a journal read back, so tuples become lists
+    return json.loads(json.dumps(options or {}))
+
+class MoveJournal:
+    # Append-only JSON lines: a short header (run id, folder, mode and the
+    # options the plan was built with), the full plan, then one line per
+    # completed move. Lines are fsynced in batches, so a crash loses at most
+    # the last batch of acknowledgements, never the plan itself. The header
+    # and the last line are all that finding and pruning journals read. A
+    # watch session appends each batch of arrivals as a further plan line.
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    @classmethod
+    def create(cls, plan, options=None, directory=None):
+        directory = directory or journal_dir()
+        os.makedirs(directory, exist_ok=True)
+        run_id = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        journal = cls(os.path.join(directory, f"{run_id}.jsonl"))
+        journal.write({'type': 'header', 'run_id': run_id, 'root': os.path.abspath(plan.root),
+                       'mode': plan.mode, 'created': plan.created, 'options': normalize_options(options)})
+        journal.write({'type': 'plan', 'moves': [[m.source, m.destination, m.reason] for m in plan]})
+        journal.sync()
+        return journal
+
+    def extend(self, plan):
+        self.write({'type': 'plan', 'moves': [[m.source, m.destination, m.reason] for m in plan]})
+        self.sync()
+
+    @classmethod
+    def resume(cls, state):
+        journal = cls(state.path)
+        for move in state.recovered:
+            journal.record_move(move)
+        return journal
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.unsynced += 1
+        if self.unsynced >= FSYNC_BATCH_SIZE or time.monotonic() - self.last_sync >= FSYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def record_move(self, move):
+        self.write({'type': 'move', 's': move.source, 'd': move.destination})
+
+    def record_undo(self, move):
+        self.write({'type': 'undo', 's': move.source, 'd': move.destination})
+
+    def set_status(self, status):
+        self.write({'type': 'status', 'status': status})
+        self.sync()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+class JournalHeader:
+    def __init__(self, path, entry, status=None):
+        self.path = path
+        self.run_id = entry['run_id']
+        self.root = entry['root']
+        self.mode = entry['mode']
+        self.created = entry.get('created')
+        # Journals from before headers were written never match any options
+        self.options = entry.get('options')
+        self.status = status
+
+class JournalState:
+    def __init__(self, header, moves):
+        self.path = header.path
+        self.run_id = header.run_id
+        self.root = header.root
+        self.mode = header.mode
+        self.created = header.created
+        self.options = header.options
+        self.plan = MovePlan(self.root, self.mode)
+        self.plan.created = self.created or self.plan.created
+        self.done = []
+        self.recovered = []
+        self.undone = set()
+        self.status = None
+        self.extend(moves)
+
+    def extend(self, moves):
+        for source, destination, reason in moves:
+            self.plan.add(source, destination, reason)
+        # Moves planned after the last status are not finished yet
+        self.status = None
+
+    def remaining_plan(self):
+        done = {(s, d) for s, d in self.done}
+        plan = MovePlan(self.root, self.mode)
+        plan.created = self.plan.created
+        for move in self.plan:
+            if (move.source, move.destination) in done:
+                continue
+            if not os.path.exists(move.source) and os.path.exists(move.destination):
+                # Completed, but its journal line was lost in an unsynced batch
+                self.done.append((move.source, move.destination))
+                self.recovered.append(move)
+                continue
+            plan.add(move.source, move.destination, move.reason)
+        return plan
+
+    def undo_plan(self):
+        plan = MovePlan(self.root, f"undo {self.mode}")
+        for source, destination in reversed(self.done):
+            if (source, destination) in self.undone:
+                continue
+            if os.path.exists(source) and not os.path.exists(destination):
+                # Already moved back by an undo that crashed before syncing
+                continue
+            plan.moves.append(PlannedMove(destination, source, 'undo'))
+        return plan
+
+def read_status(f):
+    # A run's status is the last line written, unless it was interrupted
+    size = f.seek(0, os.SEEK_END)
+    f.seek(max(0, size - TAIL_SIZE))
+    lines = f.read().splitlines()
+    if not lines:
+        return None
+    try:
+        entry = json.loads(lines[-1])
+    except ValueError:
+        return None
+    return entry.get('status') if entry.get('type') == 'status' else None
+
+def read_header(path):
+    """The header and final status of a journal, without reading its plan."""
+    with open(path, 'rb') as f:
+        entry = json.loads(f.readline())
+        if entry.get('type') not in ('header', 'plan'):
+            return None
+        return JournalHeader(path, entry, read_status(f))
+
+def load_journal(path):
+    state = None
+    with open(path, encoding='utf-8') as f:
+        header = None
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A torn final line from a crash
+                break
+            kind = entry.get('type')
+            if kind == 'header':
+                header = JournalHeader(path, entry)
+            elif kind == 'plan' and state is not None:
+                state.extend(entry['moves'])
+            elif kind == 'plan':
+                # Older journals carry the header fields on the plan line
+                state = JournalState(header or JournalHeader(path, entry), entry['moves'])
+            elif state is None:
+                break
+            elif kind == 'move':
+                state.done.append((entry['s'], entry['d']))
+            elif kind == 'undo':
+                state.undone.add((entry['d'], entry['s']))
+            elif kind == 'status':
+                state.status = entry['status']
+    return state
+
+def read_headers(directory=None):
+    directory = directory or journal_dir()
+    if not os.path.isdir(directory):
+        return []
+
+    headers = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith('.jsonl'):
+            continue
+        try:
+            header = read_header(os.path.join(directory, name))
+        except (OSError, KeyError, ValueError):
+            continue
+        if header is not None:
+            headers.append(header)
+    return headers
+
+def find_journals(root, directory=None):
+    """Headers of the journals for root, newest first."""
+    root = os.path.abspath(root)
+    return [header for header in read_headers(directory) if os.path.abspath(header.root) == root]
+
+def load_state(header):
+    try:
+        return load_journal(header.path)
+    except (OSError, KeyError, ValueError):
+        return None
+
+def find_interrupted(root, mode, directory=None):
+    """Header of the newest run of mode in root if it did not finish."""
+    for header in find_journals(root, directory):
+        if header.mode == mode:
+            return header if header.status is None else None
+    return None
+
+def find_resumable(root, mode, options=None, directory=None):
+    # Only the newest run of a mode is resumed, and only if it was planned
+    # with the same options; a run with other options starts over
+    header = find_interrupted(root, mode, directory)
+    if header is None or header.options != normalize_options(options):
+        return None
+    state = load_state(header)
+    # Undoing part of a finished run also leaves it without a final status
+    return state if state is not None and state.status is None else None
+
+def find_undoable(root, directory=None):
+    for header in find_journals(root, directory):
+        if header.status == STATUS_UNDONE or header.mode.startswith('undo'):
+            continue
+        state = load_state(header)
+        if state is not None and state.status != STATUS_UNDONE and state.done:
+            return state
+    return None
+
+def prune_journals(directory=None, keep=JOURNAL_HISTORY):
+    """Delete undone journals and all but the newest `keep` finished ones per folder.
+
+    A journal is finished once it is complete or a newer run of the same
+    mode has replaced it. Interrupted runs that may still be resumed are
+    kept. Returns the number of journals removed.
+    """
+    finished = {}
+    latest = set()
+    removed = 0
+    for header in read_headers(directory):
+        root = os.path.abspath(header.root)
+        replaced = (root, header.mode) in latest
+        latest.add((root, header.mode))
+        if header.status == STATUS_UNDONE:
+            stale = True
+        elif header.status is None and not replaced:
+            continue
+        else:
+            count = finished[root] = finished.get(root, 0) + 1
+            stale = count > keep
+        if stale:
+            try:
+                os.remove(header.path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
\ No newline at end of file
@@ -0,0 +1,138 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QListView, QComboBox, QLabel
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel
+from PyQt5.QtGui import QColor
+from reporter import DEBUG, INFO, WARNING, ERROR
+
+LOG_CAPACITY = 20000
+
+LEVEL_COLORS = {
+    DEBUG: QColor('#95a5a6'),
+    INFO: QColor('#ecf0f1'),
+    WARNING: QColor('#f39c12'),
+    ERROR: QColor('#e74c3c'),
+}
+
+LEVEL_FILTERS = [('All', DEBUG), ('Info', INFO), ('Warnings', WARNING), ('Errors', ERROR)]
+
+LevelRole = Qt.UserRole + 1
+
+class LogModel(QAbstractListModel):
+    # Keeps at most LOG_CAPACITY lines; the view only ever paints visible rows
+    def __init__(self, capacity=LOG_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self.entries = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        level, message = self.entries[index.row()]
+        if role == Qt.DisplayRole:
+            return message
+        if role == Qt.ForegroundRole:
+            return LEVEL_COLORS.get(level)
+        if role == LevelRole:
+            return level
+        return None
+
+    def append_batch(self, entries):
+        entries = [(level, line) for level, message in entries for line in message.split('\n')]
+        entries = entries[-self.capacity:]
+        if not entries:
+            return
+        overflow = len(self.entries) + len(entries) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            del self.entries[:overflow]
+            self.endRemoveRows()
+
+        first = len(self.entries)
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        self.entries.extend(entries)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.entries = []
+        self.endResetModel()
+
+class LevelFilterModel(QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.min_level = DEBUG
+
+    def set_min_level(self, level):
+        self.min_level = level
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        level = self.sourceModel().entries[source_row][0]
+        return level >= self.min_level
+
+class LogView(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        header_layout = QHBoxLayout()
+        self.rate_label = QLabel("")
+        self.rate_label.setStyleSheet("color: #bdc3c7;")
+        header_layout.addWidget(self.rate_label)
+        header_layout.addStretch()
+
+        self.level_input = QComboBox()
+        for name, level in LEVEL_FILTERS:
+            self.level_input.addItem(name, level)
+        self.level_input.setCurrentIndex(1)
+        self.level_input.currentIndexChanged.connect(self.level_changed)
+        header_layout.addWidget(self.level_input)
+        layout.addLayout(header_layout)
+
+        self.model = LogModel(parent=self)
+        self.proxy = LevelFilterModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.set_min_level(self.level_input.currentData())
+
+        self.list_view = QListView()
+        self.list_view.setModel(self.proxy)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setWordWrap(False)
+        self.list_view.setSelectionMode(QListView.ExtendedSelection)
+        self.list_view.setStyleSheet("""
+            QListView {
+                background-color: #34495e;
+                color: #ecf0f1;
+                border: none;
+                padding: 10px;
+            }
+        """)
+        layout.addWidget(self.list_view)
+
+    def level_changed(self):
+        self.proxy.set_min_level(self.level_input.currentData())
+
+    def append_batch(self, entries):
+        scrollbar = self.list_view.verticalScrollBar()
+        follow = scrollbar.value() >= scrollbar.maximum() - 2
+        self.model.append_batch(entries)
+        if follow:
+            self.list_view.scrollToBottom()
+
+    def append(self, message, level=INFO):
+        self.append_batch([(level, message)])
+
+    def clear(self):
+        self.model.clear()
+        self.rate_label.setText("")
+
+    def set_rate(self, files_per_second, eta):
+        text = f"{files_per_second:.1f} files/s"
+        if eta is not None:
+            minutes, seconds = divmod(int(eta), 60)
+            hours, minutes = divmod(minutes, 60)
+            text += f" · ETA {hours}:{minutes:02d}:{seconds:02d}" if hours else f" · ETA {minutes}:{seconds:02d}"
+        self.rate_label.setText(text)
\ No newline at end of file
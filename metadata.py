@@ -0,0 +1,242 @@
+import logging
+import os
+from datetime import datetime
+import piexif
+from PIL import Image, UnidentifiedImageError
+import pillow_heif
+from exif_header import read_exif_header, read_video_header
+from exif_pool import get_shared_pool
+from instrument import count, stage
+from constants import IMAGE_FORMATS, VIDEO_FORMATS, QUICKTIME_FORMATS
+
+EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+logger = logging.getLogger('pinpoint.metadata')
+
+_heif_opener_registered = False
+
+class MediaMetadata:
+    __slots__ = ('path', 'size', 'mtime', 'format', 'width', 'height', 'model', 'datetime', 'gps')
+
+    def __init__(self, path, size=None, mtime=None, format=None, width=None, height=None,
+                 model=None, datetime=None, gps=None):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.format = format
+        self.width = width
+        self.height = height
+        self.model = model
+        self.datetime = datetime
+        self.gps = gps
+
+    def __repr__(self):
+        return (f"MediaMetadata({os.path.basename(self.path)!r}, format={self.format!r}, "
+                f"datetime={self.datetime!r}, gps={self.gps!r})")
+
+    @property
+    def creation_time(self):
+        if self.datetime is not None:
+            return self.datetime
+        if self.mtime is not None:
+            return datetime.fromtimestamp(self.mtime)
+        return datetime.fromtimestamp(os.path.getmtime(self.path))
+
+def convert_to_degrees(value):
+    d = float(value[0][0]) / float(value[0][1])
+    m = float(value[1][0]) / float(value[1][1])
+    s = float(value[2][0]) / float(value[2][1])
+    return d + (m / 60.0) + (s / 3600.0)
+
+def parse_exif_datetime(value):
+    if isinstance(value, bytes):
+        value = value.decode(errors='replace')
+    try:
+        return datetime.strptime(value.strip('\x00 '), EXIF_DATETIME_FORMAT)
+    except (AttributeError, ValueError):
+        return None
+
+def decode_text(value):
+    if isinstance(value, bytes):
+        value = value.decode(errors='replace')
+    return value.strip('\x00 ') or None
+
+def parse_gps_ifd(gps_info):
+    lat = gps_info.get(piexif.GPSIFD.GPSLatitude)
+    lat_ref = gps_info.get(piexif.GPSIFD.GPSLatitudeRef)
+    lon = gps_info.get(piexif.GPSIFD.GPSLongitude)
+    lon_ref = gps_info.get(piexif.GPSIFD.GPSLongitudeRef)
+
+    if not (lat and lon and lat_ref and lon_ref):
+        return None
+
+    lat = convert_to_degrees(lat)
+    lon = convert_to_degrees(lon)
+
+    if lat_ref == b"S":
+        lat = -lat
+    if lon_ref == b"W":
+        lon = -lon
+
+    return lat, lon
+
+def register_heif_opener():
+    global _heif_opener_registered
+    if not _heif_opener_registered:
+        pillow_heif.register_heif_opener()
+        _heif_opener_registered = True
+
+def apply_exif_dict(record, exif_dict):
+    zeroth = exif_dict.get("0th", {})
+    exif_ifd = exif_dict.get("Exif", {})
+
+    if piexif.ImageIFD.Model in zeroth:
+        record.model = decode_text(zeroth[piexif.ImageIFD.Model])
+
+    taken = exif_ifd.get(piexif.ExifIFD.DateTimeOriginal) or zeroth.get(piexif.ImageIFD.DateTime)
+    if taken:
+        record.datetime = parse_exif_datetime(taken)
+
+    if exif_dict.get("GPS"):
+        record.gps = parse_gps_ifd(exif_dict["GPS"])
+
+def read_image_header(record):
+    # Fast path: walk the container headers without decoding any pixel data
+    try:
+        with stage('header'):
+            header = read_exif_header(record.path)
+    except Exception as e:
+        logger.debug(f"Error parsing the header of {os.path.basename(record.path)}, falling back to Pillow: {e}")
+        return False
+
+    if header is None:
+        return False
+
+    if not header['exif'] and header['format'] != 'PNG':
+        # JPEG, TIFF and HEIF files nearly always carry EXIF, so its absence
+        # more likely means it sits where the header walk does not look
+        return False
+
+    record.format = header['format']
+    record.width = header['width']
+    record.height = header['height']
+    if header['exif']:
+        apply_exif_dict(record, header['exif'])
+    return True
+
+def read_image_metadata(record):
+    if read_image_header(record):
+        return
+
+    register_heif_opener()
+    with stage('pillow'), Image.open(record.path) as img:
+        record.format = img.format
+        record.width, record.height = img.size
+        raw_exif = img.info.get("exif")
+
+    if raw_exif:
+        apply_exif_dict(record, piexif.load(raw_exif))
+
+def read_video_metadata(record):
+    # Fast path for MP4/MOV: read the moov box instead of starting exiftool
+    try:
+        with stage('header'):
+            header = read_video_header(record.path)
+    except Exception as e:
+        logger.debug(f"Error parsing the header of {os.path.basename(record.path)}, falling back to exiftool: {e}")
+        return False
+
+    if header is None:
+        return False
+
+    record.format = header['format']
+    record.width = header['width']
+    record.height = header['height']
+    record.model = header['model']
+    record.datetime = header['datetime']
+    record.gps = header['gps']
+    return True
+
+def apply_exiftool_metadata(record, metadata):
+    record.format = record.format or metadata.get('File:FileType')
+    record.width = record.width or metadata.get('File:ImageWidth') or metadata.get('QuickTime:ImageWidth')
+    record.height = record.height or metadata.get('File:ImageHeight') or metadata.get('QuickTime:ImageHeight')
+    record.model = record.model or metadata.get('QuickTime:Model') or metadata.get('EXIF:Model')
+
+    if record.datetime is None:
+        create_date = metadata.get('QuickTime:CreateDate') or metadata.get('EXIF:DateTimeOriginal')
+        if create_date:
+            record.datetime = parse_exif_datetime(create_date)
+
+    if record.gps is None:
+        lat = metadata.get('Composite:GPSLatitude')
+        lon = metadata.get('Composite:GPSLongitude')
+        if lat is not None and lon is not None:
+            record.gps = (float(lat), float(lon))
+
+def extract_metadata(file_path, exiftool_metadata=None, pool=None):
+    stat = os.stat(file_path)
+    record = MediaMetadata(file_path, size=stat.st_size, mtime=stat.st_mtime)
+    file_extension = os.path.splitext(file_path)[1].lower()
+    needs_exiftool = file_extension in VIDEO_FORMATS
+
+    if file_extension in QUICKTIME_FORMATS:
+        needs_exiftool = not read_video_metadata(record)
+
+    if file_extension in IMAGE_FORMATS:
+        try:
+            read_image_metadata(record)
+        except UnidentifiedImageError:
+            logger.warning(f"Unsupported image format: {os.path.basename(file_path)}")
+            needs_exiftool = True
+        except Exception as e:
+            logger.warning(f"Error processing the EXIF data of {os.path.basename(file_path)}: {e}")
+            needs_exiftool = True
+
+    if needs_exiftool:
+        try:
+            if exiftool_metadata is None:
+                pool = pool or get_shared_pool()
+                count('exiftool files')
+                with stage('exiftool'):
+                    exiftool_metadata = pool.get_metadata(file_path).get(file_path, {})
+            apply_exiftool_metadata(record, exiftool_metadata)
+        except Exception as e:
+            logger.warning(f"Error reading {os.path.basename(file_path)} with exiftool: {e}")
+
+    return record
+
+def extract_metadata_batch(file_paths, pool=None, on_record=None):
+    file_paths = list(file_paths)
+    # MP4/MOV files that cannot be read natively are handed to exiftool one by one
+    video_paths = [f for f in file_paths if os.path.splitext(f)[1].lower() in VIDEO_FORMATS
+                   and os.path.splitext(f)[1].lower() not in QUICKTIME_FORMATS]
+
+    exiftool_metadata = {}
+    if video_paths:
+        pool = pool or get_shared_pool()
+        count('exiftool files', len(video_paths))
+        with stage('exiftool'):
+            exiftool_metadata = pool.get_metadata(video_paths)
+
+    records = {}
+    for file_path in file_paths:
+        try:
+            with stage('extract'):
+                records[file_path] = extract_metadata(file_path, exiftool_metadata.get(file_path), pool)
+        except OSError as e:
+            logger.warning(f"Error reading {file_path}: {e}")
+            continue
+        if on_record:
+            on_record(records[file_path])
+    return records
+
+def print_metadata(record):
+    print(f"File: {os.path.basename(record.path)}")
+    print(f"Size: {record.size} bytes")
+    print(f"Format: {record.format or 'Unknown'}")
+    print(f"Size: ({record.width or 'Unknown'}, {record.height or 'Unknown'})")
+    print(f"Model: {record.model or 'Unknown'}")
+    print(f"DateTime: {record.datetime.strftime(EXIF_DATETIME_FORMAT) if record.datetime else 'Unknown'}")
+    if record.gps is None:
+        print("No GPS data found in the metadata.")
\ No newline at end of file
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+QUERY_CHUNK_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    format TEXT,
+    width INTEGER,
+    height INTEGER,
+    model TEXT,
+    datetime TEXT,
+    lat REAL,
+    lon REAL
+);
+CREATE INDEX IF NOT EXISTS metadata_fingerprint ON metadata (fingerprint);
+CREATE TABLE IF NOT EXISTS tag_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sidecar_mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (tag, path)
+);
+CREATE INDEX IF NOT EXISTS tags_path ON tags (path);
+"""
+
+COLUMNS = "path, size, mtime_ns, fingerprint, format, width, height, model, datetime, lat, lon"
+INSERT_SQL = f"INSERT OR REPLACE INTO metadata ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+def default_cache_dir():
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'pinpoint')
+
+def default_cache_path():
+    return os.path.join(default_cache_dir(), 'metadata.sqlite3')
+
+def file_fingerprint(file_path, size):
+    # Size plus the first and last blocks identifies a file across renames
+    # without reading all of it
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+        if size > 2 * FINGERPRINT_BLOCK_SIZE:
+            f.seek(-FINGERPRINT_BLOCK_SIZE, os.SEEK_END)
+            digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+    return digest.hexdigest()
+
+class MetadataCache:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or default_cache_path()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def row_to_record(self, row, path, mtime):
+        from metadata import MediaMetadata
+
+        _, size, _, _, format, width, height, model, taken, lat, lon = row
+        return MediaMetadata(
+            path, size=size, mtime=mtime, format=format, width=width, height=height, model=model,
+            datetime=datetime.fromisoformat(taken) if taken else None,
+            gps=(lat, lon) if lat is not None and lon is not None else None)
+
+    def prefetch(self, file_paths, stats=None):
+        # stats may carry stat results the caller already has, e.g. from scandir
+        known = stats or {}
+        stats = {}
+        for file_path in file_paths:
+            try:
+                stats[file_path] = known.get(file_path) or os.stat(file_path)
+            except OSError:
+                continue
+
+        rows = {}
+        paths = list(stats)
+        for start in range(0, len(paths), QUERY_CHUNK_SIZE):
+            chunk = paths[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self.conn.execute(f"SELECT {COLUMNS} FROM metadata WHERE path IN ({placeholders})", chunk):
+                rows[row[0]] = row
+
+        hits = {}
+        misses = []
+        copied = []
+        stale = []
+        for file_path, stat in stats.items():
+            row = rows.get(file_path)
+            if row and row[1] == stat.st_size and row[2] == stat.st_mtime_ns:
+                hits[file_path] = self.row_to_record(row, file_path, stat.st_mtime)
+                continue
+
+            try:
+                fingerprint = file_fingerprint(file_path, stat.st_size)
+            except OSError:
+                continue
+
+            row = self.conn.execute(
+                f"SELECT {COLUMNS} FROM metadata WHERE fingerprint = ? AND size = ? LIMIT 1",
+                (fingerprint, stat.st_size)).fetchone()
+            if row:
+                hits[file_path] = self.row_to_record(row, file_path, stat.st_mtime)
+                copied.append((file_path, stat.st_size, stat.st_mtime_ns) + row[3:])
+                if not os.path.exists(row[0]):
+                    stale.append((row[0],))
+            else:
+                misses.append(file_path)
+                self._pending[file_path] = (stat.st_size, stat.st_mtime_ns, fingerprint)
+
+        if copied:
+            # Entries found by fingerprint belong to files that were moved or copied
+            self.conn.executemany("DELETE FROM metadata WHERE path = ?", stale)
+            self.conn.executemany(INSERT_SQL, copied)
+            self.conn.commit()
+
+        self.hits += len(hits)
+        self.misses += len(misses)
+        return hits, misses
+
+    def store(self, records):
+        rows = []
+        for record in records:
+            key = self._pending.pop(record.path, None)
+            if key is None:
+                try:
+                    stat = os.stat(record.path)
+                    key = (stat.st_size, stat.st_mtime_ns, file_fingerprint(record.path, stat.st_size))
+                except OSError:
+                    continue
+            size, mtime_ns, fingerprint = key
+            lat, lon = record.gps if record.gps else (None, None)
+            rows.append((record.path, size, mtime_ns, fingerprint, record.format, record.width,
+                         record.height, record.model,
+                         record.datetime.isoformat() if record.datetime else None, lat, lon))
+
+        self.conn.executemany(INSERT_SQL, rows)
+        self.conn.commit()
+
+    def record_move(self, old_path, new_path):
+        self.conn.execute("UPDATE OR REPLACE metadata SET path = ? WHERE path = ?", (new_path, old_path))
+        # The tag index (see tags.py) follows the file too
+        self.conn.execute("UPDATE OR REPLACE tag_files SET path = ? WHERE path = ?", (new_path, old_path))
+        self.conn.execute("UPDATE OR REPLACE tags SET path = ? WHERE path = ?", (new_path, old_path))
+
+    def commit(self):
+        self.conn.commit()
+
+    def summary(self):
+        return f"Metadata cache: {self.hits} hits, {self.misses} misses"
+
+def extract_metadata_cached(file_paths, cache, pool=None, on_record=None, workers=1, use_processes=False,
+                            stats=None, process_executor=None):
+    from parallel import extract_metadata_parallel
+
+    records, misses = cache.prefetch(file_paths, stats)
+    if on_record:
+        for record in records.values():
+            on_record(record)
+    if misses:
+        extracted = extract_metadata_parallel(misses, workers, use_processes, pool, on_record, process_executor)
+        cache.store(extracted.values())
+        records.update(extracted)
+    return records
\ No newline at end of file
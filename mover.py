@@ -0,0 +1,163 @@
+import errno
+import hashlib
+import os
+import shutil
+import threading
+
+# File moves for executing a plan. A move within one filesystem is a single
+# atomic rename. Across filesystems the data has to be copied: that is done
+# in the kernel with copy_file_range (which can also reflink or copy server
+# side) or sendfile, into a temporary name next to the destination, renamed
+# into place once complete and, with verify, compared against the source
+# before the source is removed.
+
+COPY_CHUNK_SIZE = 64 * 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+TEMP_SUFFIX = '.pinpoint-part'
+# link() errors meaning the filesystem cannot hard link, rather than a failed write
+LINK_UNSUPPORTED = {errno.EPERM, errno.EXDEV, errno.ENOTSUP, errno.EMLINK}
+
+class VerifyError(OSError):
+    pass
+
+def file_checksum(file_path):
+    digest = hashlib.blake2b(digest_size=32)
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+def copy_range(source, destination, size):
+    copied = 0
+    while copied < size:
+        sent = os.copy_file_range(source, destination, min(COPY_CHUNK_SIZE, size - copied))
+        if sent == 0:
+            break
+        copied += sent
+    return copied
+
+def send_range(source, destination, size):
+    copied = 0
+    while copied < size:
+        sent = os.sendfile(destination, source, copied, min(COPY_CHUNK_SIZE, size - copied))
+        if sent == 0:
+            break
+        copied += sent
+    return copied
+
+def copy_data(source, destination, size):
+    # Each zero-copy call either copies everything or fails before writing,
+    # except on the odd filesystem that refuses part way, so a failed
+    # attempt rewinds and truncates before the next one
+    for name, copy in (('copy_file_range', copy_range), ('sendfile', send_range)):
+        if not hasattr(os, name):
+            continue
+        try:
+            if copy(source, destination, size) == size:
+                return
+        except OSError:
+            pass
+        os.lseek(source, 0, os.SEEK_SET)
+        os.lseek(destination, 0, os.SEEK_SET)
+        os.ftruncate(destination, 0)
+
+    with os.fdopen(os.dup(source), 'rb') as src, os.fdopen(os.dup(destination), 'wb') as dst:
+        shutil.copyfileobj(src, dst, HASH_BLOCK_SIZE)
+
+def copy_file(source_path, destination_path):
+    """Copy a file's data, permissions and timestamps."""
+    source = os.open(source_path, os.O_RDONLY)
+    try:
+        size = os.fstat(source).st_size
+        destination = os.open(destination_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            copy_data(source, destination, size)
+        finally:
+            os.close(destination)
+    finally:
+        os.close(source)
+    shutil.copystat(source_path, destination_path)
+
+def rename_no_replace(source_path, destination_path):
+    """Rename within one filesystem, failing with FileExistsError rather than replacing a file."""
+    try:
+        # link() refuses an existing name atomically, unlike rename()
+        os.link(source_path, destination_path, follow_symlinks=False)
+    except FileExistsError:
+        source, destination = os.lstat(source_path), os.lstat(destination_path)
+        if (source.st_dev, source.st_ino) != (destination.st_dev, destination.st_ino):
+            raise
+        # Linked by a run that stopped before removing the source
+    except OSError as e:
+        # Filesystems without hard links (FAT, some network shares)
+        if e.errno not in LINK_UNSUPPORTED:
+            raise
+        if os.path.lexists(destination_path):
+            raise FileExistsError(errno.EEXIST, "Destination already exists", destination_path)
+        os.rename(source_path, destination_path)
+        return
+    os.unlink(source_path)
+
+def move_across(source_path, destination_path, verify=False):
+    temp_path = os.path.join(os.path.dirname(destination_path),
+                             f".{os.path.basename(destination_path)}.{threading.get_ident()}{TEMP_SUFFIX}")
+    try:
+        copy_file(source_path, temp_path)
+        if verify and file_checksum(source_path) != file_checksum(temp_path):
+            raise VerifyError(f"Copy of {source_path} does not match the original")
+        # The destination may have appeared while copying; never replace it
+        try:
+            rename_no_replace(temp_path, destination_path)
+        except FileExistsError:
+            raise FileExistsError(errno.EEXIST, "Destination already exists", destination_path) from None
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    os.remove(source_path)
+
+def move_link(source_path, destination_path):
+    if os.path.lexists(destination_path):
+        raise FileExistsError(errno.EEXIST, "Destination already exists", destination_path)
+    shutil.move(source_path, destination_path)
+
+def move_file(source_path, destination_path, same_device=None, verify=False):
+    """Move a file, renaming when it stays on one filesystem and copying when it does not."""
+    if same_device is None:
+        same_device = (os.stat(os.path.dirname(source_path) or '.').st_dev
+                       == os.stat(os.path.dirname(destination_path) or '.').st_dev)
+    if same_device:
+        rename_no_replace(source_path, destination_path)
+    elif os.path.islink(source_path):
+        # Recreates the link itself rather than copying what it points to
+        move_link(source_path, destination_path)
+    else:
+        move_across(source_path, destination_path, verify)
+
+def prune_empty_dirs(directories, root):
+    """Remove directories left empty, and parents emptied by that, below root.
+
+    Everything is sorted deepest first, so one pass removes a whole emptied
+    branch; directories that still hold anything are left alone.
+    """
+    root = os.path.abspath(root)
+    candidates = set()
+    for directory in directories:
+        directory = os.path.abspath(directory)
+        while directory.startswith(root + os.sep) and directory not in candidates:
+            candidates.add(directory)
+            directory = os.path.dirname(directory)
+
+    removed = []
+    for directory in sorted(candidates, key=lambda path: path.count(os.sep), reverse=True):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            continue
+        removed.append(directory)
+    return removed
\ No newline at end of file
@@ -0,0 +1,109 @@
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from instrument import current_recorder, use_recorder
+
+CHUNK_SIZE = 32
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'sshfs', 'fuse.sshfs', '9p', 'afpfs', 'davfs'}
+
+def find_mount(path):
+    path = os.path.realpath(path)
+    best = None
+    try:
+        with open('/proc/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                device, mount_point, fs_type = fields[0], fields[1].replace('\\040', ' '), fields[2]
+                if path == mount_point or path.startswith(mount_point.rstrip('/') + '/'):
+                    if best is None or len(mount_point) > len(best[1]):
+                        best = (device, mount_point, fs_type)
+    except OSError:
+        return None
+    return best
+
+def detect_storage_kind(path):
+    if not sys.platform.startswith('linux'):
+        return 'unknown'
+
+    mount = find_mount(path)
+    if mount is None:
+        return 'unknown'
+    device, _, fs_type = mount
+    if fs_type in NETWORK_FILESYSTEMS or device.startswith('//'):
+        return 'network'
+
+    block = os.path.basename(os.path.realpath(device))
+    for name in (block, block.rstrip('0123456789'), block.split('p')[0]):
+        rotational = f"/sys/block/{name}/queue/rotational"
+        if os.path.exists(rotational):
+            with open(rotational) as f:
+                return 'hdd' if f.read().strip() == '1' else 'ssd'
+    return 'unknown'
+
+def default_worker_count(path):
+    cores = os.cpu_count() or 1
+    kind = detect_storage_kind(path)
+    if kind == 'network':
+        # Latency bound, so keep plenty of requests in flight
+        return min(32, cores * 4)
+    if kind == 'hdd':
+        # Parallel reads on a spinning disk just add seeks
+        return 2
+    return cores
+
+def resolve_worker_count(workers, path):
+    return workers if workers and workers > 0 else default_worker_count(path)
+
+def create_process_executor(workers):
+    """Worker processes for metadata extraction, each with its own ExifTool pool.
+
+    Starting them costs a fork and an exiftool launch per worker, so a job
+    creates one executor up front and passes it to every batch.
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+
+def init_worker():
+    from exif_pool import init_worker_pool
+
+    # A forked worker inherits the job's log handler and recorder, neither of
+    # which reaches back to the parent; its warnings go to stderr instead
+    logging.getLogger('pinpoint').handlers.clear()
+    use_recorder(None)
+    init_worker_pool()
+
+def extract_metadata_parallel(file_paths, workers, use_processes=False, pool=None, on_record=None,
+                              process_executor=None):
+    from metadata import extract_metadata_batch
+
+    file_paths = list(file_paths)
+    if workers <= 1 or len(file_paths) <= CHUNK_SIZE:
+        return extract_metadata_batch(file_paths, pool, on_record)
+
+    chunks = [file_paths[i:i + CHUNK_SIZE] for i in range(0, len(file_paths), CHUNK_SIZE)]
+    records = {}
+
+    owned = None
+    if use_processes:
+        executor = process_executor or create_process_executor(workers)
+        owned = None if process_executor else executor
+        futures = [executor.submit(extract_metadata_batch, chunk) for chunk in chunks]
+    else:
+        executor = owned = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract",
+                                              initializer=use_recorder, initargs=(current_recorder(),))
+        futures = [executor.submit(extract_metadata_batch, chunk, pool) for chunk in chunks]
+
+    try:
+        for future in as_completed(futures):
+            chunk_records = future.result()
+            records.update(chunk_records)
+            if on_record:
+                for record in chunk_records.values():
+                    on_record(record)
+    finally:
+        if owned is not None:
+            owned.shutdown()
+
+    return records
\ No newline at end of file
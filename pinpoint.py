@@ -0,0 +1,187 @@
+import argparse
+import json
+import sys
+
+# Headless entry point: python pinpoint.py <mode> <folder> [options]
+# Only the standard library is imported until the arguments are parsed, so
+# --help and usage errors return immediately.
+
+MODES = {
+    'location': "Sort media into folders by the city they were taken in",
+    'time': "Sort media into 'Mon, YY' folders by creation time",
+    'cluster': "Group geotagged media into places by distance, naming each place once",
+    'multi': "Sort media into nested folders, e.g. Country/City/Year/Month, in one pass",
+    'tag': "Sort media into folders by XMP and IPTC keywords",
+    'flatten': "Move every file in the folder tree up into the folder itself",
+    'similar': "Group near-duplicate images (bursts, re-encodes, resizes) into subfolders",
+    'undo': "Move the files of the last completed run back",
+}
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='pinpoint', description="Sort photos and videos without the GUI")
+    subparsers = parser.add_subparsers(dest='mode', metavar='mode', required=True)
+
+    for mode, help_text in MODES.items():
+        sub = subparsers.add_parser(mode, help=help_text, description=help_text)
+        sub.add_argument('folder', help="Folder to sort")
+        sub.add_argument('--json', action='store_true',
+                         help="Write progress and log events to stdout as JSON lines")
+        sub.add_argument('--log-level', choices=list(LEVELS), default='info',
+                         help="Lowest log level to output (default: info)")
+        sub.add_argument('--trace', metavar='PATH',
+                         help="Save per-stage timings as Chrome trace JSON (chrome://tracing or Perfetto)")
+        sub.add_argument('--profile', metavar='PATH',
+                         help="Run the job thread under cProfile, print the top functions and save the "
+                              "stats to PATH; use -j 1 to keep the work on that thread")
+        sub.add_argument('--trace-memory', action='store_true',
+                         help="Track allocations with tracemalloc and print the largest")
+        sub.add_argument('--verify', action='store_true',
+                         help="When a file is copied to another filesystem, compare the copy with the "
+                              "original before deleting the original")
+        sub.add_argument('--keep-empty', action='store_true',
+                         help="Keep folders that are left empty once their files are moved out")
+        if mode == 'undo':
+            continue
+        sub.add_argument('-j', '--workers', type=int, default=0,
+                         help="Parallel metadata readers, 0 picks a count for the storage (default: 0)")
+        sub.add_argument('-n', '--dry-run', action='store_true',
+                         help="Only plan the moves, do not move any files")
+        sub.add_argument('--plan', metavar='PATH',
+                         help="Save the move plan to a .json or .csv file")
+        if mode == 'flatten':
+            sub.add_argument('--duplicates', choices=['keep', 'skip', 'hardlink', 'move'], default='keep',
+                             help="What to do with byte-identical copies: keep them as numbered names, "
+                                  "skip them, hard link them to one copy or move them to a Duplicates "
+                                  "folder (default: keep)")
+            continue
+        if mode == 'similar':
+            sub.add_argument('--threshold', type=int, metavar='BITS',
+                             help="Largest hash difference, out of 64 bits, that still counts as similar "
+                                  "(default: 6)")
+            sub.add_argument('--method', choices=['dhash', 'phash'], default='dhash',
+                             help="Perceptual hash to compare images by (default: dhash)")
+            continue
+        if mode == 'cluster':
+            sub.add_argument('--radius', type=float, metavar='KM',
+                             help="Files this close to each other share a place (default: 1)")
+            sub.add_argument('--min-samples', type=int, default=1, metavar='N',
+                             help="Files needed within the radius to start a cluster; files left "
+                                  "over are named on their own (default: 1)")
+        if mode == 'multi':
+            sub.add_argument('--by', required=True, metavar='KEYS',
+                             help="Folder levels separated by '/', from: country, region, city, year, "
+                                  "month, model, type (e.g. country/city/year)")
+        if mode == 'tag':
+            sub.add_argument('--tags', metavar='TAGS',
+                             help="Comma separated keywords in order of preference; a file goes to the "
+                                  "first one it has, and 'People' also picks up hierarchical keywords "
+                                  "below it such as People|Family|Anna (default: each file's most common "
+                                  "keyword)")
+            sub.add_argument('-r', '--recursive', action='store_true',
+                             help="Also sort the files in subfolders, e.g. to re-sort by other tags")
+        if mode in ('location', 'multi'):
+            sub.add_argument('--infer-within', type=float, metavar='MINUTES',
+                             help="Give files without GPS the place of a geotagged file taken this close "
+                                  "in time during the same trip; 0 leaves them in Unknown (default: 60)")
+        sub.add_argument('--processes', action='store_true',
+                         help="Read metadata in worker processes instead of threads")
+        sub.add_argument('-w', '--watch', action='store_true',
+                         help="Keep running and sort new files as they land in the folder")
+        sub.add_argument('--settle', type=float, metavar='SECONDS',
+                         help="How long a new file must stay unchanged before it is sorted (default: 2)")
+        sub.add_argument('--poll', action='store_true',
+                         help="Poll the folder instead of using inotify")
+    return parser
+
+class ConsoleOutput:
+    def __init__(self, stream, as_json, min_level):
+        self.stream = stream
+        self.as_json = as_json
+        self.min_level = min_level
+        self.last_percent = None
+
+    def write(self, event):
+        self.stream.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+    def on_output(self, entries):
+        from reporter import LEVEL_NAMES
+
+        for level, message in entries:
+            if level < self.min_level:
+                continue
+            if self.as_json:
+                self.write({'event': 'log', 'level': LEVEL_NAMES.get(level, 'info'), 'message': message})
+            else:
+                self.stream.write(message + '\n')
+        self.stream.flush()
+
+    def on_progress(self, percent, processed, total):
+        if self.as_json:
+            self.write({'event': 'progress', 'percent': percent, 'processed': processed, 'total': total})
+        elif sys.stderr.isatty() and percent != self.last_percent:
+            sys.stderr.write(f"\r{percent:3d}% ({processed}/{total})")
+            if percent >= 100:
+                sys.stderr.write('\n')
+            sys.stderr.flush()
+        self.last_percent = percent
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    import os
+    from engine import create_job
+
+    if not os.path.isdir(args.folder):
+        print(f"pinpoint: error: {args.folder} is not a folder", file=sys.stderr)
+        return 2
+
+    options = {}
+    if args.mode != 'undo':
+        options.update(workers=args.workers, dry_run=args.dry_run, plan_path=args.plan)
+    if args.mode == 'flatten':
+        options['duplicates'] = args.duplicates
+    if args.mode == 'similar':
+        options.update(threshold=args.threshold, method=args.method)
+    if args.mode == 'multi':
+        options['keys'] = args.by
+    if args.mode == 'cluster':
+        options.update(radius_km=args.radius, min_samples=args.min_samples)
+    if args.mode == 'tag':
+        options.update(tags=args.tags, recursive=args.recursive)
+    if args.mode in ('location', 'multi') and args.infer_within is not None:
+        options['infer_within'] = args.infer_within * 60
+    if args.mode in ('location', 'time', 'multi', 'cluster', 'tag'):
+        options.update(use_processes=args.processes, watch=args.watch, settle=args.settle, polling=args.poll)
+
+    # Keep stdout for our own output; stray output from libraries and from
+    # worker processes goes to stderr so JSON consumers only ever see JSON
+    output = ConsoleOutput(sys.stdout, args.json, LEVELS[args.log_level])
+    try:
+        job = create_job(args.mode, os.path.abspath(args.folder),
+                         on_output=output.on_output, on_progress=output.on_progress, **options)
+    except ValueError as e:
+        print(f"pinpoint: error: {e}", file=sys.stderr)
+        return 2
+    job.verify = args.verify
+    job.prune_empty = not args.keep_empty
+    if args.trace or args.profile or args.trace_memory:
+        job.instrument(args.trace, args.profile, args.trace_memory)
+    sys.stdout = sys.stderr
+    try:
+        job.run()
+    except KeyboardInterrupt:
+        # The normal way to end --watch; the job has already cleaned up
+        pass
+    finally:
+        sys.stdout = output.stream
+
+    if args.json:
+        output.write({'event': 'done', 'mode': args.mode, 'planned': job.planned,
+                      'moved': job.moved, 'errors': job.errors})
+    return 1 if job.errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
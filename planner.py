@@ -0,0 +1,172 @@
+import csv
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from instrument import current_recorder, stage, use_recorder
+
+class PlannedMove:
+    __slots__ = ('source', 'destination', 'reason')
+
+    def __init__(self, source, destination, reason=''):
+        self.source = source
+        self.destination = destination
+        self.reason = reason
+
+    def __repr__(self):
+        return f"PlannedMove({self.source!r} -> {self.destination!r})"
+
+    def to_dict(self):
+        return {'source': self.source, 'destination': self.destination, 'reason': self.reason}
+
+class MovePlan:
+    def __init__(self, root, mode):
+        self.root = root
+        self.mode = mode
+        self.created = datetime.now().isoformat(timespec='seconds')
+        self.moves = []
+        self.destinations = set()
+        self._listings = {}
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __iter__(self):
+        return iter(self.moves)
+
+    def add(self, source, destination, reason=''):
+        move = PlannedMove(source, destination, reason)
+        self.moves.append(move)
+        self.destinations.add(destination)
+        return move
+
+    def add_to_folder(self, source, folder_name, reason=''):
+        destination = os.path.join(os.path.dirname(source), folder_name, os.path.basename(source))
+        return self.add(source, self.free_destination(source, destination), reason)
+
+    def free_destination(self, source, destination):
+        """destination, or a numbered name next to it if another file has it or is planned to."""
+        base_name, ext = os.path.splitext(destination)
+        number = 1
+        while destination != source and (destination in self.destinations or self.exists(destination)):
+            number += 1
+            destination = f"{base_name} {number}{ext}"
+        return destination
+
+    def exists(self, path):
+        # Each destination folder is listed once rather than stat'ing every name
+        directory, name = os.path.split(path)
+        names = self._listings.get(directory)
+        if names is None:
+            try:
+                names = self._listings[directory] = set(os.listdir(directory))
+            except OSError:
+                names = self._listings[directory] = set()
+        return name in names
+
+    def group_by_directory(self):
+        groups = defaultdict(list)
+        for move in self.moves:
+            groups[os.path.dirname(move.destination)].append(move)
+        return groups
+
+    def describe(self):
+        for move in self.moves:
+            yield f"{os.path.relpath(move.source, self.root)} -> {os.path.relpath(move.destination, self.root)}"
+
+    def save(self, path):
+        if path.lower().endswith('.csv'):
+            self.save_csv(path)
+        else:
+            self.save_json(path)
+
+    def save_json(self, path):
+        data = {'root': self.root, 'mode': self.mode, 'created': self.created,
+                'moves': [move.to_dict() for move in self.moves]}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def save_csv(self, path):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['source', 'destination', 'reason'])
+            for move in self.moves:
+                writer.writerow([move.source, move.destination, move.reason])
+
+def execute_plan(plan, on_move=None, on_error=None, workers=1, verify=False):
+    """Carry out a plan; returns the number of files moved.
+
+    Renames within a filesystem happen on the calling thread. Moves to
+    another filesystem are copies, run on up to `workers` threads with the
+    copy checked against the source first when `verify` is set. on_move and
+    on_error are always called on the calling thread.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from mover import move_across, move_link, rename_no_replace
+
+    groups = plan.group_by_directory()
+    devices = {}
+    copies = {}
+    moved = 0
+    executor = None
+
+    def copy(move):
+        with stage('copy'):
+            move_across(move.source, move.destination, verify)
+
+    try:
+        for dest_dir in sorted(groups):
+            try:
+                os.makedirs(dest_dir, exist_ok=True)
+                dest_device = os.stat(dest_dir).st_dev
+            except OSError as e:
+                for move in groups[dest_dir]:
+                    if on_error:
+                        on_error(move, e)
+                continue
+
+            for move in groups[dest_dir]:
+                source_dir = os.path.dirname(move.source)
+                try:
+                    if source_dir not in devices:
+                        devices[source_dir] = os.stat(source_dir).st_dev
+                    if move.source != move.destination and devices[source_dir] != dest_device \
+                            and not os.path.islink(move.source):
+                        if executor is None:
+                            executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="copy",
+                                                          initializer=use_recorder,
+                                                          initargs=(current_recorder(),))
+                        copies[executor.submit(copy, move)] = move
+                        continue
+                    with stage('move'):
+                        if move.source == move.destination:
+                            pass
+                        elif devices[source_dir] == dest_device:
+                            rename_no_replace(move.source, move.destination)
+                        else:
+                            move_link(move.source, move.destination)
+                except OSError as e:
+                    if on_error:
+                        on_error(move, e)
+                    continue
+
+                moved += 1
+                if on_move:
+                    on_move(move)
+
+        for future in as_completed(copies):
+            move = copies[future]
+            try:
+                future.result()
+            except OSError as e:
+                if on_error:
+                    on_error(move, e)
+                continue
+            moved += 1
+            if on_move:
+                on_move(move)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    return moved
\ No newline at end of file
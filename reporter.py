@@ -0,0 +1,93 @@
+import threading
+import time
+from instrument import current_recorder, stage, use_recorder
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: 'debug', INFO: 'info', WARNING: 'warning', ERROR: 'error'}
+
+FLUSH_INTERVAL = 0.1
+
+class ThrottledReporter:
+    # Collects log lines and progress from a worker and hands them on in
+    # batches at most every FLUSH_INTERVAL seconds, so a fast job cannot
+    # flood the receiving event loop with one signal per file
+    def __init__(self, emit_logs, emit_progress, interval=FLUSH_INTERVAL):
+        self.emit_logs = emit_logs
+        self.emit_progress = emit_progress
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._lines = []
+        self._progress = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(current_recorder(),), name="reporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self, recorder):
+        use_recorder(recorder)
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def log(self, message, level=INFO):
+        with self._lock:
+            self._lines.append((level, message))
+
+    def progress(self, percent, processed=0, total=0):
+        with self._lock:
+            self._progress = (percent, processed, total)
+
+    def flush(self):
+        with self._lock:
+            lines, self._lines = self._lines, []
+            progress, self._progress = self._progress, None
+
+        with stage('report'):
+            if lines:
+                self.emit_logs(lines)
+            if progress is not None:
+                self.emit_progress(*progress)
+
+class RateEstimator:
+    # Smoothed items/sec and ETA for a percent-based progress bar
+    def __init__(self, window=5.0):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.started = time.monotonic()
+        self.samples = []
+
+    def update(self, percent, processed):
+        now = time.monotonic()
+        self.samples.append((now, processed, percent))
+        while len(self.samples) > 2 and now - self.samples[0][0] > self.window:
+            self.samples.pop(0)
+
+    def rate(self):
+        if len(self.samples) < 2:
+            return 0.0
+        (t0, n0, _), (t1, n1, _) = self.samples[0], self.samples[-1]
+        return (n1 - n0) / (t1 - t0) if t1 > t0 and n1 >= n0 else 0.0
+
+    def eta(self):
+        if not self.samples:
+            return None
+        _, _, percent = self.samples[-1]
+        if percent <= 0 or percent >= 100:
+            return None
+        elapsed = self.samples[-1][0] - self.started
+        return elapsed * (100 - percent) / percent
\ No newline at end of file
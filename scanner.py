@@ -0,0 +1,95 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from instrument import current_recorder, stage, use_recorder
+
+logger = logging.getLogger('pinpoint.scanner')
+
+def list_dir(path, include_hidden):
+    files = []
+    subdirs = []
+    try:
+        with stage('scan'), os.scandir(path) as it:
+            for entry in it:
+                if not include_hidden and entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        # Prime the DirEntry's stat cache while the directory is hot
+                        entry.stat()
+                        files.append(entry)
+                except OSError:
+                    continue
+    except OSError as e:
+        logger.warning(f"Error scanning {path}: {e}")
+    return files, subdirs
+
+class DirectoryScanner:
+    # Streams DirEntry objects for files as each directory is listed. Every
+    # directory is read in full before its files are yielded, so moving files
+    # out of (or into) an already listed directory cannot change the results.
+    def __init__(self, folder_path, recursive=False, include_hidden=False, workers=1):
+        self.folder_path = folder_path
+        self.recursive = recursive
+        self.include_hidden = include_hidden
+        self.workers = max(1, workers)
+        self.scanned = 0
+        self.complete = False
+
+    def __iter__(self):
+        if not self.recursive or self.workers == 1:
+            yield from self.scan_serial()
+        else:
+            yield from self.scan_parallel()
+        self.complete = True
+
+    def scan_serial(self):
+        pending = deque([self.folder_path])
+        while pending:
+            files, subdirs = list_dir(pending.popleft(), self.include_hidden)
+            if self.recursive:
+                pending.extend(subdirs)
+            for entry in files:
+                self.scanned += 1
+                yield entry
+
+    def scan_parallel(self):
+        # Directory listings are latency bound on network shares, so several
+        # are kept in flight while results are yielded in breadth-first order
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scan",
+                                initializer=use_recorder, initargs=(current_recorder(),)) as executor:
+            pending = deque([executor.submit(list_dir, self.folder_path, self.include_hidden)])
+            while pending:
+                files, subdirs = pending.popleft().result()
+                for subdir in subdirs:
+                    pending.append(executor.submit(list_dir, subdir, self.include_hidden))
+                for entry in files:
+                    self.scanned += 1
+                    yield entry
+
+def iter_batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class FileEntry:
+    # The parts of os.DirEntry the sort jobs use, for paths that did not come from a scan
+    __slots__ = ('path', 'name', '_stat')
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stat = None
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
\ No newline at end of file
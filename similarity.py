@@ -0,0 +1,151 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+from instrument import current_recorder, use_recorder
+
+# Perceptual hashes and near-duplicate grouping. Each image becomes a 64-bit
+# hash from a tiny greyscale decode; images whose hashes differ in at most
+# `threshold` bits are treated as the same shot (bursts, re-encodes, resizes).
+
+HASH_SIZE = 8
+DEFAULT_THRESHOLD = 6
+HASH_CHUNK_SIZE = 256
+BUCKET_CHUNK_SIZE = 1024
+
+BIT_WEIGHTS = (1 << np.arange(63, -1, -1, dtype=np.uint64)).astype(np.uint64)
+POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+logger = logging.getLogger('pinpoint.similarity')
+
+def load_reduced(file_path, size):
+    # draft() lets the JPEG decoder scale by 1/2..1/8 in the DCT, so a
+    # 24 MP photo is decoded at a fraction of the cost of a full decode
+    with Image.open(file_path) as img:
+        img.draft('L', (size * 4, size * 4))
+        return img.convert('L')
+
+def pack_bits(bits):
+    return int(np.dot(bits.ravel().astype(np.uint64), BIT_WEIGHTS))
+
+def dhash(file_path):
+    img = load_reduced(file_path, HASH_SIZE).resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    pixels = np.asarray(img, dtype=np.int16)
+    return pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+def dct_matrix(n):
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * k * (2 * np.arange(n)[None, :] + 1) / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+PHASH_SIZE = HASH_SIZE * 4
+PHASH_DCT = dct_matrix(PHASH_SIZE)
+
+def phash(file_path):
+    img = load_reduced(file_path, PHASH_SIZE).resize((PHASH_SIZE, PHASH_SIZE), Image.BILINEAR)
+    pixels = np.asarray(img, dtype=np.float64)
+    low = (PHASH_DCT @ pixels @ PHASH_DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    return pack_bits(low > np.median(low.ravel()[1:]))
+
+HASH_FUNCTIONS = {'dhash': dhash, 'phash': phash}
+
+def hash_images(file_paths, method='dhash', workers=1, on_progress=None):
+    """Hash images on a thread pool (Pillow releases the GIL while decoding).
+
+    Returns (paths, hashes) where hashes is a uint64 array aligned with
+    paths. Files that cannot be decoded are left out.
+    """
+    hash_function = HASH_FUNCTIONS[method]
+
+    def safe_hash(file_path):
+        try:
+            return hash_function(file_path)
+        except Exception as e:
+            # The job reports how many images could not be read
+            logger.debug(f"Error hashing {file_path}: {e}")
+            return None
+
+    paths = []
+    hashes = []
+    file_paths = list(file_paths)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="phash",
+                            initializer=use_recorder, initargs=(current_recorder(),)) as executor:
+        for start in range(0, len(file_paths), HASH_CHUNK_SIZE):
+            chunk = file_paths[start:start + HASH_CHUNK_SIZE]
+            for file_path, value in zip(chunk, executor.map(safe_hash, chunk)):
+                if value is not None:
+                    paths.append(file_path)
+                    hashes.append(value)
+            if on_progress:
+                on_progress(min(start + HASH_CHUNK_SIZE, len(file_paths)), len(file_paths))
+    return paths, np.array(hashes, dtype=np.uint64)
+
+def popcount(values):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return POPCOUNT_TABLE[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+def band_masks(threshold):
+    # Pigeonhole: two hashes at most `threshold` bits apart agree exactly on
+    # at least one of threshold + 1 disjoint bands, so only hashes sharing a
+    # band value ever need comparing
+    bands = min(threshold + 1, 64)
+    bounds = np.linspace(0, 64, bands + 1).astype(int)
+    return [(int(lo), np.uint64(((1 << (hi - lo)) - 1) << lo)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+class DisjointSet:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+def similar_pairs(hashes, threshold=DEFAULT_THRESHOLD):
+    """Yield (i, j) index pairs whose hashes are within `threshold` bits."""
+    for shift, mask in band_masks(threshold):
+        keys = (hashes & mask) >> np.uint64(shift)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+
+        for start, end in zip(starts, ends):
+            if end - start < 2:
+                continue
+            bucket = order[start:end]
+            values = hashes[bucket]
+            for row in range(0, len(bucket), BUCKET_CHUNK_SIZE):
+                rows = values[row:row + BUCKET_CHUNK_SIZE, None]
+                distances = popcount(rows ^ values[None, :])
+                i, j = np.nonzero(distances <= threshold)
+                upper = row + i < j
+                yield from zip(bucket[row + i[upper]].tolist(), bucket[j[upper]].tolist())
+
+def group_similar(paths, hashes, threshold=DEFAULT_THRESHOLD):
+    """Group paths transitively by hash distance; singletons are dropped.
+
+    Groups are returned in path order, each with its paths sorted.
+    """
+    groups = DisjointSet(len(paths))
+    for i, j in similar_pairs(hashes, threshold):
+        groups.union(i, j)
+
+    members = {}
+    for index in range(len(paths)):
+        members.setdefault(groups.find(index), []).append(paths[index])
+    return sorted((sorted(group) for group in members.values() if len(group) > 1), key=lambda g: g[0])
+
+def group_folder_name(group):
+    return f"Similar - {os.path.splitext(os.path.basename(group[0]))[0]}"
\ No newline at end of file
@@ -0,0 +1,70 @@
+import os
+import re
+from constants import IMAGE_FORMATS, VIDEO_FORMATS
+
+# Folder keys for multi-level sorting. Each key turns a file's metadata
+# record (and its reverse geocoded place, for the location keys) into one
+# folder name; a list of keys such as country/city/year/month builds the
+# nested destination, so a file is read once and moved once.
+
+UNKNOWN = 'Unknown'
+INVALID_FOLDER_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+def country_key(record, place):
+    return place.country if place and place.country else UNKNOWN
+
+def region_key(record, place):
+    return place.admin1 if place and place.admin1 else UNKNOWN
+
+def city_key(record, place):
+    return place.name if place and place.name else UNKNOWN
+
+def year_key(record, place):
+    return str(record.creation_time.year)
+
+def month_key(record, place):
+    # Numbered so months list in calendar order
+    return record.creation_time.strftime("%m - %b")
+
+def model_key(record, place):
+    return record.model.strip() if record.model and record.model.strip() else 'Unknown Camera'
+
+def media_type_key(record, place):
+    file_extension = os.path.splitext(record.path)[1].lower()
+    if file_extension in IMAGE_FORMATS:
+        return 'Images'
+    if file_extension in VIDEO_FORMATS:
+        return 'Videos'
+    return 'Other'
+
+SORT_KEYS = {
+    'country': country_key,
+    'region': region_key,
+    'city': city_key,
+    'year': year_key,
+    'month': month_key,
+    'model': model_key,
+    'type': media_type_key,
+}
+
+PLACE_KEYS = {'country', 'region', 'city'}
+
+def parse_sort_keys(text):
+    """Turn "country/city/year" (or comma separated) into a list of key names."""
+    keys = [key.strip().lower() for key in re.split(r'[/,>\s]+', text) if key.strip()]
+    if not keys:
+        raise ValueError("No sort keys given")
+    unknown = [key for key in keys if key not in SORT_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown sort keys: {', '.join(unknown)} (choose from {', '.join(SORT_KEYS)})")
+    return keys
+
+def needs_place(keys):
+    return any(key in PLACE_KEYS for key in keys)
+
+def safe_folder_name(name):
+    name = INVALID_FOLDER_CHARS.sub('_', name).strip(' .')
+    return name or UNKNOWN
+
+def destination_folders(keys, record, place=None):
+    return [safe_folder_name(SORT_KEYS[key](record, place)) for key in keys]
\ No newline at end of file
@@ -0,0 +1,287 @@
+import mmap
+import os
+import struct
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+from exif_header import JPEG_SCAN_LIMIT
+from instrument import current_recorder, stage, use_recorder
+
+# Keywords for tag sorting. Tags are read from XMP (dc:subject and Lightroom's
+# lr:hierarchicalSubject, embedded or in a .xmp sidecar) and from IPTC
+# Keywords, then kept in an inverted index in the metadata cache database.
+# The index remembers each file's size and mtime, and its sidecar's, so
+# later sorts only read files that changed and re-sorting by another tag
+# reads none. Hierarchical keywords keep Lightroom's '|' separator.
+
+XMP_SCAN_LIMIT = 1024 * 1024
+QUERY_CHUNK_SIZE = 500
+HIERARCHY_SEPARATOR = '|'
+SIDECAR_EXTENSION = '.xmp'
+
+RDF_LI = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}li'
+XMP_KEYWORD_PROPERTIES = ['{http://purl.org/dc/elements/1.1/}subject',
+                          '{http://ns.adobe.com/lightroom/1.0/}hierarchicalSubject']
+
+PHOTOSHOP_SIGNATURE = b'Photoshop 3.0\x00'
+XMP_SIGNATURE = b'http://ns.adobe.com/xap/1.0/\x00'
+IPTC_RESOURCE_ID = 0x0404
+IPTC_KEYWORDS = (2, 25)
+IPTC_CODED_CHARSET = (1, 90)
+IPTC_UTF8 = b'\x1b%G'
+
+def parse_xmp(packet):
+    start = packet.find(b'<x:xmpmeta')
+    end = packet.find(b'</x:xmpmeta>', start)
+    if start < 0 or end < 0:
+        return []
+    try:
+        root = ElementTree.fromstring(packet[start:end + len(b'</x:xmpmeta>')])
+    except ElementTree.ParseError:
+        return []
+
+    tags = []
+    for name in XMP_KEYWORD_PROPERTIES:
+        for prop in root.iter(name):
+            tags.extend(item.text for item in prop.iter(RDF_LI) if item.text)
+    return tags
+
+def parse_iptc(data):
+    # IIM records: 0x1C, record number, dataset number, 2 byte length
+    keywords = []
+    utf8 = False
+    pos = 0
+    while pos + 5 <= len(data) and data[pos] == 0x1C:
+        record, dataset, length = struct.unpack('>BBH', data[pos + 1:pos + 5])
+        if length & 0x8000:
+            # Extended lengths are only used for large binary datasets
+            break
+        value = data[pos + 5:pos + 5 + length]
+        if (record, dataset) == IPTC_CODED_CHARSET:
+            utf8 = value == IPTC_UTF8
+        elif (record, dataset) == IPTC_KEYWORDS:
+            keywords.append(value)
+        pos += 5 + length
+
+    tags = []
+    for value in keywords:
+        try:
+            tags.append(value.decode('utf-8'))
+        except UnicodeDecodeError:
+            tags.append(value.decode('utf-8' if utf8 else 'latin-1', 'replace'))
+    return tags
+
+def parse_photoshop_resources(payload):
+    # 8BIM blocks: id, even-padded Pascal name, size, even-padded data
+    pos = len(PHOTOSHOP_SIGNATURE)
+    while pos + 12 <= len(payload) and payload[pos:pos + 4] == b'8BIM':
+        resource_id = struct.unpack('>H', payload[pos + 4:pos + 6])[0]
+        name_length = payload[pos + 6]
+        pos += 6 + (name_length + 2) // 2 * 2
+        if pos + 4 > len(payload):
+            break
+        size = struct.unpack('>I', payload[pos:pos + 4])[0]
+        data = payload[pos + 4:pos + 4 + size]
+        if resource_id == IPTC_RESOURCE_ID:
+            return parse_iptc(data)
+        pos += 4 + (size + 1) // 2 * 2
+    return []
+
+def read_jpeg_tags(f):
+    tags = []
+    pos = 2
+    while pos < JPEG_SCAN_LIMIT:
+        f.seek(pos)
+        header = f.read(4)
+        if len(header) < 4 or header[0] != 0xFF:
+            break
+        marker = header[1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0xD9, 0xDA):
+            break
+        length = struct.unpack('>H', header[2:4])[0]
+
+        if marker == 0xE1:
+            payload = f.read(length - 2)
+            if payload.startswith(XMP_SIGNATURE):
+                tags.extend(parse_xmp(payload))
+        elif marker == 0xED:
+            payload = f.read(length - 2)
+            if payload.startswith(PHOTOSHOP_SIGNATURE):
+                tags.extend(parse_photoshop_resources(payload))
+
+        pos += 2 + length
+    return tags
+
+def read_png_tags(f):
+    pos = 8
+    while True:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type == b'iTXt':
+            chunk = f.read(length)
+            keyword, _, rest = chunk.partition(b'\x00')
+            if keyword == b'XML:com.adobe.xmp' and len(rest) > 2:
+                compressed = rest[0] == 1
+                # Skip the compression method, language tag and translated keyword
+                text = rest[2:].split(b'\x00', 2)[-1]
+                if compressed:
+                    import zlib
+                    text = zlib.decompress(text)
+                return parse_xmp(text)
+        elif chunk_type == b'IEND':
+            break
+        pos += 12 + length
+    return []
+
+def scan_xmp_packet(f):
+    # TIFF, HEIF, WebP and video files keep XMP in places that differ by
+    # format; the packet itself is always plain text near the start or, for
+    # videos written by cameras, in the moov box at the end
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        return []
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        for start, end in ((0, min(size, XMP_SCAN_LIMIT)), (max(0, size - XMP_SCAN_LIMIT), size)):
+            found = buf.find(b'<x:xmpmeta', start, end)
+            if found >= 0:
+                closing = buf.find(b'</x:xmpmeta>', found, min(size, found + XMP_SCAN_LIMIT))
+                if closing >= 0:
+                    return parse_xmp(buf[found:closing + len(b'</x:xmpmeta>')])
+    return []
+
+def read_embedded_tags(file_path):
+    with open(file_path, 'rb') as f:
+        head = f.read(8)
+        if head[:2] == b'\xff\xd8':
+            return read_jpeg_tags(f)
+        if head == b'\x89PNG\r\n\x1a\n':
+            return read_png_tags(f)
+        return scan_xmp_packet(f)
+
+def read_tags(file_path, sidecar_path=None):
+    """Keywords of a media file and its sidecar, without duplicates, in the order found."""
+    with stage('tags'):
+        tags = read_embedded_tags(file_path)
+        if sidecar_path:
+            with open(sidecar_path, 'rb') as f:
+                tags += parse_xmp(f.read())
+
+    unique = {}
+    for tag in tags:
+        tag = tag.strip()
+        if tag:
+            unique.setdefault(tag.casefold(), tag)
+    return list(unique.values())
+
+def sidecar_names(file_path):
+    # Lightroom writes IMG_0001.xmp, darktable and others IMG_0001.jpg.xmp
+    base = os.path.splitext(file_path)[0]
+    return [base + SIDECAR_EXTENSION, file_path + SIDECAR_EXTENSION]
+
+def match_sidecars(file_paths, media_paths):
+    """Map each media path to the .xmp sidecar among file_paths, if it has one."""
+    by_name = {path.lower(): path for path in file_paths if path.lower().endswith(SIDECAR_EXTENSION)}
+    sidecars = {}
+    for path in media_paths:
+        for name in sidecar_names(path):
+            sidecar = by_name.pop(name.lower(), None)
+            if sidecar:
+                sidecars[path] = sidecar
+                break
+    return sidecars
+
+def parse_tag_list(text):
+    """Turn "Family, Places|France" into a list of tags; '|' separates keyword levels."""
+    return [tag.strip() for tag in text.split(',') if tag.strip()]
+
+def tag_matches(tag, wanted):
+    # A hierarchical keyword also matches its ancestors: People|Family|Anna matches People
+    tag = tag.casefold()
+    wanted = wanted.casefold()
+    return tag == wanted or tag.startswith(wanted + HIERARCHY_SEPARATOR)
+
+def tag_folders(tag):
+    return [part.strip() for part in tag.split(HIERARCHY_SEPARATOR) if part.strip()]
+
+class TagIndex:
+    # Lives in the metadata cache's database: tag_files records what each
+    # indexed file looked like when its tags were read, tags is the inverted
+    # index. MetadataCache.record_move keeps both in step with moved files.
+    def __init__(self, cache):
+        self.conn = cache.conn
+        self.read = 0
+        self.indexed = 0
+
+    def _rows(self, table, columns, paths):
+        rows = {}
+        paths = list(paths)
+        for start in range(0, len(paths), QUERY_CHUNK_SIZE):
+            chunk = paths[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self.conn.execute(f"SELECT path, {columns} FROM {table} WHERE path IN ({placeholders})",
+                                         chunk):
+                rows.setdefault(row[0], []).append(row[1:])
+        return rows
+
+    def update(self, file_paths, sidecars=None, stats=None, workers=1, on_error=None):
+        """Read tags from the files that are new or changed since they were indexed."""
+        sidecars = sidecars or {}
+        known = stats or {}
+        indexed = {path: rows[0] for path, rows in self._rows('tag_files', 'size, mtime_ns, sidecar_mtime_ns',
+                                                               file_paths).items()}
+
+        stale = {}
+        for file_path in file_paths:
+            try:
+                stat = known.get(file_path) or os.stat(file_path)
+                sidecar = sidecars.get(file_path)
+                sidecar_mtime_ns = os.stat(sidecar).st_mtime_ns if sidecar else 0
+            except OSError as e:
+                if on_error:
+                    on_error(file_path, e)
+                continue
+            key = (stat.st_size, stat.st_mtime_ns, sidecar_mtime_ns)
+            if indexed.get(file_path) != key:
+                stale[file_path] = key
+        self.indexed += len(file_paths) - len(stale)
+        if not stale:
+            return 0
+
+        def read(file_path):
+            try:
+                return read_tags(file_path, sidecars.get(file_path))
+            except (OSError, ValueError) as e:
+                if on_error:
+                    on_error(file_path, e)
+                return None
+
+        paths = list(stale)
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="tags",
+                                initializer=use_recorder, initargs=(current_recorder(),)) as executor:
+            results = list(executor.map(read, paths))
+
+        file_rows = []
+        tag_rows = []
+        for file_path, tags in zip(paths, results):
+            if tags is None:
+                continue
+            file_rows.append((file_path,) + stale[file_path])
+            tag_rows.extend((tag, file_path) for tag in tags)
+        self.conn.executemany("DELETE FROM tags WHERE path = ?", [(row[0],) for row in file_rows])
+        self.conn.executemany("INSERT OR REPLACE INTO tag_files (path, size, mtime_ns, sidecar_mtime_ns) "
+                              "VALUES (?, ?, ?, ?)", file_rows)
+        self.conn.executemany("INSERT OR IGNORE INTO tags (tag, path) VALUES (?, ?)", tag_rows)
+        self.conn.commit()
+        self.read += len(file_rows)
+        return len(file_rows)
+
+    def tags_for(self, file_paths):
+        return {path: sorted(tag for tag, in rows) for path, rows in self._rows('tags', 'tag', file_paths).items()}
+
+    def summary(self):
+        return f"Tag index: {self.indexed} files unchanged, {self.read} read"
\ No newline at end of file
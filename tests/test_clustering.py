@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from clustering import MAX_RADIUS_KM, MIN_RADIUS_KM, check_radius, cluster_representatives, dbscan
+
+def test_nearby_points_share_a_cluster():
+    # Two groups a few hundred metres across, about 30 km apart
+    lat = np.array([48.8566, 48.8570, 48.8580, 49.1000, 49.1010])
+    lon = np.array([2.3522, 2.3530, 2.3510, 2.5000, 2.5005])
+    assert dbscan(lat, lon, 1.0).tolist() == [0, 0, 0, 1, 1]
+
+def test_points_chain_into_one_cluster():
+    # 0.8 km steps: no two ends are within 1 km, but every neighbour is
+    lat = 48.0 + np.arange(6) * 0.8 / 111.2
+    lon = np.full(6, 2.0)
+    assert set(dbscan(lat, lon, 1.0).tolist()) == {0}
+
+def test_min_samples_marks_isolated_points_as_noise():
+    lat = np.array([48.8566, 48.8567, 48.8568, 50.0])
+    lon = np.array([2.3522, 2.3523, 2.3524, 3.0])
+    assert dbscan(lat, lon, 1.0, min_samples=3).tolist() == [0, 0, 0, -1]
+
+def test_clusters_cross_the_antimeridian():
+    lat = np.array([0.0, 0.0])
+    lon = np.array([179.999, -179.999])
+    assert dbscan(lat, lon, 1.0).tolist() == [0, 0]
+
+def test_empty_input():
+    assert dbscan(np.array([]), np.array([]), 1.0).tolist() == []
+
+def test_representative_is_the_point_nearest_the_centre():
+    lat = np.array([10.0, 10.001, 10.002, 20.0])
+    lon = np.array([10.0, 10.001, 10.002, 20.0])
+    labels = dbscan(lat, lon, 1.0)
+    assert cluster_representatives(lat, lon, labels) == {0: 1, 1: 3}
+
+@pytest.mark.parametrize('radius_km', [0, -1, MIN_RADIUS_KM / 2, MAX_RADIUS_KM * 2, float('nan')])
+def test_radius_out_of_range(radius_km):
+    with pytest.raises(ValueError):
+        check_radius(radius_km)
+    with pytest.raises(ValueError):
+        dbscan(np.array([0.0]), np.array([0.0]), radius_km)
+
+def test_smallest_radius_still_clusters():
+    lat = np.array([0.0, 0.00005])
+    lon = np.array([0.0, 0.0])
+    assert dbscan(lat, lon, MIN_RADIUS_KM).tolist() == [0, 0]
\ No newline at end of file
@@ -0,0 +1,83 @@
+import os
+import pytest
+import dedupe
+from dedupe import DUPLICATES_FOLDER, find_duplicates, link_duplicate
+from engine import create_job
+from metadata_cache import FINGERPRINT_BLOCK_SIZE
+
+BLOCK = FINGERPRINT_BLOCK_SIZE
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+
+@pytest.fixture
+def hashed(monkeypatch):
+    # Records which files were read in full
+    paths = []
+    content_hash = dedupe.content_hash
+
+    def recording(path):
+        paths.append(os.path.basename(path))
+        return content_hash(path)
+
+    monkeypatch.setattr(dedupe, 'content_hash', recording)
+    return paths
+
+def write(folder, files):
+    sizes = {}
+    for name, data in files.items():
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        sizes[str(path)] = len(data)
+    return sizes
+
+def test_identical_files_are_grouped_keeper_first(tmp_path, hashed):
+    sizes = write(tmp_path, {'trip/b.jpg': b'photo', 'a.jpg': b'photo', 'c.jpg': b'other', 'empty': b'',
+                             'empty2': b''})
+    assert find_duplicates(sizes) == [[str(tmp_path / 'a.jpg'), str(tmp_path / 'trip' / 'b.jpg')]]
+    # Small files are settled by the fingerprint alone
+    assert hashed == []
+
+def test_same_size_with_different_content(tmp_path, hashed):
+    sizes = write(tmp_path, {'a.jpg': b'a' * 3 * BLOCK, 'b.jpg': b'b' * 3 * BLOCK})
+    assert find_duplicates(sizes) == []
+    assert hashed == []
+
+def test_same_fingerprint_with_different_content(tmp_path, hashed):
+    # Equal first and last blocks, different middles
+    edge = b'x' * BLOCK
+    sizes = write(tmp_path, {'a.jpg': edge + b'a' * BLOCK + edge, 'b.jpg': edge + b'b' * BLOCK + edge,
+                             'c.jpg': edge + b'a' * BLOCK + edge})
+    assert find_duplicates(sizes, workers=2) == [[str(tmp_path / 'a.jpg'), str(tmp_path / 'c.jpg')]]
+    assert sorted(hashed) == ['a.jpg', 'b.jpg', 'c.jpg']
+
+def test_link_duplicate_replaces_the_copy(tmp_path):
+    write(tmp_path, {'a.jpg': b'photo', 'b.jpg': b'photo'})
+    original, duplicate = str(tmp_path / 'a.jpg'), str(tmp_path / 'b.jpg')
+    assert link_duplicate(original, duplicate)
+    assert os.path.samefile(original, duplicate)
+    assert not link_duplicate(original, duplicate)
+    assert sorted(os.listdir(tmp_path)) == ['a.jpg', 'b.jpg']
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / 'photos'
+    write(root, {'a.jpg': b'photo', 'trip/a.jpg': b'photo', 'trip/b.jpg': b'other'})
+    return root
+
+def test_flatten_hardlinks_duplicates(folder):
+    assert create_job('flatten', str(folder), duplicates='hardlink').run() == 2
+    assert sorted(os.listdir(folder)) == ['a 1.jpg', 'a.jpg', 'b.jpg']
+    assert os.path.samefile(folder / 'a.jpg', folder / 'a 1.jpg')
+
+def test_flatten_skips_duplicates(folder):
+    assert create_job('flatten', str(folder), duplicates='skip').run() == 1
+    assert sorted(os.listdir(folder)) == ['a.jpg', 'b.jpg', 'trip']
+    assert os.listdir(folder / 'trip') == ['a.jpg']
+
+def test_flatten_moves_duplicates_aside(folder):
+    assert create_job('flatten', str(folder), duplicates='move').run() == 2
+    assert sorted(os.listdir(folder)) == [DUPLICATES_FOLDER, 'a.jpg', 'b.jpg']
+    assert os.listdir(folder / DUPLICATES_FOLDER) == ['a.jpg']
\ No newline at end of file
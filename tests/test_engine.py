@@ -0,0 +1,42 @@
+import os
+import pytest
+from engine import create_job
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+
+def test_reader_warnings_reach_the_job_log(tmp_path):
+    folder = tmp_path / 'inbox'
+    folder.mkdir()
+    (folder / 'broken.jpg').write_bytes(b'not a jpeg')
+    lines = []
+
+    job = create_job('time', str(folder), workers=2, dry_run=True, on_output=lines.extend)
+    job.run()
+
+    assert (30, "Unsupported image format: broken.jpg") in lines
+def test_flatten_leaves_top_level_files_in_place(tmp_path):
+    folder = tmp_path / 'photos'
+    (folder / 'trip').mkdir(parents=True)
+    (folder / 'b.jpg').write_bytes(b'b')
+    (folder / 'trip' / 'c.jpg').write_bytes(b'c')
+    lines = []
+
+    job = create_job('flatten', str(folder), on_output=lines.extend)
+    assert job.run() == 1
+
+    assert sorted(os.listdir(folder)) == ['b.jpg', 'c.jpg']
+    assert not any('b.jpg' in message for _, message in lines)
+def test_undo_restores_a_flattened_folder(tmp_path):
+    folder = tmp_path / 'photos'
+    (folder / 'trip').mkdir(parents=True)
+    (folder / 'trip' / 'c.jpg').write_bytes(b'c')
+    create_job('flatten', str(folder)).run()
+
+    job = create_job('undo', str(folder), workers=0)
+    assert job.run() == 1
+    assert job.workers >= 1
+    assert os.listdir(folder) == ['trip']
+    assert os.listdir(folder / 'trip') == ['c.jpg']
+    assert create_job('undo', str(folder)).run() == 0
\ No newline at end of file
@@ -0,0 +1,43 @@
+import numpy as np
+from events import nearest_geotagged, split_events
+
+NAN = np.nan
+
+def test_untagged_points_take_the_nearest_fix_in_time():
+    times = [0, 100, 1000, 1200]
+    lat = [48.85, NAN, NAN, 48.86]
+    lon = [2.35, NAN, NAN, 2.35]
+    assert nearest_geotagged(times, lat, lon).tolist() == [0, 0, 3, 3]
+
+def test_input_order_does_not_matter():
+    times = [1200, 100, 0, 1000]
+    lat = [48.86, NAN, 48.85, NAN]
+    lon = [2.35, NAN, 2.35, NAN]
+    assert nearest_geotagged(times, lat, lon).tolist() == [0, 2, 2, 0]
+
+def test_points_beyond_tolerance_stay_unlocated():
+    times = [0, 600, 7200]
+    lat = [48.85, NAN, NAN]
+    lon = [2.35, NAN, NAN]
+    assert nearest_geotagged(times, lat, lon, tolerance=3600).tolist() == [0, 0, -1]
+
+def test_fixes_are_not_borrowed_across_a_long_pause():
+    # Within tolerance of the later fix, but a pause longer than max_gap
+    # separates them, so they are different events
+    times = [0, 5000, 5100]
+    lat = [NAN, NAN, 48.85]
+    lon = [NAN, NAN, 2.35]
+    donors = nearest_geotagged(times, lat, lon, tolerance=10000, max_gap=1000)
+    assert donors.tolist() == [-1, 2, 2]
+
+def test_a_jump_between_fixes_splits_the_event_halfway():
+    # Paris then Lyon; the untagged shots go with the fix nearer in time
+    times = [0, 100, 500, 600]
+    lat = [48.85, NAN, NAN, 45.76]
+    lon = [2.35, NAN, NAN, 4.84]
+    assert split_events(np.array(times, dtype=float), np.array(lat), np.array(lon)).tolist() == [0, 0, 1, 1]
+    assert nearest_geotagged(times, lat, lon, tolerance=3600).tolist() == [0, 0, 3, 3]
+
+def test_empty_and_untagged_inputs():
+    assert nearest_geotagged([], [], []).tolist() == []
+    assert nearest_geotagged([0, 10], [NAN, NAN], [NAN, NAN]).tolist() == [-1, -1]
\ No newline at end of file
@@ -0,0 +1,105 @@
+import struct
+from datetime import datetime
+import pytest
+from PIL import Image
+from exif_header import (TAG_EXIF_IFD, TAG_GPS_IFD, parse_iso6709, parse_mdta, parse_mvhd, parse_tiff,
+                         read_exif_header, read_video_header)
+
+TAG_MODEL = 0x0110
+TAG_DATETIME_ORIGINAL = 0x9003
+
+def make_exif():
+    exif = Image.Exif()
+    exif[TAG_MODEL] = 'Camera'
+    exif.get_ifd(TAG_EXIF_IFD)[TAG_DATETIME_ORIGINAL] = '2023:05:01 10:20:30'
+    gps = exif.get_ifd(TAG_GPS_IFD)
+    gps[1], gps[2], gps[3], gps[4] = 'N', (48.0, 51.0, 30.0), 'E', (2.0, 17.0, 0.0)
+    return exif
+
+@pytest.mark.parametrize('image_format', ['JPEG', 'PNG'])
+def test_image_headers(tmp_path, image_format):
+    path = tmp_path / f"photo.{image_format.lower()}"
+    Image.new('RGB', (40, 30)).save(path, image_format, exif=make_exif())
+
+    header = read_exif_header(str(path))
+    assert header['format'] == image_format
+    assert (header['width'], header['height']) == (40, 30)
+    exif = header['exif']
+    assert exif['0th'][TAG_MODEL] == b'Camera'
+    assert exif['Exif'][TAG_DATETIME_ORIGINAL] == b'2023:05:01 10:20:30'
+    assert exif['GPS'][1] == b'N'
+    assert exif['GPS'][2] == ((48, 1), (51, 1), (30, 1))
+
+def test_tiff_header(tmp_path):
+    # Pillow's TIFF writer keeps the main IFD only
+    path = tmp_path / 'scan.tif'
+    Image.new('RGB', (40, 30)).save(path, 'TIFF', exif=make_exif())
+
+    header = read_exif_header(str(path))
+    assert header['format'] == 'TIFF'
+    assert (header['width'], header['height']) == (40, 30)
+    assert header['exif']['0th'][TAG_MODEL] == b'Camera'
+
+def test_jpeg_without_exif(tmp_path):
+    path = tmp_path / 'plain.jpg'
+    Image.new('RGB', (16, 8)).save(path, 'JPEG')
+    header = read_exif_header(str(path))
+    assert header == {'format': 'JPEG', 'width': 16, 'height': 8, 'exif': None}
+
+def test_unknown_container(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_bytes(b'not an image at all')
+    assert read_exif_header(str(path)) is None
+
+def test_big_endian_tiff_with_one_entry():
+    # MM, 42, IFD at 8 holding ImageWidth = 640 as a SHORT
+    buf = b'MM\x00\x2a\x00\x00\x00\x08' + struct.pack('>HHHIHH', 1, 0x0100, 3, 1, 640, 0) + b'\x00' * 4
+    assert parse_tiff(buf, 0) == {'0th': {0x0100: 640}, 'Exif': {}, 'GPS': {}}
+
+def box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+def make_movie(moov_first=True):
+    seconds = int((datetime(2022, 7, 14, 9, 30) - datetime(1904, 1, 1)).total_seconds())
+    mvhd = box(b'mvhd', b'\x00\x00\x00\x00' + struct.pack('>II', seconds, seconds) + b'\x00' * 88)
+    tkhd = box(b'tkhd', b'\x00' * 76 + struct.pack('>II', 1920 << 16, 1080 << 16))
+    location = b'+48.8584+002.2945/'
+    udta = box(b'udta', box(b'\xa9xyz', struct.pack('>HH', len(location), 0) + location)
+               + box(b'\xa9mod', struct.pack('>HH', 5, 0) + b'Phone'))
+    moov = box(b'moov', mvhd + box(b'trak', tkhd) + udta)
+    ftyp = box(b'ftyp', b'isom\x00\x00\x02\x00isommp41')
+    mdat = box(b'mdat', b'\x00' * 1024)
+    return ftyp + (moov + mdat if moov_first else mdat + moov)
+
+@pytest.mark.parametrize('moov_first', [True, False])
+def test_video_header(tmp_path, moov_first):
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(make_movie(moov_first))
+
+    header = read_video_header(str(path))
+    assert header['format'] == 'MP4'
+    assert (header['width'], header['height']) == (1920, 1080)
+    assert header['datetime'] == datetime(2022, 7, 14, 9, 30)
+    assert header['gps'] == pytest.approx((48.8584, 2.2945))
+    assert header['model'] == 'Phone'
+
+def test_apple_metadata_keys():
+    keys = box(b'keys', b'\x00' * 8 + box(b'mdta', b'com.apple.quicktime.location.ISO6709')
+               + box(b'mdta', b'com.apple.quicktime.creationdate'))
+    ilst = box(b'ilst', box(struct.pack('>I', 1), box(b'data', b'\x00' * 8 + b'-33.8568+151.2153/'))
+               + box(struct.pack('>I', 2), box(b'data', b'\x00' * 8 + b'2021-12-31T23:59:58+1100')))
+    fields = parse_mdta(box(b'hdlr', b'\x00' * 25) + keys + ilst)
+    assert fields == {'location': '-33.8568+151.2153/', 'creationdate': '2021-12-31T23:59:58+1100'}
+
+@pytest.mark.parametrize('text, expected', [
+    ('+48.8584+002.2945+035.000/', (48.8584, 2.2945)),
+    ('-33.8568+151.2153/', (-33.8568, 151.2153)),
+    ('+91.0000+000.0000/', None),
+    ('nowhere', None),
+])
+def test_parse_iso6709(text, expected):
+    assert parse_iso6709(text) == expected
+
+def test_parse_mvhd_without_a_time():
+    assert parse_mvhd(b'\x00' * 12) is None
+    assert parse_mvhd(b'\x00' * 4) is None
\ No newline at end of file
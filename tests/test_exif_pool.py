@@ -0,0 +1,62 @@
+import threading
+import pytest
+from exif_pool import ExifToolPool
+
+class Session:
+    # Stands in for an exiftool process
+    def __init__(self):
+        self.running = True
+
+    def terminate(self):
+        self.running = False
+
+class Pool(ExifToolPool):
+    def _start_session(self):
+        return Session()
+
+def test_sessions_are_reused():
+    pool = Pool(size=2)
+    with pool.session() as first:
+        pass
+    with pool.session() as second:
+        assert second is first
+    with pool.session() as a, pool.session() as b:
+        assert a is not b
+    pool.shutdown()
+
+def test_shutdown_terminates_idle_sessions():
+    pool = Pool(size=2)
+    with pool.session() as a, pool.session() as b:
+        pass
+    pool.shutdown()
+    assert not a.running and not b.running
+    assert pool._idle.empty()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+def test_session_released_after_shutdown_is_not_reused():
+    pool = Pool(size=1)
+    et = pool.acquire()
+    pool.shutdown()
+    pool.release(et)
+    assert not et.running
+    assert pool._idle.empty()
+
+def test_waiting_acquire_fails_on_shutdown():
+    pool = Pool(size=1)
+    held = pool.acquire()
+    errors = []
+
+    def wait_for_session():
+        try:
+            pool.acquire()
+        except RuntimeError as e:
+            errors.append(e)
+
+    waiter = threading.Thread(target=wait_for_session)
+    waiter.start()
+    pool.shutdown()
+    pool.release(held)
+    waiter.join(timeout=5)
+    assert not waiter.is_alive()
+    assert len(errors) == 1
\ No newline at end of file
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import geocode_client
+from geocode_client import AsyncGeocoder
+
+PLACE = {'address': {'city': 'Paris', 'state': 'Ile-de-France', 'country_code': 'fr'}}
+
+class StubNominatim:
+    # Answers each request with the next (status, headers) from `replies`,
+    # then with 200 and PLACE; records when every request arrived
+    def __init__(self, replies=(), delay=0.0):
+        self.replies = list(replies)
+        self.delay = delay
+        self.requests = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests.append((time.monotonic(), self.path))
+                    status, headers = stub.replies.pop(0) if stub.replies else (200, {})
+                time.sleep(stub.delay)
+                body = json.dumps(PLACE).encode() if status == 200 else b''
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/reverse"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+def run_geocoder(stub, lookups, **options):
+    options.setdefault('rate', 1000)
+    options.setdefault('burst', 1000)
+    logs = []
+
+    async def run():
+        geocoder = AsyncGeocoder(base_url=stub.url, log=lambda message, level: logs.append(message), **options)
+        await geocoder.start()
+        try:
+            return await lookups(geocoder)
+        finally:
+            await geocoder.close()
+
+    return asyncio.run(run()), logs
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(geocode_client, 'BACKOFF_BASE', 0.05)
+
+def test_concurrent_lookups_share_one_request():
+    async def lookups(geocoder):
+        # All of these round to the same ~100 m key
+        return await asyncio.gather(*(geocoder.reverse_place(48.8566 + i * 1e-5, 2.3522) for i in range(10)))
+
+    with StubNominatim(delay=0.1) as stub:
+        places, _ = run_geocoder(stub, lookups)
+
+    assert len(stub.requests) == 1
+    assert {place.name for place in places} == {'Paris'}
+    assert places[0].country == 'FR'
+
+def test_results_are_cached():
+    async def lookups(geocoder):
+        first = await geocoder.reverse(48.8566, 2.3522)
+        second = await geocoder.reverse(48.8566, 2.3522)
+        return first, second, geocoder.requests_made
+
+    with StubNominatim() as stub:
+        (first, second, requests_made), _ = run_geocoder(stub, lookups)
+
+    assert first == second == 'Paris'
+    assert requests_made == len(stub.requests) == 1
+
+def test_retries_rate_limits_and_server_errors(fast_backoff):
+    async def lookups(geocoder):
+        return await geocoder.reverse(48.8566, 2.3522)
+
+    with StubNominatim([(429, {}), (503, {}), (500, {})]) as stub:
+        name, _ = run_geocoder(stub, lookups)
+
+    assert name == 'Paris'
+    assert len(stub.requests) == 4
+    # Backoff doubles: at least half of 0.05, 0.1 and 0.2 seconds with jitter
+    gaps = [later[0] - earlier[0] for earlier, later in zip(stub.requests, stub.requests[1:])]
+    assert gaps[0] >= 0.025
+    assert gaps[1] >= 0.05
+    assert gaps[2] >= 0.1
+
+def test_retry_after_is_honoured(fast_backoff):
+    async def lookups(geocoder):
+        return await geocoder.reverse(48.8566, 2.3522)
+
+    with StubNominatim([(429, {'Retry-After': '1'})]) as stub:
+        name, _ = run_geocoder(stub, lookups)
+
+    assert name == 'Paris'
+    assert stub.requests[1][0] - stub.requests[0][0] >= 0.9
+
+def test_failed_lookups_are_logged_and_not_cached(fast_backoff):
+    async def lookups(geocoder):
+        first = await geocoder.reverse(48.8566, 2.3522)
+        second = await geocoder.reverse(48.8566, 2.3522)
+        return first, second
+
+    with StubNominatim([(503, {})] * 3) as stub:
+        (first, second), logs = run_geocoder(stub, lookups, max_retries=2)
+
+    assert first == 'Unknown'
+    assert second == 'Paris'
+    assert len(stub.requests) == 4
+    assert any('Giving up' in message for message in logs)
+
+def test_client_errors_are_not_retried():
+    async def lookups(geocoder):
+        return await geocoder.reverse(48.8566, 2.3522)
+
+    with StubNominatim([(404, {})]) as stub:
+        name, logs = run_geocoder(stub, lookups)
+
+    assert name == 'Unknown'
+    assert len(stub.requests) == 1
+    assert any('status 404' in message for message in logs)
+
+def test_token_bucket_paces_requests():
+    rate = 20
+
+    async def lookups(geocoder):
+        return await asyncio.gather(*(geocoder.reverse(10 + i, 20) for i in range(6)))
+
+    with StubNominatim() as stub:
+        names, _ = run_geocoder(stub, lookups, rate=rate, burst=1, concurrency=6)
+
+    assert names == ['Paris'] * 6
+    times = sorted(arrival for arrival, _ in stub.requests)
+    # One token per 1/rate seconds, allowing for timer slack
+    assert times[-1] - times[0] >= 5 / rate * 0.9
+    assert min(b - a for a, b in zip(times, times[1:])) >= 1 / rate * 0.8
+
+def test_token_bucket_allows_a_burst():
+    async def acquire_all():
+        bucket = geocode_client.TokenBucket(rate=1, capacity=3)
+        start = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(acquire_all()) < 0.1
\ No newline at end of file
@@ -0,0 +1,74 @@
+import pytest
+from geocoder import NominatimGeocoder, OfflineGeocoder, build_gazetteer, load_geocoder
+
+CITIES = [
+    # name, lat, lon, country, admin1 code
+    ('Paris', 48.8566, 2.3522, 'FR', '11'),
+    ('Versailles', 48.8049, 2.1204, 'FR', '11'),
+    ('Lyon', 45.7640, 4.8357, 'FR', '84'),
+    ('Suva', -18.1416, 178.4419, 'FJ', 'C'),
+]
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    cities = tmp_path / 'cities.txt'
+    with open(cities, 'w', encoding='utf-8') as f:
+        for geonameid, (name, lat, lon, country, admin1) in enumerate(CITIES):
+            fields = [str(geonameid), name, name, '', str(lat), str(lon), 'P', 'PPL', country, '', admin1]
+            f.write('\t'.join(fields) + '\n')
+    admin1 = tmp_path / 'admin1.txt'
+    admin1.write_text('FR.11\tIle-de-France\nFR.84\tAuvergne-Rhone-Alpes\n', encoding='utf-8')
+
+    path = tmp_path / 'cities.bin'
+    assert build_gazetteer(str(cities), str(path), str(admin1)) == len(CITIES)
+    return path
+
+def test_nearest_place(gazetteer):
+    with OfflineGeocoder(str(gazetteer)) as geocoder:
+        place = geocoder.nearest(48.86, 2.34)
+        assert (place.name, place.admin1, place.country) == ('Paris', 'Ile-de-France', 'FR')
+        assert place.distance_km < 2
+        assert geocoder.nearest(48.80, 2.13).name == 'Versailles'
+        # Two cells away from Paris, one from Lyon
+        assert geocoder.get_location(46.5, 4.5) == 'Lyon'
+
+def test_nearest_across_the_antimeridian(gazetteer):
+    with OfflineGeocoder(str(gazetteer)) as geocoder:
+        place = geocoder.nearest(-18.0, -179.5)
+        assert (place.name, place.admin1) == ('Suva', 'C')
+
+def test_nothing_within_the_search_rings(gazetteer):
+    with OfflineGeocoder(str(gazetteer)) as geocoder:
+        assert geocoder.nearest(-40.0, -120.0) is None
+        assert geocoder.get_location(-40.0, -120.0) == 'Unknown'
+        assert geocoder.submit(48.86, 2.34).result() == 'Paris'
+
+@pytest.mark.parametrize('size', [0, 4, 11, 12, 1000])
+def test_truncated_gazetteer_is_rejected(gazetteer, size):
+    with open(gazetteer, 'r+b') as f:
+        f.truncate(size)
+    with pytest.raises(ValueError):
+        OfflineGeocoder(str(gazetteer))
+
+def test_corrupt_gazetteer_falls_back_to_nominatim(gazetteer):
+    data = gazetteer.read_bytes()
+    gazetteer.write_bytes(b'JUNK' + data[4:])
+    geocoder = load_geocoder(str(gazetteer))
+    try:
+        assert isinstance(geocoder, NominatimGeocoder)
+    finally:
+        geocoder.close()
+
+    gazetteer.write_bytes(data[:8])
+    geocoder = load_geocoder(str(gazetteer))
+    try:
+        assert isinstance(geocoder, NominatimGeocoder)
+    finally:
+        geocoder.close()
+
+def test_load_geocoder_uses_the_gazetteer(gazetteer):
+    geocoder = load_geocoder(str(gazetteer))
+    try:
+        assert isinstance(geocoder, OfflineGeocoder)
+    finally:
+        geocoder.close()
\ No newline at end of file
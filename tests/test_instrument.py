@@ -0,0 +1,42 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from instrument import Recorder, current_recorder, stage, use_recorder
+
+def record(name):
+    with stage(name):
+        pass
+
+def run_job(name, recorder, started, results):
+    recorder.start()
+    try:
+        # Both jobs are running before either records anything
+        started.wait()
+        record(name)
+        with ThreadPoolExecutor(max_workers=2, initializer=use_recorder, initargs=(current_recorder(),)) as pool:
+            list(pool.map(record, [f"{name} pool"] * 4))
+    finally:
+        recorder.stop()
+    results[name] = recorder.merged()[0]
+
+def test_concurrent_jobs_keep_their_own_stages():
+    started = threading.Barrier(2)
+    results = {}
+    threads = [threading.Thread(target=run_job, args=(name, Recorder(), started, results))
+               for name in ('first', 'second')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(results['first']) == {'first', 'first pool'}
+    assert set(results['second']) == {'second', 'second pool'}
+    assert results['first']['first pool'].count == 4
+
+def test_nothing_is_recorded_outside_a_job():
+    recorder = Recorder()
+    record('before')
+    recorder.start()
+    recorder.stop()
+    record('after')
+    assert current_recorder() is None
+    assert recorder.merged() == ({}, {})
\ No newline at end of file
@@ -0,0 +1,147 @@
+import json
+import os
+import pytest
+from journal import (STATUS_COMPLETE, STATUS_UNDONE, MoveJournal, find_journals, find_resumable, find_undoable,
+                     prune_journals, read_header)
+from planner import MovePlan, execute_plan
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / 'photos'
+    root.mkdir()
+    for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+        (root / name).write_bytes(name.encode())
+    return str(root)
+
+@pytest.fixture
+def journals(tmp_path):
+    return str(tmp_path / 'journals')
+
+def make_plan(folder, mode='time'):
+    plan = MovePlan(folder, mode)
+    for name in sorted(os.listdir(folder)):
+        if os.path.isfile(os.path.join(folder, name)):
+            plan.add_to_folder(os.path.join(folder, name), 'May, 23', 'test')
+    return plan
+
+def run(plan, journal, stop_after=None):
+    # Carries out the plan, or only its first stop_after moves as if interrupted
+    if stop_after is not None:
+        plan.moves = plan.moves[:stop_after]
+    for move in plan:
+        os.makedirs(os.path.dirname(move.destination), exist_ok=True)
+    moved = execute_plan(plan, journal.record_move)
+    if stop_after is None:
+        journal.set_status(STATUS_COMPLETE)
+    journal.close()
+    return moved
+
+def test_header_is_read_without_the_plan(folder, journals):
+    journal = MoveJournal.create(make_plan(folder), {'keys': ('year', 'month')}, journals)
+    journal.close()
+
+    header = read_header(journal.path)
+    assert (header.root, header.mode, header.status) == (folder, 'time', None)
+    assert header.options == {'keys': ['year', 'month']}
+    with open(journal.path, encoding='utf-8') as f:
+        assert 'moves' not in json.loads(f.readline())
+
+def test_interrupted_run_resumes_with_the_same_options(folder, journals):
+    plan = make_plan(folder)
+    run(plan, MoveJournal.create(plan, {'recursive': False}, journals), stop_after=1)
+
+    assert find_resumable(folder, 'time', {'recursive': True}, journals) is None
+    assert find_resumable(folder, 'location', {'recursive': False}, journals) is None
+    state = find_resumable(folder, 'time', {'recursive': False}, journals)
+    remaining = state.remaining_plan()
+    assert [os.path.basename(move.source) for move in remaining] == ['b.jpg', 'c.jpg']
+
+    run(remaining, MoveJournal.resume(state))
+    assert find_resumable(folder, 'time', {'recursive': False}, journals) is None
+    assert sorted(os.listdir(os.path.join(folder, 'May, 23'))) == ['a.jpg', 'b.jpg', 'c.jpg']
+
+def test_moves_lost_from_the_journal_are_recovered(folder, journals):
+    plan = make_plan(folder)
+    journal = MoveJournal.create(plan, None, journals)
+    journal.close()
+    # Moved on disk, but the crash came before its line was written
+    first = plan.moves[0]
+    os.makedirs(os.path.dirname(first.destination))
+    os.rename(first.source, first.destination)
+
+    state = find_resumable(folder, 'time', None, journals)
+    assert len(state.remaining_plan()) == 2
+    assert [move.source for move in state.recovered] == [first.source]
+
+def test_undo_moves_the_files_back(folder, journals):
+    run(make_plan(folder), MoveJournal.create(make_plan(folder), None, journals))
+
+    state = find_undoable(folder, journals)
+    undo = state.undo_plan()
+    assert len(undo) == 3
+    journal = MoveJournal(state.path)
+    assert execute_plan(undo, journal.record_undo) == 3
+    journal.set_status(STATUS_UNDONE)
+    journal.close()
+
+    assert sorted(os.listdir(folder)) == ['May, 23', 'a.jpg', 'b.jpg', 'c.jpg']
+    assert find_undoable(folder, journals) is None
+
+def test_partly_undone_run_is_not_resumed(folder, journals):
+    run(make_plan(folder), MoveJournal.create(make_plan(folder), None, journals))
+    state = find_undoable(folder, journals)
+    undo = state.undo_plan()
+    undo.moves = undo.moves[:1]
+    journal = MoveJournal(state.path)
+    execute_plan(undo, journal.record_undo)
+    journal.close()
+
+    assert find_resumable(folder, 'time', None, journals) is None
+    assert len(find_undoable(folder, journals).undo_plan()) == 2
+
+def test_journals_from_before_headers_can_be_undone(folder, journals):
+    os.makedirs(journals)
+    path = os.path.join(journals, '20200101-000000-000000.jsonl')
+    source = os.path.join(folder, 'a.jpg')
+    destination = os.path.join(folder, 'a', 'a.jpg')
+    os.makedirs(os.path.dirname(destination))
+    os.rename(source, destination)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'type': 'plan', 'run_id': '20200101-000000-000000', 'root': folder, 'mode': 'time',
+                            'created': '2020-01-01T00:00:00', 'moves': [[source, destination, '']]}) + '\n')
+        f.write(json.dumps({'type': 'move', 's': source, 'd': destination}) + '\n')
+
+    assert find_resumable(folder, 'time', None, journals) is None
+    assert [move.destination for move in find_undoable(folder, journals).undo_plan()] == [source]
+
+def test_prune_keeps_recent_and_resumable_journals(folder, journals):
+    def journal(mode, status):
+        created = MoveJournal.create(MovePlan(folder, mode), None, journals)
+        if status:
+            created.set_status(status)
+        created.close()
+        return created.path
+
+    oldest = journal('time', STATUS_COMPLETE)
+    undone = journal('time', STATUS_UNDONE)
+    replaced = journal('time', None)
+    kept = [journal('time', STATUS_COMPLETE), journal('time', STATUS_COMPLETE)]
+    resumable = journal('location', None)
+
+    assert prune_journals(journals, keep=2) == 3
+    remaining = {header.path for header in find_journals(folder, journals)}
+    assert remaining == set(kept) | {resumable}
+    assert not {oldest, undone, replaced} & remaining
+def test_extended_journal_resumes_and_undoes_every_batch(folder, journals):
+    plan = make_plan(folder)
+    plan.moves = plan.moves[:1]
+    run(plan, MoveJournal.create(plan, None, journals))
+
+    batch = make_plan(folder)
+    journal = MoveJournal(find_journals(folder, journals)[0].path)
+    journal.extend(batch)
+    run(batch, journal, stop_after=1)
+
+    state = find_resumable(folder, 'time', None, journals)
+    assert [os.path.basename(move.source) for move in state.remaining_plan()] == ['c.jpg']
+    assert len(state.undo_plan()) == 2
\ No newline at end of file
@@ -0,0 +1,37 @@
+from datetime import datetime
+from PIL import Image
+import metadata
+from metadata import MediaMetadata, read_image_header, read_image_metadata
+
+TAG_DATETIME = 0x0132
+
+def save_image(path, image_format, taken=None):
+    exif = Image.Exif()
+    if taken:
+        exif[TAG_DATETIME] = taken
+    Image.new('RGB', (32, 24)).save(path, image_format, exif=exif)
+    return str(path)
+
+def test_header_path_reads_exif(tmp_path):
+    record = MediaMetadata(save_image(tmp_path / 'a.jpg', 'JPEG', '2023:05:01 10:20:30'))
+    assert read_image_header(record)
+    assert record.datetime == datetime(2023, 5, 1, 10, 20, 30)
+    assert (record.format, record.width, record.height) == ('JPEG', 32, 24)
+
+def test_jpeg_without_exif_in_the_header_falls_back_to_pillow(tmp_path, monkeypatch):
+    path = save_image(tmp_path / 'a.jpg', 'JPEG', '2023:05:01 10:20:30')
+    # As if the EXIF segment were past what the header walk scans
+    monkeypatch.setattr(metadata, 'read_exif_header',
+                        lambda path: {'format': 'JPEG', 'width': 32, 'height': 24, 'exif': None})
+
+    record = MediaMetadata(path)
+    assert not read_image_header(record)
+    read_image_metadata(record)
+    assert record.datetime == datetime(2023, 5, 1, 10, 20, 30)
+    assert (record.format, record.width, record.height) == ('JPEG', 32, 24)
+
+def test_png_without_exif_stays_on_the_header_path(tmp_path):
+    record = MediaMetadata(save_image(tmp_path / 'a.png', 'PNG'))
+    assert read_image_header(record)
+    assert record.datetime is None
+    assert (record.format, record.width, record.height) == ('PNG', 32, 24)
\ No newline at end of file
@@ -0,0 +1,95 @@
+import os
+from datetime import datetime
+import pytest
+from PIL import Image
+import parallel
+from metadata_cache import MetadataCache, extract_metadata_cached
+
+TAG_DATETIME = 0x0132
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MetadataCache(str(tmp_path / 'cache.sqlite3'))
+    yield cache
+    cache.close()
+
+@pytest.fixture
+def extracted(monkeypatch):
+    # Records which files were actually read
+    paths = []
+    extract = parallel.extract_metadata_parallel
+
+    def recording(file_paths, *args, **kwargs):
+        paths.extend(os.path.basename(path) for path in file_paths)
+        return extract(file_paths, *args, **kwargs)
+
+    monkeypatch.setattr(parallel, 'extract_metadata_parallel', recording)
+    return paths
+
+def save_image(path, taken='2023:05:01 10:20:30', size=(32, 24)):
+    exif = Image.Exif()
+    exif[TAG_DATETIME] = taken
+    Image.new('RGB', size).save(path, 'JPEG', exif=exif)
+    return str(path)
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_hits_skip_extraction(tmp_path, cache, extracted):
+    path = save_image(tmp_path / 'a.jpg')
+    first = extract_metadata_cached([path], cache)
+    second = extract_metadata_cached([path], cache)
+
+    assert extracted == ['a.jpg']
+    assert second[path].datetime == first[path].datetime == datetime(2023, 5, 1, 10, 20, 30)
+    assert (second[path].width, second[path].height) == (32, 24)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_changed_size_is_extracted_again(tmp_path, cache, extracted):
+    path = save_image(tmp_path / 'a.jpg')
+    extract_metadata_cached([path], cache)
+    save_image(path, '2024:01:02 03:04:05', size=(64, 48))
+
+    records = extract_metadata_cached([path], cache)
+    assert extracted == ['a.jpg', 'a.jpg']
+    assert records[path].datetime == datetime(2024, 1, 2, 3, 4, 5)
+
+def test_changed_content_is_extracted_again(tmp_path, cache, extracted):
+    path = save_image(tmp_path / 'a.jpg')
+    size = os.path.getsize(path)
+    extract_metadata_cached([path], cache)
+    save_image(path, '2024:01:02 03:04:05')
+    assert os.path.getsize(path) == size
+    bump_mtime(path)
+
+    records = extract_metadata_cached([path], cache)
+    assert extracted == ['a.jpg', 'a.jpg']
+    assert records[path].datetime == datetime(2024, 1, 2, 3, 4, 5)
+
+def test_touched_file_is_found_by_fingerprint(tmp_path, cache, extracted):
+    path = save_image(tmp_path / 'a.jpg')
+    extract_metadata_cached([path], cache)
+    bump_mtime(path)
+
+    assert extract_metadata_cached([path], cache)[path].datetime == datetime(2023, 5, 1, 10, 20, 30)
+    assert extract_metadata_cached([path], cache)[path].datetime == datetime(2023, 5, 1, 10, 20, 30)
+    assert extracted == ['a.jpg']
+
+def test_moved_files_keep_their_entry(tmp_path, cache, extracted):
+    old = save_image(tmp_path / 'a.jpg')
+    extract_metadata_cached([old], cache)
+
+    # Moved by hand: found by fingerprint and the old entry is dropped
+    renamed = str(tmp_path / 'b.jpg')
+    os.rename(old, renamed)
+    assert renamed in extract_metadata_cached([renamed], cache)
+    assert cache.conn.execute("SELECT path FROM metadata").fetchall() == [(renamed,)]
+
+    # Moved by a sort: the entry follows the file
+    sorted_path = str(tmp_path / 'May, 23' / 'b.jpg')
+    os.makedirs(os.path.dirname(sorted_path))
+    os.rename(renamed, sorted_path)
+    cache.record_move(renamed, sorted_path)
+    assert sorted_path in extract_metadata_cached([sorted_path], cache)
+    assert extracted == ['a.jpg']
\ No newline at end of file
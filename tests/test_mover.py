@@ -0,0 +1,116 @@
+import errno
+import os
+import pytest
+import mover
+from mover import TEMP_SUFFIX, VerifyError, move_file, prune_empty_dirs, rename_no_replace
+
+@pytest.fixture
+def files(tmp_path):
+    source = tmp_path / 'inbox' / 'a.jpg'
+    destination = tmp_path / 'sorted' / 'a.jpg'
+    source.parent.mkdir()
+    destination.parent.mkdir()
+    source.write_bytes(b'new photo' * 1000)
+    return source, destination
+
+def leftovers(directory):
+    return [name for name in os.listdir(directory) if name.endswith(TEMP_SUFFIX)]
+
+def test_rename_refuses_an_existing_destination(files):
+    source, destination = files
+    destination.write_bytes(b'old photo')
+    with pytest.raises(FileExistsError):
+        rename_no_replace(str(source), str(destination))
+    assert destination.read_bytes() == b'old photo'
+    assert source.exists()
+
+def test_rename_finishes_a_move_that_stopped_after_linking(files):
+    source, destination = files
+    os.link(source, destination)
+    rename_no_replace(str(source), str(destination))
+    assert not source.exists()
+    assert destination.read_bytes() == b'new photo' * 1000
+
+def test_rename_without_hard_links(files, monkeypatch):
+    source, destination = files
+
+    def link(*args, **kwargs):
+        raise OSError(errno.EPERM, "Operation not permitted")
+
+    monkeypatch.setattr(os, 'link', link)
+    rename_no_replace(str(source), str(destination))
+    assert not source.exists()
+    assert destination.exists()
+
+    destination.rename(source)
+    (destination.parent / 'b.jpg').write_bytes(b'old photo')
+    with pytest.raises(FileExistsError):
+        rename_no_replace(str(source), str(destination.parent / 'b.jpg'))
+
+def test_link_errors_other_than_unsupported_are_raised(files, monkeypatch):
+    source, destination = files
+
+    def link(*args, **kwargs):
+        raise OSError(errno.EIO, "Input/output error")
+
+    monkeypatch.setattr(os, 'link', link)
+    with pytest.raises(OSError) as raised:
+        rename_no_replace(str(source), str(destination))
+    assert raised.value.errno == errno.EIO
+    assert source.exists()
+    assert not destination.exists()
+
+def test_move_across_filesystems(files):
+    source, destination = files
+    move_file(str(source), str(destination), same_device=False, verify=True)
+    assert not source.exists()
+    assert destination.read_bytes() == b'new photo' * 1000
+    assert leftovers(destination.parent) == []
+
+def test_move_across_refuses_an_existing_destination(files):
+    source, destination = files
+    destination.write_bytes(b'old photo')
+    with pytest.raises(FileExistsError):
+        move_file(str(source), str(destination), same_device=False)
+    assert destination.read_bytes() == b'old photo'
+    assert source.exists()
+    assert leftovers(destination.parent) == []
+
+def test_failed_verify_keeps_the_source(files, monkeypatch):
+    source, destination = files
+    monkeypatch.setattr(mover, 'file_checksum', lambda path: path)
+    with pytest.raises(VerifyError):
+        move_file(str(source), str(destination), same_device=False, verify=True)
+    assert source.exists()
+    assert os.listdir(destination.parent) == []
+
+def test_copy_falls_back_after_a_partial_zero_copy(files, monkeypatch):
+    source, destination = files
+
+    def partial(source_fd, destination_fd, size):
+        os.write(destination_fd, b'torn')
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(mover, 'copy_range', partial)
+    monkeypatch.setattr(mover, 'send_range', partial)
+    move_file(str(source), str(destination), same_device=False)
+    assert destination.read_bytes() == b'new photo' * 1000
+
+def test_prune_removes_only_emptied_folders(tmp_path):
+    root = tmp_path / 'photos'
+    (root / 'a' / 'b').mkdir(parents=True)
+    (root / 'c').mkdir()
+    (root / 'c' / 'keep.jpg').write_bytes(b'photo')
+    outside = tmp_path / 'elsewhere'
+    outside.mkdir()
+
+    removed = prune_empty_dirs([str(root / 'a' / 'b'), str(root / 'c'), str(root), str(outside)], str(root))
+    assert sorted(removed) == [str(root / 'a'), str(root / 'a' / 'b')]
+    assert os.listdir(root) == ['c']
+    assert outside.exists()
+
+def test_prune_never_removes_the_root(tmp_path):
+    root = tmp_path / 'photos'
+    (root / 'a').mkdir(parents=True)
+    assert prune_empty_dirs([str(root / 'a')], str(root)) == [str(root / 'a')]
+    assert root.exists()
\ No newline at end of file
@@ -0,0 +1,48 @@
+import os
+import pytest
+from planner import MovePlan, execute_plan
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / 'photos'
+    (root / 'May, 23').mkdir(parents=True)
+    (root / 'a.jpg').write_bytes(b'new a')
+    (root / 'May, 23' / 'a.jpg').write_bytes(b'old a')
+    return root
+
+def test_existing_destination_gets_a_free_name(folder):
+    plan = MovePlan(str(folder), 'time')
+    move = plan.add_to_folder(str(folder / 'a.jpg'), 'May, 23')
+    assert move.destination == str(folder / 'May, 23' / 'a 2.jpg')
+
+    assert execute_plan(plan) == 1
+    assert (folder / 'May, 23' / 'a.jpg').read_bytes() == b'old a'
+    assert (folder / 'May, 23' / 'a 2.jpg').read_bytes() == b'new a'
+
+def test_colliding_plan_entries_get_free_names(tmp_path):
+    root = tmp_path / 'photos'
+    for trip in ('paris', 'lyon'):
+        (root / trip).mkdir(parents=True)
+        (root / trip / 'a.jpg').write_bytes(trip.encode())
+
+    plan = MovePlan(str(root), 'flatten')
+    for trip in ('paris', 'lyon'):
+        source = str(root / trip / 'a.jpg')
+        plan.add(source, plan.free_destination(source, str(root / 'a.jpg')))
+    assert [os.path.basename(move.destination) for move in plan] == ['a.jpg', 'a 2.jpg']
+
+    assert execute_plan(plan) == 2
+    assert (root / 'a.jpg').read_bytes() == b'paris'
+    assert (root / 'a 2.jpg').read_bytes() == b'lyon'
+
+def test_a_destination_created_after_planning_is_not_replaced(folder):
+    plan = MovePlan(str(folder), 'time')
+    plan.add_to_folder(str(folder / 'a.jpg'), 'June, 23')
+    (folder / 'June, 23').mkdir()
+    (folder / 'June, 23' / 'a.jpg').write_bytes(b'arrived meanwhile')
+    errors = []
+
+    assert execute_plan(plan, on_error=lambda move, e: errors.append(e)) == 0
+    assert [type(e) for e in errors] == [FileExistsError]
+    assert (folder / 'June, 23' / 'a.jpg').read_bytes() == b'arrived meanwhile'
+    assert (folder / 'a.jpg').read_bytes() == b'new a'
\ No newline at end of file
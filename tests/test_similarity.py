@@ -0,0 +1,36 @@
+import numpy as np
+from similarity import group_folder_name, group_similar
+
+def hashes(*values):
+    return np.array(values, dtype=np.uint64)
+
+def test_close_hashes_are_grouped():
+    paths = ['a.jpg', 'b.jpg', 'c.jpg']
+    groups = group_similar(paths, hashes(0, 0b111, 0xFFFF_FFFF_0000_0000), threshold=6)
+    assert groups == [['a.jpg', 'b.jpg']]
+
+def test_threshold_is_inclusive():
+    paths = ['a.jpg', 'b.jpg']
+    assert group_similar(paths, hashes(0, 0b111111), threshold=6) == [['a.jpg', 'b.jpg']]
+    assert group_similar(paths, hashes(0, 0b1111111), threshold=6) == []
+
+def test_groups_are_transitive():
+    # a-b and b-c are 4 bits apart, a-c is 8
+    paths = ['c.jpg', 'a.jpg', 'b.jpg', 'd.jpg']
+    groups = group_similar(paths, hashes(0xFF, 0x00, 0x0F, 0xFFFF_0000_0000_0000), threshold=4)
+    assert groups == [['a.jpg', 'b.jpg', 'c.jpg']]
+
+def test_differences_anywhere_in_the_hash_are_found():
+    # The bands must cover every bit, high ones included
+    paths = ['a.jpg', 'b.jpg']
+    assert group_similar(paths, hashes(0, 0x8000_0000_0000_0001), threshold=2) == [['a.jpg', 'b.jpg']]
+
+def test_groups_are_ordered_by_first_path():
+    paths = ['z.jpg', 'y.jpg', 'b.jpg', 'a.jpg']
+    groups = group_similar(paths, hashes(0, 1, 0xFFFF_FFFF_FFFF_FFFF, 0xFFFF_FFFF_FFFF_FFFE), threshold=1)
+    assert groups == [['a.jpg', 'b.jpg'], ['y.jpg', 'z.jpg']]
+    assert group_folder_name(groups[0]) == 'Similar - a'
+
+def test_identical_hashes_with_threshold_zero():
+    paths = ['a.jpg', 'b.jpg', 'c.jpg']
+    assert group_similar(paths, hashes(5, 5, 6), threshold=0) == [['a.jpg', 'b.jpg']]
\ No newline at end of file
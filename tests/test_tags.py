@@ -0,0 +1,115 @@
+import io
+import os
+import struct
+import pytest
+from PIL import Image
+from metadata_cache import MetadataCache
+from tags import PHOTOSHOP_SIGNATURE, XMP_SIGNATURE, TagIndex, match_sidecars, read_tags, tag_matches
+
+def xmp(*tags):
+    items = ''.join(f'<rdf:li>{tag}</rdf:li>' for tag in tags)
+    return ('<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+            '<rdf:Description xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:subject><rdf:Bag>{items}</rdf:Bag></dc:subject>'
+            '</rdf:Description></rdf:RDF></x:xmpmeta>').encode()
+
+def iptc(*tags):
+    records = b''.join(b'\x1c\x02\x19' + struct.pack('>H', len(tag.encode())) + tag.encode() for tag in tags)
+    return PHOTOSHOP_SIGNATURE + b'8BIM\x04\x04\x00\x00' + struct.pack('>I', len(records)) + records
+
+def jpeg(xmp_tags=(), iptc_tags=()):
+    out = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(out, 'JPEG')
+    data = out.getvalue()
+    segments = b''
+    if xmp_tags:
+        segments += b'\xff\xe1' + struct.pack('>H', len(XMP_SIGNATURE + xmp(*xmp_tags)) + 2) \
+            + XMP_SIGNATURE + xmp(*xmp_tags)
+    if iptc_tags:
+        segments += b'\xff\xed' + struct.pack('>H', len(iptc(*iptc_tags)) + 2) + iptc(*iptc_tags)
+    return data[:2] + segments + data[2:]
+
+def test_jpeg_keywords_from_xmp_and_iptc(tmp_path):
+    path = tmp_path / 'a.jpg'
+    path.write_bytes(jpeg(['Family', 'Places|France'], ['family', 'Beach']))
+    assert read_tags(str(path)) == ['Family', 'Places|France', 'Beach']
+
+def test_sidecar_keywords(tmp_path):
+    path = tmp_path / 'IMG_0001.jpg'
+    path.write_bytes(jpeg(['Family']))
+    sidecar = tmp_path / 'IMG_0001.xmp'
+    sidecar.write_bytes(xmp('Holiday'))
+    sidecars = match_sidecars([str(path), str(sidecar)], [str(path)])
+    assert sidecars == {str(path): str(sidecar)}
+    assert read_tags(str(path), sidecars[str(path)]) == ['Family', 'Holiday']
+
+def test_hierarchical_keywords_match_their_ancestors():
+    assert tag_matches('People|Family|Anna', 'people')
+    assert tag_matches('People|Family|Anna', 'People|Family')
+    assert not tag_matches('Peoples', 'People')
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MetadataCache(str(tmp_path / 'cache.sqlite3'))
+    yield cache
+    cache.close()
+
+@pytest.fixture
+def index(cache):
+    return TagIndex(cache)
+
+def test_unchanged_files_are_not_read_again(tmp_path, index):
+    paths = []
+    for name, tags in (('a.jpg', ['Family']), ('b.jpg', ['Beach'])):
+        (tmp_path / name).write_bytes(jpeg(tags))
+        paths.append(str(tmp_path / name))
+
+    assert index.update(paths) == 2
+    assert index.tags_for(paths) == {paths[0]: ['Family'], paths[1]: ['Beach']}
+    assert index.update(paths) == 0
+    assert (index.read, index.indexed) == (2, 2)
+
+def test_changed_files_are_read_again(tmp_path, index):
+    path = tmp_path / 'a.jpg'
+    path.write_bytes(jpeg(['Family']))
+    index.update([str(path)])
+
+    # Same size, new mtime
+    path.write_bytes(jpeg(['Beachy']))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert index.update([str(path)]) == 1
+    assert index.tags_for([str(path)]) == {str(path): ['Beachy']}
+
+    # Different size
+    path.write_bytes(jpeg(['Beach', 'Sunset']))
+    assert index.update([str(path)]) == 1
+    assert index.tags_for([str(path)]) == {str(path): ['Beach', 'Sunset']}
+
+def test_changed_sidecar_is_read_again(tmp_path, index):
+    path = tmp_path / 'a.jpg'
+    path.write_bytes(jpeg())
+    sidecar = tmp_path / 'a.xmp'
+    sidecar.write_bytes(xmp('Family'))
+    sidecars = {str(path): str(sidecar)}
+    index.update([str(path)], sidecars)
+    assert index.update([str(path)], sidecars) == 0
+
+    sidecar.write_bytes(xmp('Holiday'))
+    stat = sidecar.stat()
+    os.utime(sidecar, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert index.update([str(path)], sidecars) == 1
+    assert index.tags_for([str(path)]) == {str(path): ['Holiday']}
+
+def test_index_follows_moved_files(tmp_path, cache, index):
+    old = tmp_path / 'a.jpg'
+    old.write_bytes(jpeg(['Family']))
+    index.update([str(old)])
+
+    new = tmp_path / 'Family' / 'a.jpg'
+    new.parent.mkdir()
+    os.rename(old, new)
+    cache.record_move(str(old), str(new))
+
+    assert index.update([str(new)]) == 0
+    assert index.tags_for([str(new)]) == {str(new): ['Family']}
\ No newline at end of file
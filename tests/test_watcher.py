@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+import pytest
+from engine import create_job
+from watcher import FolderWatcher, PollingWatcher
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+
+@pytest.fixture
+def inbox(tmp_path):
+    folder = tmp_path / 'inbox'
+    folder.mkdir()
+    return folder
+
+def test_files_are_reported_once_settled(inbox):
+    (inbox / 'a.jpg').write_bytes(b'a')
+    watcher = FolderWatcher(str(inbox), settle=2.0)
+    watcher.touch('a.jpg', now=100.0)
+    assert watcher.next_deadline() == 102.0
+    assert watcher.settled(now=101.0) == []
+    assert watcher.settled(now=102.0) == [str(inbox / 'a.jpg')]
+    assert watcher.pending == {}
+
+def test_files_still_growing_wait_another_round(inbox):
+    path = inbox / 'a.mov'
+    path.write_bytes(b'part')
+    watcher = FolderWatcher(str(inbox), settle=2.0)
+    watcher.touch('a.mov', now=100.0)
+    path.write_bytes(b'partial copy')
+    assert watcher.settled(now=102.0) == []
+    assert watcher.next_deadline() == 104.0
+    assert watcher.settled(now=104.0) == [str(path)]
+
+def test_files_gone_before_settling_are_dropped(inbox):
+    (inbox / 'a.jpg').write_bytes(b'a')
+    watcher = FolderWatcher(str(inbox), settle=0)
+    watcher.touch('a.jpg', now=100.0)
+    os.remove(inbox / 'a.jpg')
+    assert watcher.settled(now=100.0) == []
+    assert watcher.pending == {}
+
+def test_polling_batches_arrivals(inbox):
+    (inbox / 'old.jpg').write_bytes(b'old')
+    with PollingWatcher(str(inbox), settle=0) as watcher:
+        assert watcher.poll(0) == []
+        for name in ('b.jpg', 'a.jpg', '.hidden.jpg'):
+            (inbox / name).write_bytes(name.encode())
+        (inbox / 'folder').mkdir()
+        assert watcher.poll(0) == [str(inbox / 'a.jpg'), str(inbox / 'b.jpg')]
+        assert watcher.poll(0) == []
+
+def test_polling_sees_a_name_again_after_it_left(inbox):
+    with PollingWatcher(str(inbox), settle=0) as watcher:
+        (inbox / 'a.jpg').write_bytes(b'a')
+        assert watcher.poll(0) == [str(inbox / 'a.jpg')]
+        os.remove(inbox / 'a.jpg')
+        assert watcher.poll(0) == []
+        (inbox / 'a.jpg').write_bytes(b'again')
+        assert watcher.poll(0) == [str(inbox / 'a.jpg')]
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+def test_undo_takes_back_a_whole_watch_session(inbox):
+    (inbox / 'first.jpg').write_bytes(b'first')
+    job = create_job('time', str(inbox), watch=True, settle=0.1, polling=True)
+    thread = threading.Thread(target=job.run)
+    thread.start()
+    try:
+        wait_for(lambda: job.moved == 1)
+        for batch, name in enumerate(('second.jpg', 'third.jpg'), 2):
+            (inbox / name).write_bytes(name.encode())
+            wait_for(lambda: job.moved == batch)
+    finally:
+        job.stop()
+        thread.join()
+    assert sorted(os.listdir(inbox)) != ['first.jpg', 'second.jpg', 'third.jpg']
+
+    assert create_job('undo', str(inbox)).run() == 3
+    assert sorted(os.listdir(inbox)) == ['first.jpg', 'second.jpg', 'third.jpg']
\ No newline at end of file
@@ -0,0 +1,178 @@
+import hashlib
+import io
+import os
+import threading
+from metadata_cache import default_cache_dir
+
+# Thumbnails for the file inspector. Each one is made from the cheapest source
+# that is big enough: the thumbnail embedded in the EXIF or HEIF data, or a
+# JPEG decoded at reduced scale with draft(). Results are kept as small JPEGs
+# in an on-disk cache that evicts the least recently used files once it grows
+# past its size limit.
+
+THUMBNAIL_SIZE = 128
+THUMBNAIL_QUALITY = 80
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Eviction trims the cache to this share of the limit, so it does not run on every store
+CACHE_LOW_WATER = 0.9
+
+ORIENTATION_TAG = 0x0112
+ORIENTATION_TRANSPOSE = {2: 'FLIP_LEFT_RIGHT', 3: 'ROTATE_180', 4: 'FLIP_TOP_BOTTOM', 5: 'TRANSPOSE',
+                         6: 'ROTATE_270', 7: 'TRANSVERSE', 8: 'ROTATE_90'}
+
+def thumbnail_cache_dir():
+    return os.path.join(default_cache_dir(), 'thumbnails')
+
+def exif_thumbnail(img, size):
+    # The embedded JPEG thumbnail is usually 160x120: use it only when that is enough
+    import piexif
+    from PIL import Image
+
+    raw_exif = img.info.get('exif')
+    if not raw_exif:
+        return None
+    try:
+        data = piexif.load(raw_exif).get('thumbnail')
+    except Exception:
+        return None
+    if not data:
+        return None
+    thumb = Image.open(io.BytesIO(data))
+    if max(thumb.size) < size:
+        return None
+    thumb.load()
+    return thumb
+
+def heif_thumbnail(file_path, size):
+    import pillow_heif
+
+    heif = pillow_heif.open_heif(file_path, convert_hdr_to_8bit=True)
+    primary = heif[heif.primary_index]
+    thumbnails = primary.info.get('thumbnails') or []
+    for index, box in enumerate(thumbnails):
+        if box and box >= size:
+            return primary.get_thumbnail(index).to_pillow()
+    return None
+
+def make_thumbnail(file_path, size=THUMBNAIL_SIZE):
+    """JPEG bytes of an image scaled to fit size x size, or None for non-images."""
+    from PIL import Image
+    from constants import IMAGE_FORMATS
+    from metadata import register_heif_opener
+
+    file_extension = os.path.splitext(file_path)[1].lower()
+    if file_extension not in IMAGE_FORMATS:
+        return None
+
+    register_heif_opener()
+    thumb = heif_thumbnail(file_path, size) if file_extension == '.heic' else None
+    with Image.open(file_path) as img:
+        # libheif already applies HEIF rotations, to thumbnails as well
+        orientation = 1 if file_extension == '.heic' else img.getexif().get(ORIENTATION_TAG, 1)
+        if thumb is None:
+            thumb = exif_thumbnail(img, size)
+        if thumb is None:
+            # JPEG only: the decoder scales by 1/2 to 1/8 while decoding
+            img.draft('RGB', (size, size))
+            thumb = img.copy() if img.mode in ('RGB', 'L') else img.convert('RGB')
+
+    thumb.thumbnail((size, size))
+    if orientation in ORIENTATION_TRANSPOSE:
+        thumb = thumb.transpose(getattr(Image, ORIENTATION_TRANSPOSE[orientation]))
+    if thumb.mode not in ('RGB', 'L'):
+        thumb = thumb.convert('RGB')
+
+    out = io.BytesIO()
+    thumb.save(out, 'JPEG', quality=THUMBNAIL_QUALITY)
+    return out.getvalue()
+
+class ThumbnailCache:
+    # Files are named by a hash of path, size and mtime, so an edited or
+    # replaced image never shows a stale thumbnail. Reads refresh a file's
+    # mtime, which eviction uses as its last use.
+    def __init__(self, directory=None, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory or thumbnail_cache_dir()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes = None
+        self._total = 0
+
+    def key(self, file_path, size, stat=None):
+        stat = stat or os.stat(file_path)
+        text = f"{os.path.abspath(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{size}"
+        return hashlib.blake2b(text.encode('utf-8', 'surrogateescape'), digest_size=16).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key[:2], key + '.jpg')
+
+    def get(self, key):
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key, data):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._load_sizes()
+            self._total += len(data) - self._sizes.get(path, 0)
+            self._sizes[path] = len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _load_sizes(self):
+        # Sizes of everything on disk, read once on the first store
+        if self._sizes is not None:
+            return
+        self._sizes = {}
+        for path, stat in self._scan():
+            self._sizes[path] = stat.st_size
+        self._total = sum(self._sizes.values())
+
+    def _scan(self):
+        try:
+            subdirs = [entry.path for entry in os.scandir(self.directory) if entry.is_dir()]
+        except OSError:
+            return
+        for subdir in subdirs:
+            try:
+                with os.scandir(subdir) as it:
+                    for entry in it:
+                        if entry.name.endswith('.jpg'):
+                            try:
+                                yield entry.path, entry.stat()
+                            except OSError:
+                                continue
+            except OSError:
+                continue
+
+    def _evict(self):
+        target = self.max_bytes * CACHE_LOW_WATER
+        for path, stat in sorted(self._scan(), key=lambda item: item[1].st_mtime):
+            if self._total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total -= self._sizes.pop(path, stat.st_size)
+
+    def thumbnail(self, file_path, size=THUMBNAIL_SIZE):
+        """Cached JPEG thumbnail bytes for file_path, made on a miss; None if it has none."""
+        key = self.key(file_path, size)
+        data = self.get(key)
+        if data is None:
+            data = make_thumbnail(file_path, size)
+            if data is not None:
+                self.put(key, data)
+        return data
\ No newline at end of file
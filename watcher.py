@@ -0,0 +1,165 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+# Reports files that land in a folder once they have stopped changing.
+# Linux uses inotify; everywhere else (or if inotify is unavailable) the
+# folder is polled. Only the top level is watched, which is also where the
+# sorts look for files, so moving files into the sorted subfolders does not
+# wake the watcher up again.
+
+SETTLE_TIME = 2.0
+POLL_INTERVAL = 1.0
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+logger = logging.getLogger('pinpoint.watcher')
+
+def list_files(folder_path):
+    try:
+        with os.scandir(folder_path) as it:
+            return {entry.name: entry for entry in it
+                    if not entry.name.startswith('.') and entry.is_file(follow_symlinks=False)}
+    except OSError:
+        return {}
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+class FolderWatcher:
+    # A file is reported once nothing has touched it for `settle` seconds and
+    # its size and mtime still match what was last seen, so a camera offload
+    # that is still copying is picked up only when the copy has finished
+    def __init__(self, folder_path, settle=SETTLE_TIME):
+        self.folder_path = folder_path
+        self.settle = settle
+        self.pending = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def touch(self, name, now=None):
+        now = time.monotonic() if now is None else now
+        self.pending[name] = (now + self.settle, file_signature(os.path.join(self.folder_path, name)))
+
+    def next_deadline(self):
+        return min((deadline for deadline, _ in self.pending.values()), default=None)
+
+    def settled(self, now=None):
+        now = time.monotonic() if now is None else now
+        ready = []
+        for name, (deadline, signature) in list(self.pending.items()):
+            if deadline > now:
+                continue
+            path = os.path.join(self.folder_path, name)
+            current = file_signature(path)
+            if current is None or not os.path.isfile(path):
+                del self.pending[name]
+            elif current != signature:
+                # Still being written without events reaching us, wait another round
+                self.pending[name] = (now + self.settle, current)
+            else:
+                del self.pending[name]
+                ready.append(path)
+        return sorted(ready)
+
+    def poll(self, timeout):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class InotifyWatcher(FolderWatcher):
+    def __init__(self, folder_path, settle=SETTLE_TIME):
+        super().__init__(folder_path, settle)
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder_path), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Unable to watch {folder_path}")
+
+    def poll(self, timeout):
+        deadline = self.next_deadline()
+        if deadline is not None:
+            timeout = max(0.0, min(timeout, deadline - time.monotonic()))
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            self.read_events()
+        return self.settled()
+
+    def read_events(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        now = time.monotonic()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; treat every loose file as a new arrival
+                for existing in list_files(self.folder_path):
+                    self.touch(existing, now)
+            elif name and not mask & IN_ISDIR and not name.startswith('.'):
+                self.touch(name, now)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class PollingWatcher(FolderWatcher):
+    def __init__(self, folder_path, settle=SETTLE_TIME, interval=POLL_INTERVAL):
+        super().__init__(folder_path, settle)
+        self.interval = interval
+        self.known = set(list_files(folder_path))
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        names = set(list_files(self.folder_path))
+        now = time.monotonic()
+
+        for name in names - self.known:
+            self.touch(name, now)
+        # Forget files that left so a new file with the same name is seen again
+        self.known = names
+        return self.settled(now)
+
+def create_watcher(folder_path, settle=SETTLE_TIME, polling=False):
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(folder_path, settle)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"Error starting inotify, polling instead: {e}")
+    return PollingWatcher(folder_path, settle)
\ No newline at end of file